@@ -1,9 +1,12 @@
 from fastapi import APIRouter, BackgroundTasks, Request, HTTPException
 from datetime import datetime
 from ..services.graphQL.cron_service import CronService
-from ..services.job_executor import execute_job as job_execute
+from ..services.job_executor import execute_jobs
 import os
 from dotenv import load_dotenv
+from ..utils.job_logging import get_logger
+
+logger = get_logger(__name__)
 
 router = APIRouter()
 cron_service = CronService()
@@ -54,11 +57,11 @@ def execute_job_without_date(
 # Common function to fetch and execute jobs
 def execute_job(today: str, background_tasks: BackgroundTasks):
     executions = cron_service.fetch_cron_executions(today)
-    print(f"Fetched {len(executions.cron_event_executions)} cron event executions for {today}.")
+    logger.info("Fetched %d cron event executions for %s.", len(executions.cron_event_executions), today)
     
-    for execution in executions.cron_event_executions:
-        background_tasks.add_task(
-            job_execute,
-            execution
-        )
+    # Cases run in parallel; each case keeps its execution_order
+    background_tasks.add_task(
+        execute_jobs,
+        executions.cron_event_executions
+    )
     return {"message": "Job execution started in background."}
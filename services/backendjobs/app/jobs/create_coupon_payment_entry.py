@@ -1,16 +1,19 @@
 import uuid
 from datetime import datetime
-from typing import Any, Optional
+from typing import Any, List, Optional
 
 from app.models.case_with_isin import CaseIsin, CaseWithIsin, CaseWithIsin
 from app.models.cron_event import CronEventExecution
+from app.models.trade_history import TradeHistoryByDay
 from app.services.graphQL.case_service import CaseService
 from app.services.graphQL.coupon_interest_payment_service import CouponInterestPaymentService
 from app.services.graphQL.couponinterest_service import CouponInterest, CouponInterestService
 from app.services.graphQL.notification_service import Notification, NotificationService
 from app.services.graphQL.trade_service import TradeService
+from app.utils.accrual import accrue_periods, format_dates
+from app.utils.job_logging import get_logger
 
-DAYS_IN_YEAR = 360
+logger = get_logger(__name__)
 
 def run(execution: CronEventExecution) -> None:
     """
@@ -19,58 +22,58 @@ def run(execution: CronEventExecution) -> None:
     This function is triggered by a cron event. It fetches the relevant case using the provided case ID,
     iterates through all ISINs associated with the case, and processes coupon payment entries for each ISIN.
     """
-    print(f"[TRACE] Starting coupon payment entry creation for case ID: {execution.caseid}")
-    print(f"[TRACE] Execution date: {execution.executiondate}")
+    logger.info("Starting coupon payment entry creation for case ID: %s", execution.caseid)
+    logger.trace("Execution date: %s", execution.executiondate)
     
     try:
-        print("[TRACE] Initializing services...")
+        logger.trace("Initializing services...")
         case_service = CaseService()
         coupon_interest_service = CouponInterestService()
-        print("[TRACE] Services initialized successfully")
+        logger.trace("Services initialized successfully")
 
         # Fetch the issued case using the case ID from the cron event execution
-        print(f"[TRACE] Fetching case with ID: {execution.caseid}")
+        logger.trace("Fetching case with ID: %s", execution.caseid)
         cases = case_service.get_issued_case_with_isin(execution.caseid)
         if not cases:
-            print(f"[ERROR] No cases found for case ID: {execution.caseid}")
+            logger.error("No cases found for case ID: %s", execution.caseid)
             save_notification(
                 "Automated Process Alert: Case Not Found", 
                 f"The automated coupon payment system was unable to locate case with ID: {execution.caseid}. Please verify the case ID is correct."
             )
             return
         
-        print(f"[TRACE] Found {len(cases)} case(s) for case ID: {execution.caseid}")
+        logger.trace("Found %s case(s) for case ID: %s", len(cases), execution.caseid)
         
         # Fetch the interest rate for this case id
-        print(f"[TRACE] Fetching active coupon interests for case ID: {execution.caseid}")
+        logger.trace("Fetching active coupon interests for case ID: %s", execution.caseid)
         coupon_interests = coupon_interest_service.get_active_coupon_interests(execution.caseid)
-        print(f"[TRACE] Found {len(coupon_interests)} active coupon interest(s)")
+        logger.trace("Found %s active coupon interest(s)", len(coupon_interests))
 
         cur_case = cases[0]
-        print(f"[TRACE] Processing case: {cur_case.id}, Issue date: {cur_case.issuedate}")
-        print(f"[TRACE] Case has {len(cur_case.caseisins)} ISIN(s) to process")
+        logger.trace("Processing case: %s, Issue date: %s", cur_case.id, cur_case.issuedate)
+        logger.trace("Case has %s ISIN(s) to process", len(cur_case.caseisins))
         # Process coupon payment entries for each ISIN in the case
         for idx, isin in enumerate(cur_case.caseisins, 1):
-            print(f"[TRACE] Processing ISIN {idx}/{len(cur_case.caseisins)}: {isin.isinnumber} (ID: {isin.id})")
+            logger.trace("Processing ISIN %s/%s: %s (ID: %s)", idx, len(cur_case.caseisins), isin.isinnumber, isin.id)
             
             coupon_interest = next((ci for ci in coupon_interests if ci.isinid == isin.id), None)
             if not coupon_interest:
-                print(f"[ERROR] No active interest rate found for ISIN: {isin.isinnumber} (ID: {isin.id})")
+                logger.error("No active interest rate found for ISIN: %s (ID: %s)", isin.isinnumber, isin.id)
                 save_notification(
                     "Automated Process Alert: Interest Rate Missing", 
                     f"The automated coupon payment system found no active interest rate configuration for ISIN: {isin.isinnumber}. Please contact support."
                 )
                 continue
             
-            print(f"[TRACE] Found coupon interest rate: {coupon_interest.interestrate} for ISIN: {isin.isinnumber}")
+            logger.trace("Found coupon interest rate: %s for ISIN: %s", coupon_interest.interestrate, isin.isinnumber)
             process_isin(isin, cur_case, coupon_interest, execution)
-            print(f"[TRACE] Completed processing ISIN: {isin.isinnumber}")
+            logger.trace("Completed processing ISIN: %s", isin.isinnumber)
 
-        print(f"[TRACE] Successfully completed coupon payment entry creation for case ID: {execution.caseid}")
+        logger.info("Successfully completed coupon payment entry creation for case ID: %s", execution.caseid)
         
     except Exception as e:
-        print(f"[ERROR] Exception occurred in main run function: {str(e)}")
-        print(f"[ERROR] Case ID: {execution.caseid}, Execution Date: {execution.executiondate}")
+        logger.error("Exception occurred in main run function: %s", str(e))
+        logger.error("Case ID: %s, Execution Date: %s", execution.caseid, execution.executiondate)
         save_notification(
             "Automated Process Error: Payment Processing Failed", 
             f"The automated coupon payment system encountered an unexpected error while processing payments.",
@@ -88,107 +91,223 @@ def process_isin(isin: CaseIsin, cur_case: CaseWithIsin, coupon_interest: Coupon
     This function calculates the coupon interest for each trade in the ISIN's trade history
     within the relevant date range. It creates a coupon payment entry for each period between trades.
     """
-    print(f"[TRACE] Starting process_isin for ISIN: {isin.isinnumber} (ID: {isin.id})")
-    print(f"[TRACE] Interest rate: {coupon_interest.interestrate}")
+    logger.trace("Starting process_isin for ISIN: %s (ID: %s)", isin.isinnumber, isin.id)
+    logger.trace("Interest rate: %s", coupon_interest.interestrate)
     
     trade_service = TradeService()
     coupon_interest_payment_service = CouponInterestPaymentService()
-    print("[TRACE] Trade and coupon interest payment services initialized")
+    logger.trace("Trade and coupon interest payment services initialized")
 
     # Fetch trade history and existing coupon interest payments for the ISIN
-    print(f"[TRACE] Fetching trade history for ISIN ID: {isin.id}")
+    logger.trace("Fetching trade history for ISIN ID: %s", isin.id)
     trade_history = trade_service.get_trade_history_by_days(isin.id)
-    print(f"[TRACE] Found {len(trade_history)} trade(s) in history")
+    logger.trace("Found %s trade(s) in history", len(trade_history))
     
-    print(f"[TRACE] Fetching existing coupon interest payments for ISIN ID: {isin.id}")
+    logger.trace("Fetching existing coupon interest payments for ISIN ID: %s", isin.id)
     coupon_interest_payments = coupon_interest_payment_service.get_coupon_interest_payments_by_isin(isin.id)
-    print(f"[TRACE] Found {len(coupon_interest_payments)} existing coupon payment(s)")
+    logger.trace("Found %s existing coupon payment(s)", len(coupon_interest_payments))
 
+    coupon_payment_entries = build_coupon_payment_entries(
+        isin, cur_case, coupon_interest, trade_history, coupon_interest_payments, execution.executiondate
+    )
+
+    # Save all entries in a single transaction
+    if coupon_payment_entries:
+        logger.trace("Saving %s coupon payment entries for ISIN: %s", len(coupon_payment_entries), isin.isinnumber)
+        try:
+            result = coupon_interest_payment_service.save_coupon_interest_payments(coupon_payment_entries)
+            affected_rows = result.get("affected_rows", 0)
+            logger.info("Successfully saved %s coupon payment entries for ISIN: %s", affected_rows, isin.id)
+        except Exception as e:
+            logger.error("Failed to save coupon payment entries for ISIN %s: %s", isin.isinnumber, str(e))
+            save_notification(
+                "Automated Process Error: Payment Entry Failed", 
+                f"Transaction failed for ISIN {isin.id}. All entries have been rolled back.",
+                {
+                    "Error Details": str(e),
+                    "ISIN ID": str(isin.id),
+                    "ISIN Number": getattr(isin, 'isinnumber', 'N/A'),
+                    "Case ID": str(cur_case.id),
+                    "Number of Entries": len(coupon_payment_entries)
+                }
+            )
+    else:
+        logger.trace("No coupon payment entries to save for ISIN: %s", isin.isinnumber)
+
+def build_coupon_payment_entries(
+    isin: CaseIsin,
+    cur_case: CaseWithIsin,
+    coupon_interest: CouponInterest,
+    trade_history: List[TradeHistoryByDay],
+    coupon_interest_payments: List[dict],
+    end: str
+) -> List[dict]:
+    """
+    Computes the coupon payment entries of one ISIN from already loaded data.
+
+    Starts at the case issue date, or at the end date of the last existing coupon
+    payment, and creates one entry per period between trades up to the end date.
+    Shared by the per-ISIN and the batch path so both produce the same entries.
+    """
     start = cur_case.issuedate
-    end = execution.executiondate
     cumulative_notional = 0
-    print(f"[TRACE] Initial period: {start} to {end}")
+    logger.trace("Initial period: %s to %s", start, end)
 
     # If there are existing coupon interest payments, start from the last payment's end date
     if coupon_interest_payments and len(coupon_interest_payments) > 0:
         last_coupon_entry = max(coupon_interest_payments, key=lambda x: x['enddate'])
-        print(f"[TRACE] Found existing payments, adjusting start date from {start} to {last_coupon_entry['enddate']}")
+        logger.trace("Found existing payments, adjusting start date from %s to %s", start, last_coupon_entry['enddate'])
         start = last_coupon_entry['enddate']
         
         # Add notional from trades after the last coupon entry up to the current end date
         trades_after_last_payment = [t for t in trade_history if t.valuedate > last_coupon_entry['enddate'] and t.valuedate <= end]
-        print(f"[TRACE] Found {len(trades_after_last_payment)} trade(s) after last payment date")
+        logger.trace("Found %s trade(s) after last payment date", len(trades_after_last_payment))
         
         for trade in trades_after_last_payment:
             cumulative_notional += trade.net_notional
-            print(f"[TRACE] Adding notional from trade (date: {trade.valuedate}): {trade.net_notional} (cumulative: {cumulative_notional})")
+            logger.trace("Adding notional from trade (date: %s): %s (cumulative: %s)", trade.valuedate, trade.net_notional, cumulative_notional)
 
     # Get trades in the current interest period, sorted by value date
     trades_in_range = sorted(
         [trade for trade in trade_history if trade.valuedate >= start and trade.valuedate <= end],
         key=lambda t: t.valuedate
     )
-    print(f"[TRACE] Found {len(trades_in_range)} trade(s) in current interest period ({start} to {end})")
+    logger.trace("Found %s trade(s) in current interest period (%s to %s)", len(trades_in_range), start, end)
     
-    if trades_in_range:
-        print(f"[TRACE] Trade dates in range: {[t.valuedate for t in trades_in_range]}")
-
-    # Collect all coupon payment entries for this ISIN
-    coupon_payment_entries = []
-    print(f"[TRACE] Starting to create coupon payment entries...")
+    if trades_in_range and logger.is_tracing():
+        logger.trace("Trade dates in range: %s", [t.valuedate for t in trades_in_range])
 
-    # For each trade, calculate the coupon payment entry for the period until the next trade or the end date
-    for idx, trade in enumerate(trades_in_range):
-        print(f"[TRACE] Processing trade {idx + 1}/{len(trades_in_range)}: Value date: {trade.valuedate}, Net notional: {trade.net_notional}")
-        
-        cpinterestStart_dt = to_datetime(trade.valuedate)
-        cpinterestEnd_dt = to_datetime(
-            trades_in_range[idx + 1].valuedate if idx + 1 < len(trades_in_range) else end
-        )
-        days = (cpinterestEnd_dt - cpinterestStart_dt).days
-        cumulative_notional += trade.net_notional
-        
-        accrued_amount = (cumulative_notional * coupon_interest.interestrate * days) / DAYS_IN_YEAR
-        
-        print(f"[TRACE] Coupon calculation: Period {cpinterestStart_dt.strftime('%Y-%m-%d')} to {cpinterestEnd_dt.strftime('%Y-%m-%d')} ({days} days)")
-        print(f"[TRACE] Cumulative notional: {cumulative_notional}, Interest rate: {coupon_interest.interestrate}, Accrued amount: {accrued_amount}")
+    # Each trade opens a period until the next trade or the end date
+    periods = accrue_periods(
+        [t.valuedate for t in trades_in_range],
+        [t.net_notional for t in trades_in_range],
+        end,
+        coupon_interest.interestrate,
+        cumulative_notional
+    )
 
-        coupon_payment_entry = {
+    # Collect all coupon payment entries for this ISIN
+    coupon_payment_entries = [
+        {
             "id": str(uuid.uuid4()),
             "isinid": isin.id,
-            "startdate": cpinterestStart_dt.strftime("%Y-%m-%d"),
-            "enddate": cpinterestEnd_dt.strftime("%Y-%m-%d"),
+            "startdate": startdate,
+            "enddate": enddate,
             "days": days,
             "interestrate": coupon_interest.interestrate,
             "accruedamount": accrued_amount,
             "paidinterest": 0.0
         }
-        
-        coupon_payment_entries.append(coupon_payment_entry)
-        print(f"[TRACE] Created coupon payment entry with ID: {coupon_payment_entry['id']}")
+        for startdate, enddate, days, accrued_amount in zip(
+            format_dates(periods.startdates),
+            format_dates(periods.enddates),
+            periods.days.tolist(),
+            periods.accrued_amount.tolist()
+        )
+    ]
+    logger.trace("Created %s coupon payment entries", len(coupon_payment_entries))
 
-    # Save all entries in a single transaction
-    if coupon_payment_entries:
-        print(f"[TRACE] Saving {len(coupon_payment_entries)} coupon payment entries for ISIN: {isin.isinnumber}")
+    return coupon_payment_entries
+
+def run_batch(executions: List[CronEventExecution]) -> None:
+    """
+    Batch entry point for creating coupon payment entries of many cases at once.
+
+    Loads the issued cases, their active coupon interests, the trade history and the
+    existing coupon payments of every ISIN in a few bulk queries, computes all accrual
+    periods in memory with build_coupon_payment_entries and saves every entry with a
+    single insert_couponpayments mutation.
+    """
+    caseids = list(dict.fromkeys(execution.caseid for execution in executions))
+    end_by_case = {execution.caseid: execution.executiondate for execution in executions}
+    logger.info("Starting batch coupon payment entry creation for %s case(s)", len(caseids))
+
+    try:
+        case_service = CaseService()
+        coupon_interest_service = CouponInterestService()
+        trade_service = TradeService()
+        coupon_interest_payment_service = CouponInterestPaymentService()
+
+        cases = case_service.get_issued_cases_with_isin(caseids)
+        found_caseids = {case.id for case in cases}
+        for caseid in caseids:
+            if caseid not in found_caseids:
+                logger.error("No cases found for case ID: %s", caseid)
+                save_notification(
+                    "Automated Process Alert: Case Not Found", 
+                    f"The automated coupon payment system was unable to locate case with ID: {caseid}. Please verify the case ID is correct."
+                )
+
+        coupon_interests = coupon_interest_service.get_active_coupon_interests_for_cases(list(found_caseids))
+        interest_by_isin = {}
+        for ci in coupon_interests:
+            interest_by_isin.setdefault(ci.isinid, ci)
+
+        # (case, isin, interest) for every ISIN that has an active interest rate
+        work = []
+        for cur_case in cases:
+            for isin in cur_case.caseisins:
+                coupon_interest = interest_by_isin.get(isin.id)
+                if not coupon_interest:
+                    logger.error("No active interest rate found for ISIN: %s (ID: %s)", isin.isinnumber, isin.id)
+                    save_notification(
+                        "Automated Process Alert: Interest Rate Missing", 
+                        f"The automated coupon payment system found no active interest rate configuration for ISIN: {isin.isinnumber}. Please contact support."
+                    )
+                    continue
+                work.append((cur_case, isin, coupon_interest))
+
+        if not work:
+            logger.trace("No ISINs with an active interest rate to process")
+            return
+
+        isinids = [isin.id for _, isin, _ in work]
+        trade_history_by_isin = trade_service.get_trade_history_by_days_for_isins(isinids)
+        payments_by_isin = coupon_interest_payment_service.get_coupon_interest_payments_by_isins(isinids)
+        logger.trace("Loaded trade history and coupon payments for %s ISIN(s)", len(isinids))
+
+        coupon_payment_entries = []
+        for cur_case, isin, coupon_interest in work:
+            coupon_payment_entries.extend(build_coupon_payment_entries(
+                isin,
+                cur_case,
+                coupon_interest,
+                trade_history_by_isin.get(isin.id, []),
+                payments_by_isin.get(isin.id, []),
+                end_by_case[cur_case.id]
+            ))
+
+        if not coupon_payment_entries:
+            logger.trace("No coupon payment entries to save")
+            return
+
+        logger.trace("Saving %s coupon payment entries for %s case(s)", len(coupon_payment_entries), len(cases))
         try:
             result = coupon_interest_payment_service.save_coupon_interest_payments(coupon_payment_entries)
-            affected_rows = result.get("affected_rows", 0)
-            print(f"[TRACE] Successfully saved {affected_rows} coupon payment entries for ISIN: {isin.id}")
+            logger.info("Successfully saved %s coupon payment entries", result.get('affected_rows', 0))
         except Exception as e:
-            print(f"[ERROR] Failed to save coupon payment entries for ISIN {isin.isinnumber}: {str(e)}")
+            logger.error("Failed to save batched coupon payment entries: %s", str(e))
             save_notification(
                 "Automated Process Error: Payment Entry Failed", 
-                f"Transaction failed for ISIN {isin.id}. All entries have been rolled back.",
+                f"Batched transaction failed for {len(cases)} case(s). All entries have been rolled back.",
                 {
                     "Error Details": str(e),
-                    "ISIN ID": str(isin.id),
-                    "ISIN Number": getattr(isin, 'isinnumber', 'N/A'),
-                    "Case ID": str(cur_case.id),
+                    "Case IDs": ", ".join(case.id for case in cases),
                     "Number of Entries": len(coupon_payment_entries)
                 }
             )
-    else:
-        print(f"[TRACE] No coupon payment entries to save for ISIN: {isin.isinnumber}")
+
+    except Exception as e:
+        logger.error("Exception occurred in batch run function: %s", str(e))
+        save_notification(
+            "Automated Process Error: Payment Processing Failed", 
+            f"The automated coupon payment system encountered an unexpected error while processing payments.",
+            {
+                "Error Details": str(e),
+                "Case IDs": ", ".join(caseids),
+                "Execution Date": ", ".join(sorted({str(execution.executiondate) for execution in executions}))
+            }
+        )
 
 def create_bootstrap_alert(title: str, message: str, details: Optional[dict] = None, alert_type: str = "danger") -> str:
     """
@@ -237,7 +356,8 @@ def create_html_message(message: str, details: Optional[dict] = None) -> str:
 
 def save_notification(title: str, message: str, details: Optional[dict] = None) -> None:
     """
-    Saves a notification with the provided title and message.
+    Saves a notification with the provided title and message, or queues it in the
+    run's NotificationSink when one is active.
     Type is always 'G' and target is always 'everyone'.
     Only errors will be wrapped in bootstrap alert format, others use simple HTML.
     
@@ -246,7 +366,7 @@ def save_notification(title: str, message: str, details: Optional[dict] = None)
         message: The notification message
         details: Optional dictionary of detailed information for errors
     """
-    print(f"[TRACE] Creating notification: {title}")
+    logger.trace("Creating notification: %s", title)
     try:
         notification_service = NotificationService()
         
@@ -267,13 +387,13 @@ def save_notification(title: str, message: str, details: Optional[dict] = None)
             notificationid=""
         )
         
-        notification_id = notification_service.save_notification(notification)
+        notification_id = notification_service.publish(notification)
         if notification_id:
-            print(f"[TRACE] Notification saved successfully with ID: {notification_id}")
+            logger.trace("Notification saved successfully with ID: %s", notification_id)
         else:
-            print(f"[ERROR] Failed to save notification: {title}")
+            logger.error("Failed to save notification: %s", title)
     except Exception as e:
-        print(f"[ERROR] Exception occurred while saving notification '{title}': {e}")
+        logger.error("Exception occurred while saving notification '%s': %s", title, e)
 
 def to_datetime(dt) -> datetime:
     """
@@ -281,7 +401,7 @@ def to_datetime(dt) -> datetime:
     """
     if isinstance(dt, str):
         result = datetime.fromisoformat(dt)
-        print(f"[TRACE] Converted string '{dt}' to datetime: {result}")
+        logger.trace("Converted string '%s' to datetime: %s", dt, result)
         return result
-    print(f"[TRACE] Using existing datetime object: {dt}")
+    logger.trace("Using existing datetime object: %s", dt)
     return dt
@@ -1,53 +1,64 @@
-import uuid
+from typing import List
 from app.models.cron_event import CronEventExecution
-from app.services.graphQL.couponinterest_service import CouponInterest, CouponInterestService
+from app.services.graphQL.couponinterest_service import CouponInterestService
+from app.utils.job_logging import get_logger
+
+logger = get_logger(__name__)
 
 def run(execution: CronEventExecution):
-    print(f"[FLOATING_RATE_TRACE] Starting floating interest rate update for case ID: {execution.caseid}")
-    print(f"[FLOATING_RATE_TRACE] Execution date: {execution.executiondate}")
+    logger.info("Starting floating interest rate update for case ID: %s", execution.caseid)
+    logger.trace("Execution date: %s", execution.executiondate)
     
     try:
-        print("[FLOATING_RATE_TRACE] Initializing CouponInterestService...")
+        logger.trace("Initializing CouponInterestService...")
         service = CouponInterestService()
-        print("[FLOATING_RATE_TRACE] Service initialized successfully")
+        logger.trace("Service initialized successfully")
         
-        print(f"[FLOATING_RATE_TRACE] Fetching active coupon interests for case ID: {execution.caseid}")
+        logger.trace("Fetching active coupon interests for case ID: %s", execution.caseid)
         interests = service.get_active_coupon_interests(execution.caseid)
-        print(f"[FLOATING_RATE_TRACE] Found {len(interests)} active floating interest rate(s)")
+        logger.trace("Found %s active floating interest rate(s)", len(interests))
 
         if not interests:
-            print(f"[FLOATING_RATE_TRACE] No active floating interest rates found for case ID: {execution.caseid}")
+            logger.trace("No active floating interest rates found for case ID: %s", execution.caseid)
             return
 
-        # update active floating rates to historical state.
-        for idx, interest in enumerate(interests, 1):
-            print(f"[FLOATING_RATE_TRACE] Processing interest {idx}/{len(interests)}: ID {interest.id}")
-            print(f"[FLOATING_RATE_TRACE] Current rate: {interest.interestrate}, ISIN: {interest.isinid}, Event date: {interest.eventdate}")
-            
-            # Here you would add the logic to update the interest rate status to historical.
-            print(f"[FLOATING_RATE_TRACE] Updating interest rate {interest.id} status to historical (status=2)")
-            service.update_coupon_interest_status(interest.id, status=2)  # status=2 means historical
-            print(f"[FLOATING_RATE_TRACE] Successfully updated interest rate {interest.id} to historical status")
-
-            print(f"[FLOATING_RATE_TRACE] Creating new floating interest rate for next period...")
-            new_interest_id = str(uuid.uuid4())
-            new_interest = CouponInterest(
-                id=new_interest_id,
-                isinid=interest.isinid,
-                interestrate=interest.interestrate,
-                eventdate=execution.executiondate,
-                type=interest.type,
-                status=1  # status=1 means current 
-            )
-            
-            print(f"[FLOATING_RATE_TRACE] New interest details: ID {new_interest_id}, Rate: {new_interest.interestrate}, ISIN: {new_interest.isinid}")
-            service.create_new_floating_interest_rate(new_interest)
-            print(f"[FLOATING_RATE_TRACE] Successfully created new floating interest rate with ID: {new_interest_id}")
-            
-        print(f"[FLOATING_RATE_TRACE] Successfully completed floating interest rate update for case ID: {execution.caseid}")
-        print(f"[FLOATING_RATE_TRACE] Processed {len(interests)} interest rate(s) total")
+        if logger.is_tracing():
+            for interest in interests:
+                logger.trace("Current rate: %s, ISIN: %s, Event date: %s", interest.interestrate, interest.isinid, interest.eventdate)
+
+        # Archive active floating rates and create their successors in one transaction
+        result = service.roll_forward_floating_rates(interests, execution.executiondate)
+        logger.info("Rolled forward floating interest rates for case ID: %s: archived %s, inserted %s in %.3fs",
+                    execution.caseid, result["archived"], result["inserted"], result["seconds"])
+        logger.trace("New interest IDs: %s", result["ids"])
+
+        logger.info("Successfully completed floating interest rate update for case ID: %s", execution.caseid)
         
     except Exception as e:
-        print(f"[FLOATING_RATE_ERROR] Exception occurred during floating interest rate update: {str(e)}")
-        print(f"[FLOATING_RATE_ERROR] Case ID: {execution.caseid}, Execution Date: {execution.executiondate}")
-        raise
\ No newline at end of file
+        logger.error("Exception occurred during floating interest rate update: %s", str(e))
+        logger.error("Case ID: %s, Execution Date: %s", execution.caseid, execution.executiondate)
+        raise
+
+def run_batch(executions: List[CronEventExecution]):
+    """
+    Rolls forward the active floating rates of all given cases, one transactional
+    mutation per execution date (normally a single one for the whole run).
+    """
+    service = CouponInterestService()
+    caseids_by_date = {}
+    for execution in executions:
+        caseids_by_date.setdefault(execution.executiondate, []).append(execution.caseid)
+
+    for executiondate, caseids in caseids_by_date.items():
+        logger.info("Starting batch floating interest rate update for %s case(s), execution date %s", len(caseids), executiondate)
+        try:
+            interests = service.get_active_coupon_interests_for_cases(list(dict.fromkeys(caseids)))
+            logger.trace("Found %s active floating interest rate(s)", len(interests))
+
+            result = service.roll_forward_floating_rates(interests, executiondate)
+            logger.info("Rolled forward floating interest rates for %s case(s): archived %s, inserted %s in %.3fs",
+                        len(caseids), result["archived"], result["inserted"], result["seconds"])
+        except Exception as e:
+            logger.error("Exception occurred during batch floating interest rate update: %s", str(e))
+            logger.error("Case IDs: %s, Execution Date: %s", ", ".join(caseids), executiondate)
+            raise
@@ -3,50 +3,54 @@ from app.models.cron_event import CronEventExecution
 from app.services.graphQL.dynamic_query_service import DynamicQueryService
 from app.services.graphQL.notification_service import Notification, NotificationService
 from app.utils.deep_template_replacer import replace_template_vars
+from app.utils.job_logging import get_logger
+
+logger = get_logger(__name__)
 
 
 def run(execution: CronEventExecution):
-    print(f"[NOTIFICATION_TRACE] Starting notification job for event: {execution.event}")
-    print(f"[NOTIFICATION_TRACE] Case ID: {execution.caseid}, Target: {execution.target}, Target Type: {execution.targettype}")
-    print(f"[NOTIFICATION_TRACE] Title: {execution.title}")
+    logger.info("Starting notification job for event: %s", execution.event)
+    logger.trace("Case ID: %s, Target: %s, Target Type: %s", execution.caseid, execution.target, execution.targettype)
+    logger.trace("Title: %s", execution.title)
     
     try:
         message = "test message"
         
         if execution.graphql is None or execution.graphql.strip() == "":
-            print("[NOTIFICATION_TRACE] No GraphQL query provided, using template directly")
+            logger.trace("No GraphQL query provided, using template directly")
             message = execution.template or "Default message"
             message_preview = message[:100] + ('...' if len(message) > 100 else '')
-            print(f"[NOTIFICATION_TRACE] Direct template message: {message_preview}")
+            logger.trace("Direct template message: %s", message_preview)
         else:
-            print("[NOTIFICATION_TRACE] GraphQL query provided, executing dynamic query")
+            logger.trace("GraphQL query provided, executing dynamic query")
             query_preview = execution.graphql[:200] + ('...' if len(execution.graphql) > 200 else '')
-            print(f"[NOTIFICATION_TRACE] GraphQL query: {query_preview}")
+            logger.trace("GraphQL query: %s", query_preview)
             
-            print("[NOTIFICATION_TRACE] Initializing DynamicQueryService...")
+            logger.trace("Initializing DynamicQueryService...")
             query_service = DynamicQueryService()
-            print("[NOTIFICATION_TRACE] DynamicQueryService initialized successfully")
+            logger.trace("DynamicQueryService initialized successfully")
             
-            print(f"[NOTIFICATION_TRACE] Executing GraphQL query with case ID: {execution.caseid}")
+            logger.trace("Executing GraphQL query with case ID: %s", execution.caseid)
             data = query_service.execute_query(
                 execution.graphql,
                 {
                     "id": execution.caseid,
                 }
             )
-            print(f"[NOTIFICATION_TRACE] GraphQL query executed successfully, data keys: {list(data.keys()) if isinstance(data, dict) else 'Not a dict'}")
+            if logger.is_tracing():
+                logger.trace("GraphQL query executed successfully, data keys: %s", list(data.keys()) if isinstance(data, dict) else 'Not a dict')
             
-            print("[NOTIFICATION_TRACE] Replacing template variables with query data...")
+            logger.trace("Replacing template variables with query data...")
             message = replace_template_vars(execution.template or "Default template", data)
             message_preview = message[:100] + ('...' if len(message) > 100 else '')
-            print(f"[NOTIFICATION_TRACE] Template processed, final message: {message_preview}")
+            logger.trace("Template processed, final message: %s", message_preview)
     
-        print(f"[NOTIFICATION_TRACE] Preparing notification for saving...")
+        logger.trace("Preparing notification for saving...")
         
         # Here you can integrate with an actual notification service 
-        print("[NOTIFICATION_TRACE] Initializing NotificationService...")
+        logger.trace("Initializing NotificationService...")
         notification_service = NotificationService()
-        print("[NOTIFICATION_TRACE] NotificationService initialized successfully")
+        logger.trace("NotificationService initialized successfully")
         
         notification = Notification(
             title=execution.title or "System Notification",
@@ -59,20 +63,20 @@ def run(execution: CronEventExecution):
             notificationid=""
         ) # type: ignore
         
-        print(f"[NOTIFICATION_TRACE] Notification object created - Title: {execution.title}, Type: {execution.targettype}")
-        print(f"[NOTIFICATION_TRACE] Attempting to save notification...")
+        logger.trace("Notification object created - Title: %s, Type: %s", execution.title, execution.targettype)
+        logger.trace("Attempting to save notification...")
         
-        notification_id = notification_service.save_notification(notification)
+        notification_id = notification_service.publish(notification)
         if notification_id:
-            print(f"[NOTIFICATION_TRACE] Notification saved successfully with ID: {notification_id}")
+            logger.trace("Notification saved successfully with ID: %s", notification_id)
         else:
-            print(f"[NOTIFICATION_ERROR] Failed to save notification for event: {execution.event}")
+            logger.error("Failed to save notification for event: %s", execution.event)
             
-        print(f"[NOTIFICATION_TRACE] Successfully completed notification job for event: {execution.event}")
+        logger.info("Successfully completed notification job for event: %s", execution.event)
         
     except Exception as e:
-        print(f"[NOTIFICATION_ERROR] Exception occurred during notification processing: {str(e)}")
-        print(f"[NOTIFICATION_ERROR] Event: {execution.event}, Case ID: {execution.caseid}")
+        logger.error("Exception occurred during notification processing: %s", str(e))
+        logger.error("Event: %s, Case ID: %s", execution.event, execution.caseid)
         raise
 
 
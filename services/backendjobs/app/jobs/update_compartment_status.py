@@ -1,68 +1,87 @@
+import time
 from app.models.cron_event import CronEventExecution
+from app.utils.job_logging import get_logger
 from ..services.graphQL.trade_service import TradeService
 from ..services.graphQL.case_service import CaseService
 
+logger = get_logger(__name__)
+
 def run(execution: CronEventExecution):
-    print(f"[COMPARTMENT_STATUS_TRACE] Starting compartment status update for case ID: {execution.caseid}")
-    print(f"[COMPARTMENT_STATUS_TRACE] Execution date: {execution.executiondate}")
+    logger.info("Starting compartment status update for case ID: %s", execution.caseid)
+    logger.trace("Execution date: %s", execution.executiondate)
     
     try:
-        print(f"[COMPARTMENT_STATUS_TRACE] Step 1: Consolidating subscriptions to trades for case ID: {execution.caseid}")
-        consolidate_subscriptions_to_trades(execution.caseid)
-        print(f"[COMPARTMENT_STATUS_TRACE] Step 1 completed successfully")
-
-        print(f"[COMPARTMENT_STATUS_TRACE] Step 2: Updating compartment status for case ID: {execution.caseid}")
-        update_compartment_status(execution.caseid)
-        print(f"[COMPARTMENT_STATUS_TRACE] Step 2 completed successfully")
+        logger.trace("Consolidating subscriptions to trades and issuing compartment for case ID: %s", execution.caseid)
+        consolidate_and_issue_compartment(execution.caseid)
         
-        print(f"[COMPARTMENT_STATUS_TRACE] Successfully completed compartment status update for case ID: {execution.caseid}")
+        logger.info("Successfully completed compartment status update for case ID: %s", execution.caseid)
         
     except Exception as e:
-        print(f"[COMPARTMENT_STATUS_ERROR] Exception occurred during compartment status update: {str(e)}")
-        print(f"[COMPARTMENT_STATUS_ERROR] Case ID: {execution.caseid}, Execution Date: {execution.executiondate}")
-        print(f"[COMPARTMENT_STATUS_ERROR] Rolling back transaction...")
+        logger.error("Exception occurred during compartment status update: %s", str(e))
+        logger.error("Case ID: %s, Execution Date: %s", execution.caseid, execution.executiondate)
+        logger.error("Rolling back transaction...")
         # Rollback transaction logic here
         # Example: trade_service.rollback_transaction() if available
         raise
 
+def consolidate_and_issue_compartment(caseid: str):
+    """
+    Saves the aggregated subscription trades with bulk insert_trades mutations and
+    sets the compartment to issued in the same transaction as the last chunk.
+    """
+    trade_service = TradeService()
+
+    logger.trace("Fetching aggregated buy trades for case ID: %s", caseid)
+    trades = trade_service.get_agg_buy_trades(caseid)
+    logger.trace("Found %s trade(s) to consolidate for case ID: %s", len(trades), caseid)
+
+    started = time.perf_counter()
+    result = trade_service.save_trades(trades, issue_caseid=caseid)
+    logger.info("Consolidated %s trade(s) for case ID: %s in %s mutation(s), %.3fs",
+                result["inserted"], caseid, result["mutations"], time.perf_counter() - started)
+
+    if not result["issued"]:
+        logger.warning("No rows were affected during compartment status update for case ID: %s", caseid)
+
+# Per-row path: one insert_trades_one mutation per trade, then a separate status update
 def consolidate_subscriptions_to_trades(caseid: str):
-    print(f"[COMPARTMENT_STATUS_TRACE] Starting subscription consolidation for case ID: {caseid}")
+    logger.trace("Starting subscription consolidation for case ID: %s", caseid)
     
-    print(f"[COMPARTMENT_STATUS_TRACE] Initializing TradeService...")
+    logger.trace("Initializing TradeService...")
     trade_service = TradeService()
-    print(f"[COMPARTMENT_STATUS_TRACE] TradeService initialized successfully")
+    logger.trace("TradeService initialized successfully")
     
-    print(f"[COMPARTMENT_STATUS_TRACE] Fetching aggregated buy trades for case ID: {caseid}")
+    logger.trace("Fetching aggregated buy trades for case ID: %s", caseid)
     trades = trade_service.get_agg_buy_trades(caseid)
-    print(f"[COMPARTMENT_STATUS_TRACE] Found {len(trades)} trade(s) to consolidate for case ID: {caseid}")
+    logger.trace("Found %s trade(s) to consolidate for case ID: %s", len(trades), caseid)
 
     if not trades:
-        print(f"[COMPARTMENT_STATUS_TRACE] No trades found to consolidate for case ID: {caseid}")
+        logger.trace("No trades found to consolidate for case ID: %s", caseid)
         return
 
     # Further trades will be saved back to db as buy from subscriptions state.
     for idx, trade in enumerate(trades, 1):
-        print(f"[COMPARTMENT_STATUS_TRACE] Processing trade {idx}/{len(trades)}: {trade}")
+        logger.trace("Processing trade %s/%s: %s", idx, len(trades), trade)
         # Save trade back to db as buy from subscriptions state.
-        print(f"[COMPARTMENT_STATUS_TRACE] Saving consolidated trade {idx} to database...")
+        logger.trace("Saving consolidated trade %s to database...", idx)
         trade_service.save_trade(trade)
-        print(f"[COMPARTMENT_STATUS_TRACE] Successfully saved trade {idx}")
+        logger.trace("Successfully saved trade %s", idx)
         
-    print(f"[COMPARTMENT_STATUS_TRACE] Successfully consolidated {len(trades)} trades for case ID: {caseid}")
+    logger.info("Successfully consolidated %s trades for case ID: %s", len(trades), caseid)
 
 def update_compartment_status(caseid: str):
-    print(f"[COMPARTMENT_STATUS_TRACE] Starting compartment status update for case ID: {caseid}")
+    logger.info("Starting compartment status update for case ID: %s", caseid)
     
-    print(f"[COMPARTMENT_STATUS_TRACE] Initializing CaseService...")
+    logger.trace("Initializing CaseService...")
     case_service = CaseService()
-    print(f"[COMPARTMENT_STATUS_TRACE] CaseService initialized successfully")
+    logger.trace("CaseService initialized successfully")
     
-    print(f"[COMPARTMENT_STATUS_TRACE] Issuing compartment for case ID: {caseid}")
+    logger.trace("Issuing compartment for case ID: %s", caseid)
     affected_rows = case_service.issue_compartment(caseid)
-    print(f"[COMPARTMENT_STATUS_TRACE] Compartment issued successfully for case ID: {caseid}")
-    print(f"[COMPARTMENT_STATUS_TRACE] Affected rows: {affected_rows}")
+    logger.trace("Compartment issued successfully for case ID: %s", caseid)
+    logger.trace("Affected rows: %s", affected_rows)
     
     if affected_rows == 0:
-        print(f"[COMPARTMENT_STATUS_TRACE] Warning: No rows were affected during compartment status update for case ID: {caseid}")
+        logger.warning("No rows were affected during compartment status update for case ID: %s", caseid)
     else:
-        print(f"[COMPARTMENT_STATUS_TRACE] Successfully updated compartment status for case ID: {caseid}")
\ No newline at end of file
+        logger.trace("Successfully updated compartment status for case ID: %s", caseid)
\ No newline at end of file
@@ -1,5 +1,8 @@
 from fastapi import FastAPI
 from .api.routes import router
+from .utils.job_logging import configure_logging
+
+configure_logging()
 
 app = FastAPI(root_path="/api")
 #security = HTTPBearer()
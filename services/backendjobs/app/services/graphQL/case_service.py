@@ -1,16 +1,10 @@
-import os
-import requests
+from .hasura_client import get_hasura_client
 from typing import List
 from ...models.case_with_isin import CaseWithIsin, CaseIsin
 
 class CaseService:
     def __init__(self):
-        base_url = os.getenv("HASURA_BASE_URL","")
-        self.graphql_url = base_url.rstrip("/") + "/v1/graphql"
-        self.headers = headers = {
-            "content-type": "application/json",
-            "x-hasura-admin-secret": os.getenv("HASURA_ADMIN_SECRET", "")
-        }
+        self.client = get_hasura_client()
     
     def get_issued_case_with_isin(self, id: str) -> List[CaseWithIsin]:
         """
@@ -33,15 +27,34 @@ class CaseService:
             "id": id,
             "compartmentstatusid": 9 # Issued status
         }
-        response = requests.post(
-            self.graphql_url,
-            json={"query": query, "variables": variables},
-            headers=self.headers
-        )
-        response.raise_for_status()
-        data = response.json()
-        cases_data = data.get("data", {}).get("cases", [])
-        
+        data = self.client.execute(query, variables)
+        return self._to_cases(data.get("data", {}).get("cases", []))
+
+    def get_issued_cases_with_isin(self, ids: List[str]) -> List[CaseWithIsin]:
+        """
+        Retrieves all issued cases among the given ids, including their ISINs, in one query.
+        """
+        query = '''
+            query GetIssuedCasesWithISIN($ids: [uuid!], $compartmentstatusid: Int) {
+              cases(where: {id: {_in: $ids}, compartmentstatusid: {_eq: $compartmentstatusid}}) {
+                id
+                issuedate
+                maturitydate
+                caseisins {
+                  id
+                  isinnumber
+                }
+              }
+            }
+        '''
+        variables = {
+            "ids": ids,
+            "compartmentstatusid": 9 # Issued status
+        }
+        data = self.client.execute(query, variables)
+        return self._to_cases(data.get("data", {}).get("cases", []))
+
+    def _to_cases(self, cases_data: list) -> List[CaseWithIsin]:
         # Convert raw data to typed objects
         cases = []
         for case_data in cases_data:
@@ -95,11 +108,5 @@ class CaseService:
             "data": {"compartmentstatusid": status}
         }
 
-        response = requests.post(
-            self.graphql_url,
-            json={"query": mutation, "variables": variables},
-            headers=self.headers
-        )
-        response.raise_for_status()
-        data = response.json()
+        data = self.client.execute(mutation, variables)
         return data.get("data", {}).get("update_cases_by_pk", {}).get("affected_rows", 0)
\ No newline at end of file
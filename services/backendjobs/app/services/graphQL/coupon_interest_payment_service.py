@@ -1,14 +1,8 @@
-import os
-import requests
+from .hasura_client import get_hasura_client
 
 class CouponInterestPaymentService:
     def __init__(self):
-        base_url = os.getenv("HASURA_BASE_URL","")
-        self.graphql_url = base_url.rstrip("/") + "/v1/graphql"
-        self.headers = {
-            "content-type": "application/json",
-            "x-hasura-admin-secret": os.getenv("HASURA_ADMIN_SECRET", "")
-        }
+        self.client = get_hasura_client()
     
     # Read all coupon interest payments for a given ISIN
     def get_coupon_interest_payments_by_isin(self, isin: str):
@@ -29,15 +23,34 @@ class CouponInterestPaymentService:
 
         variables = {"isinid": isin}
         
-        response = requests.post(
-            self.graphql_url,
-            json={"query": query, "variables": variables},
-            headers=self.headers
-        )
-        
-        response.raise_for_status()
-        return response.json().get("data", {}).get("couponpayments", [])
+        data = self.client.execute(query, variables)
+        return data.get("data", {}).get("couponpayments", [])
     
+    # Read all coupon interest payments for several ISINs in one query
+    def get_coupon_interest_payments_by_isins(self, isins: list[str]) -> dict[str, list]:
+        query = """
+            query GetCouponInterestPaymentsByIsins($isinids: [uuid!]) {
+                couponpayments(where: {isinid: {_in: $isinids}}) {
+                    id
+                    isinid
+                    startdate
+                    enddate
+                    days
+                    interestrate
+                    accruedamount
+                    paidinterest
+                }
+            }
+        """
+
+        variables = {"isinids": isins}
+        data = self.client.execute(query, variables)
+
+        payments_by_isin = {isin: [] for isin in isins}
+        for payment in data.get("data", {}).get("couponpayments", []):
+            payments_by_isin.setdefault(payment["isinid"], []).append(payment)
+        return payments_by_isin
+
     def save_coupon_interest_payments(self, coupon_payment_entries: list[dict]) -> dict:
         """
         Save multiple coupon interest payment entries in a single transaction.
@@ -66,11 +79,7 @@ class CouponInterestPaymentService:
         
         variables = {"objects": coupon_payment_entries}
         
-        response = requests.post(
-            self.graphql_url,
-            json={"query": mutation, "variables": variables},
-            headers=self.headers
-        )
+        response = self.client.post(mutation, variables)
         
         # Check for GraphQL errors
         response_data = response.json()
@@ -1,8 +1,11 @@
-import os
+import time
 from typing import List
 import uuid
-import requests
-from dataclasses import dataclass
+from .hasura_client import get_hasura_client
+from dataclasses import dataclass, asdict
+from ...utils.job_logging import get_logger
+
+logger = get_logger(__name__)
 
 @dataclass
 class CouponInterest:
@@ -15,12 +18,7 @@ class CouponInterest:
 
 class CouponInterestService:
     def __init__(self):
-        base_url = os.getenv("HASURA_BASE_URL","")
-        self.graphql_url = base_url.rstrip("/") + "/v1/graphql"
-        self.headers = headers = {
-            "content-type": "application/json",
-            "x-hasura-admin-secret": os.getenv("HASURA_ADMIN_SECRET", "")
-        }
+        self.client = get_hasura_client()
 
     def get_active_coupon_interests(self, caseid: str) -> List[CouponInterest]:
         query = '''
@@ -40,15 +38,34 @@ class CouponInterestService:
         }
         '''
         variables = {"caseid": caseid}
-        response = requests.post(
-            self.graphql_url,
-            json={"query": query, "variables": variables},
-            headers=self.headers
-        )
-        response.raise_for_status()
-        data = response.json()
-        
-        interests = data.get("data", {}).get("cases", [])
+        data = self.client.execute(query, variables)
+        return self._to_coupon_interests(data.get("data", {}).get("cases", []))
+
+    def get_active_coupon_interests_for_cases(self, caseids: List[str]) -> List[CouponInterest]:
+        """
+        Same as get_active_coupon_interests, but for several cases in one query.
+        """
+        query = '''
+        query GET_ACTIVE_FLOATING_INTERESTS($caseids: [uuid!]) {
+            cases(where: {id: {_in: $caseids}}) {
+                caseisins {
+                    couponinterests(where: {status: {_eq: 1}, type: {_eq: "54c954ed-35a9-42d4-87af-40cb546a02f5"}}) {
+                        id
+                        isinid
+                        interestrate
+                        eventdate
+                        type
+                        status
+                    }
+                }
+            }
+        }
+        '''
+        variables = {"caseids": caseids}
+        data = self.client.execute(query, variables)
+        return self._to_coupon_interests(data.get("data", {}).get("cases", []))
+
+    def _to_coupon_interests(self, interests: list) -> List[CouponInterest]:
         #create a list of CouponInterest objects
         coupon_interests = []
 
@@ -77,12 +94,8 @@ class CouponInterestService:
             }
         '''
         variables = {"id": interest_id, "status": status}
-        response = requests.post(
-            self.graphql_url,
-            json={"query": mutation, "variables": variables},
-            headers=self.headers
-        )
-        print(f"response: {response.text}")
+        response = self.client.post(mutation, variables)
+        logger.trace("response: %s", response.text)
         response.raise_for_status()
         return response.json()
     
@@ -121,11 +134,71 @@ class CouponInterestService:
             "type": coupon_interest.type,
             "status": coupon_interest.status
         }
-        response = requests.post(
-            self.graphql_url,
-            json={"query": mutation, "variables": variables},
-            headers=self.headers
-        )
-        print(f"coupon_interest.id: {coupon_interest.id}")
-        response.raise_for_status()
-        return response.json()
+        logger.trace("coupon_interest.id: %s", coupon_interest.id)
+        return self.client.execute(mutation, variables)
+
+    def roll_forward_floating_rates(self, interests: List[CouponInterest], eventdate: str) -> dict:
+        """
+        Archives the given active rates (status=2) and inserts their successors
+        (status=1, same rate and type, new eventdate) in one multi-operation
+        mutation, which Hasura runs as a single transaction.
+
+        Returns the archived and inserted row counts, the new interest ids and
+        the round-trip time in seconds.
+
+        Raises:
+            Exception: If the mutation fails; nothing is rolled forward in that case
+        """
+        if not interests:
+            return {"archived": 0, "inserted": 0, "ids": [], "seconds": 0.0}
+
+        mutation = '''
+            mutation RollForwardFloatingRates(
+                $ids: [uuid!]!,
+                $objects: [couponinterest_insert_input!]!
+            ) {
+                update_couponinterest(
+                    where: { id: { _in: $ids } },
+                    _set: { status: 2 }
+                ) {
+                    affected_rows
+                }
+                insert_couponinterest(objects: $objects) {
+                    affected_rows
+                    returning {
+                        id
+                    }
+                }
+            }
+        '''
+        successors = [
+            CouponInterest(
+                id=str(uuid.uuid4()),
+                isinid=interest.isinid,
+                interestrate=interest.interestrate,
+                eventdate=eventdate,
+                type=interest.type,
+                status=1  # status=1 means current
+            )
+            for interest in interests
+        ]
+        variables = {
+            "ids": [interest.id for interest in interests],
+            "objects": [asdict(successor) for successor in successors]
+        }
+
+        started = time.perf_counter()
+        response_data = self.client.execute(mutation, variables)
+        seconds = time.perf_counter() - started
+
+        if "errors" in response_data:
+            error_messages = [error.get("message", "Unknown error") for error in response_data["errors"]]
+            raise Exception(f"GraphQL transaction failed: {'; '.join(error_messages)}")
+
+        data = response_data.get("data", {})
+        return {
+            "archived": data.get("update_couponinterest", {}).get("affected_rows", 0),
+            "inserted": data.get("insert_couponinterest", {}).get("affected_rows", 0),
+            "ids": [row["id"] for row in data.get("insert_couponinterest", {}).get("returning", [])],
+            "seconds": seconds
+        }
@@ -1,5 +1,4 @@
-import os
-import requests
+from .hasura_client import get_hasura_client
 from dotenv import load_dotenv
 from typing import List
 from ...models.cron_event import CronEventExecutionsResponse
@@ -8,12 +7,7 @@ load_dotenv()
 
 class CronService:
     def __init__(self):
-        base_url = os.getenv("HASURA_BASE_URL", "")
-        self.graphql_url = base_url.rstrip("/") + "/v1/graphql"
-        self.headers = {
-            "content-type": "application/json",
-            "x-hasura-admin-secret": os.getenv("HASURA_ADMIN_SECRET", "")
-        }
+        self.client = get_hasura_client()
 
     def fetch_cron_executions(self, date_of_execution: str) -> CronEventExecutionsResponse:
         query = '''
@@ -36,12 +30,6 @@ class CronService:
 
         '''
         variables = {"date_of_execution": date_of_execution}
-        response = requests.post(
-            self.graphql_url,
-            json={"query": query, "variables": variables},
-            headers=self.headers
-        )
-        response.raise_for_status()
-        data = response.json()
+        data = self.client.execute(query, variables)
         executions = data.get("data", {}).get("cron_event_executions", [])
         return CronEventExecutionsResponse(cron_event_executions=executions)
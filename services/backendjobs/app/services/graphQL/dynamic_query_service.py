@@ -1,25 +1,127 @@
-import os
-import requests
+import json
+import re
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from .hasura_client import get_hasura_client
 from dotenv import load_dotenv
-from typing import List
-from ...models.cron_event import CronEventExecutionsResponse
+from typing import Callable, Dict, Optional
+from ...utils.job_logging import get_logger
 
 load_dotenv()
 
+logger = get_logger(__name__)
+
+# String literals are kept as they are, any other whitespace run becomes one space
+QUERY_TOKEN_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"|\s+')
+
 class DynamicQueryService:
     def __init__(self):
-        base_url = os.getenv("HASURA_BASE_URL", "")
-        self.graphql_url = base_url.rstrip("/") + "/v1/graphql"
-        self.headers = {
-            "content-type": "application/json",
-            "x-hasura-admin-secret": os.getenv("HASURA_ADMIN_SECRET", "")
-        }
-    
+        self.client = get_hasura_client()
+
     def execute_query(self, query: str, variables: dict) -> dict:
-        response = requests.post(
-            self.graphql_url,
-            json={"query": query, "variables": variables},
-            headers=self.headers
-        )
-        response.raise_for_status()
-        return response.json()
\ No newline at end of file
+        """
+        Runs a GraphQL document. Inside query_cache() identical documents with
+        identical variables are answered from the run's cache; the returned dict
+        is then shared and must not be modified.
+        """
+        cache = _current_cache.get()
+        if cache is not None:
+            return cache.get_or_execute(query, variables, self.client.execute)
+        return self.client.execute(query, variables)
+
+def normalize_query(query: str) -> str:
+    return QUERY_TOKEN_PATTERN.sub(lambda m: m.group(0) if m.group(0).startswith('"') else ' ', query).strip()
+
+class QueryResultCache:
+    """
+    Results of dynamic GraphQL queries for one job run, keyed on the normalized
+    query and its variables. Concurrent requests for a key that is already being
+    fetched wait for that call instead of issuing their own.
+    """
+
+    def __init__(self):
+        self._results: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.clears = 0
+
+    def get_or_execute(self, query: str, variables: dict, execute: Callable[[str, dict], dict]) -> dict:
+        key = normalize_query(query) + "\n" + json.dumps(variables, sort_keys=True, default=str)
+        with self._lock:
+            future = self._results.get(key)
+            if future is None:
+                future = Future()
+                self._results[key] = future
+                self.misses += 1
+                owner = True
+            else:
+                if future.done():
+                    self.hits += 1
+                else:
+                    self.coalesced += 1
+                owner = False
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = execute(query, variables)
+        except Exception as e:
+            # Do not keep failures; the next caller retries
+            with self._lock:
+                self._results.pop(key, None)
+            future.set_exception(e)
+            raise
+        if isinstance(result, dict) and "errors" in result:
+            # GraphQL errors are answered to the waiting callers but not reused
+            with self._lock:
+                self._results.pop(key, None)
+        future.set_result(result)
+        return result
+
+    def clear(self):
+        """
+        Forgets every result, e.g. after a job wrote to the database. Calls already
+        in flight still answer the callers waiting on them.
+        """
+        with self._lock:
+            self._results.clear()
+            self.clears += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+                "saved_calls": self.hits + self.coalesced,
+                "clears": self.clears,
+            }
+
+_current_cache: ContextVar[Optional[QueryResultCache]] = ContextVar("query_cache", default=None)
+
+def clear_query_cache():
+    """Clears the active query_cache(), if any."""
+    cache = _current_cache.get()
+    if cache is not None:
+        cache.clear()
+
+@contextmanager
+def query_cache(cache: Optional[QueryResultCache] = None):
+    """
+    Caches DynamicQueryService results for the duration of the block.
+    """
+    cache = cache or QueryResultCache()
+    token = _current_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _current_cache.reset(token)
+        stats = cache.stats()
+        if stats["misses"]:
+            logger.info("Dynamic query cache: %d hit(s), %d coalesced, %d miss(es)",
+                        stats["hits"], stats["coalesced"], stats["misses"])
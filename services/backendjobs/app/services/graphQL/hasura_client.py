@@ -0,0 +1,145 @@
+import os
+import re
+import threading
+import time
+import requests
+from dataclasses import dataclass
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+load_dotenv()
+
+# Picks the operation name out of "query Foo(...)" / "mutation Foo(...)"
+OPERATION_NAME_PATTERN = re.compile(r'\b(?:query|mutation)\s+([_A-Za-z][_0-9A-Za-z]*)')
+
+@dataclass
+class OperationStats:
+    count: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    @property
+    def avg_seconds(self) -> float:
+        return self.total_seconds / self.count if self.count else 0.0
+
+class HasuraClient:
+    """
+    Shared transport for all Hasura GraphQL calls.
+
+    Keeps one pooled keep-alive requests.Session so that services and jobs reuse
+    TCP/TLS connections instead of opening a new one per query, and records
+    per-operation latency counters.
+
+    Configuration (environment):
+        HASURA_BASE_URL, HASURA_ADMIN_SECRET
+        HASURA_POOL_SIZE        max pooled connections (default 10)
+        HASURA_CONNECT_TIMEOUT  seconds (default 5)
+        HASURA_READ_TIMEOUT     seconds (default 60)
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        admin_secret: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+    ):
+        base_url = base_url if base_url is not None else os.getenv("HASURA_BASE_URL", "")
+        self.graphql_url = base_url.rstrip("/") + "/v1/graphql"
+        self.headers = {
+            "content-type": "application/json",
+            "x-hasura-admin-secret": admin_secret if admin_secret is not None else os.getenv("HASURA_ADMIN_SECRET", "")
+        }
+        self.pool_size = pool_size or int(os.getenv("HASURA_POOL_SIZE", "10"))
+        self.timeout = (
+            connect_timeout or float(os.getenv("HASURA_CONNECT_TIMEOUT", "5")),
+            read_timeout or float(os.getenv("HASURA_READ_TIMEOUT", "60")),
+        )
+
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._stats: Dict[str, OperationStats] = {}
+        self._stats_lock = threading.Lock()
+
+    def post(self, query: str, variables: Optional[dict] = None) -> requests.Response:
+        """
+        Sends a GraphQL document and returns the raw response without checking it.
+        """
+        operation = operation_name(query)
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = self.session.post(
+                self.graphql_url,
+                json={"query": query, "variables": variables or {}},
+                timeout=self.timeout
+            )
+            failed = not response.ok
+            return response
+        finally:
+            self._record(operation, time.perf_counter() - started, failed)
+
+    def execute(self, query: str, variables: Optional[dict] = None) -> dict:
+        """
+        Sends a GraphQL document, raises on HTTP errors and returns the decoded body.
+        """
+        response = self.post(query, variables)
+        response.raise_for_status()
+        return response.json()
+
+    def _record(self, operation: str, elapsed: float, failed: bool):
+        with self._stats_lock:
+            stats = self._stats.setdefault(operation, OperationStats())
+            stats.count += 1
+            stats.total_seconds += elapsed
+            stats.max_seconds = max(stats.max_seconds, elapsed)
+            if failed:
+                stats.errors += 1
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        Returns a snapshot of the latency counters keyed by GraphQL operation name.
+        """
+        with self._stats_lock:
+            return {
+                name: {
+                    "count": s.count,
+                    "errors": s.errors,
+                    "total_seconds": s.total_seconds,
+                    "avg_seconds": s.avg_seconds,
+                    "max_seconds": s.max_seconds,
+                }
+                for name, s in self._stats.items()
+            }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats.clear()
+
+    def close(self):
+        self.session.close()
+
+def operation_name(query: str) -> str:
+    match = OPERATION_NAME_PATTERN.search(query)
+    return match.group(1) if match else "anonymous"
+
+_client: Optional[HasuraClient] = None
+_client_lock = threading.Lock()
+
+def get_hasura_client() -> HasuraClient:
+    """
+    Returns the process-wide HasuraClient, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HasuraClient()
+    return _client
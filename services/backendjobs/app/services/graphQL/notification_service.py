@@ -1,8 +1,13 @@
-import os
+import threading
 import uuid
-import requests
+from contextlib import contextmanager
+from contextvars import ContextVar
+from .hasura_client import get_hasura_client
 from typing import List, Optional
 from dataclasses import dataclass
+from ...utils.job_logging import get_logger
+
+logger = get_logger(__name__)
 
 @dataclass
 class Notification:
@@ -19,100 +24,153 @@ class Notification:
 
 class NotificationService:
     def __init__(self):
-        base_url = os.getenv("HASURA_BASE_URL","")
-        self.graphql_url = base_url.rstrip("/") + "/v1/graphql"
-        self.headers = {
-            "content-type": "application/json",
-            "x-hasura-admin-secret": os.getenv("HASURA_ADMIN_SECRET", "")
-        }
+        self.client = get_hasura_client()
+
+    def publish(self, notification: Notification) -> Optional[str]:
+        """
+        Queues the notification in the active NotificationSink, or saves it right
+        away when no sink is active. Returns the notification id.
+        """
+        sink = _current_sink.get()
+        if sink is not None:
+            return sink.add(notification)
+        return self.save_notification(notification)
 
     def save_notification(self, notification: Notification):
-        notificationId = str(uuid.uuid4())
+        """
+        Saves a notification together with its target in one nested insert.
+        """
+        notificationId = notification.notificationid or str(uuid.uuid4())
         mutation = '''
-        mutation InsertNotification(
-            $id: uuid!
-            $title: String
-            $message: String
-            $createdat: timestamp!
-            $createdby: String
-        ) {
-            insert_notifications_one(object: {
-                id: $id
-                title: $title
-                message: $message
-                createdat: $createdat
-                createdby: $createdby
-            }) {
+        mutation InsertNotification($object: notifications_insert_input!) {
+            insert_notifications_one(object: $object) {
                 id
             }
         }
         '''
 
+        variables = {"object": self._to_insert_object(notification, notificationId)}
+        data = self.client.execute(mutation, variables)
+
+        inserted = (data.get("data") or {}).get("insert_notifications_one") or {}
+        if inserted.get("id") == notificationId:
+            notification.notificationid = notificationId
+            return notificationId
+        return None
+
+    def save_notifications(self, notifications: List[Notification]) -> List[str]:
+        """
+        Saves several notifications and their targets with a single insert_notifications mutation.
+        Returns the ids of the inserted notifications.
+        """
+        if not notifications:
+            return []
+
+        mutation = '''
+        mutation InsertNotifications($objects: [notifications_insert_input!]!) {
+            insert_notifications(objects: $objects) {
+                affected_rows
+                returning {
+                    id
+                }
+            }
+        }
+        '''
+        for notification in notifications:
+            notification.notificationid = notification.notificationid or str(uuid.uuid4())
         variables = {
+            "objects": [self._to_insert_object(n, n.notificationid) for n in notifications]
+        }
+
+        response_data = self.client.execute(mutation, variables)
+        if "errors" in response_data:
+            error_messages = [error.get("message", "Unknown error") for error in response_data["errors"]]
+            raise Exception(f"GraphQL transaction failed: {'; '.join(error_messages)}")
+
+        returning = response_data.get("data", {}).get("insert_notifications", {}).get("returning", [])
+        return [row["id"] for row in returning]
+
+    def _to_insert_object(self, notification: Notification, notificationId: str) -> dict:
+        return {
             "id": notificationId,
             "title": notification.title,
             "message": notification.message,
             "createdat": notification.createdat,
             "createdby": notification.createdby,
-        }
-        #print(f"Saving notification with variables: {variables}")
-
-        response = requests.post(
-            self.graphql_url,
-            json={"query": mutation, "variables": variables},
-            headers=self.headers
-        )
-        response.raise_for_status()
-        data = response.json()
-        
-        #print(f"Notification save response: {data}")
-        
-        if response.status_code == 200:
-            inserted = data.get("data", {}).get("insert_notifications_one", {})
-            if inserted and inserted.get("id") == notificationId:
-                #save notification target
-                notification.notificationid = notificationId
-                return self.save_notification_target(notification)
-        return None
-    
-    def save_notification_target(self, notification: Notification):
-        mutation = '''
-        mutation InsertNotificationTarget(
-            $notificationid: uuid!
-            $type: bpchar
-            $target: String
-            $status: Int
-        ) {
-            insert_notificationtargets_one(object: {
-                notificationid: $notificationid
-                type: $type
-                target: $target
-                status: $status
-            }) {
-                notificationid
+            "notificationtargets": {
+                "data": [{
+                    "type": notification.type,
+                    "target": notification.target,
+                    "status": notification.status,
+                }]
             }
         }
-        ''' 
 
-        variables = {
-            "notificationid": notification.notificationid,
-            "type": notification.type,
-            "target": notification.target,
-            "status": notification.status,
-        }
 
-        response = requests.post(
-            self.graphql_url,
-            json={"query": mutation, "variables": variables},
-            headers=self.headers
-        )
-        response.raise_for_status()
-        data = response.json()
-        
-        #print(f"Notification-Target save response: {data}")
-
-        if response.status_code == 200:
-            inserted = data.get("data", {}).get("insert_notificationtargets_one", {})
-            if inserted and inserted.get("notificationid"):
-                return inserted.get("notificationid")
-        return None
\ No newline at end of file
+class NotificationSink:
+    """
+    Collects the notifications published during one job run and writes them
+    with a single batched mutation on flush(). Safe to share between worker threads.
+    """
+
+    def __init__(self, service: Optional[NotificationService] = None):
+        self.service = service or NotificationService()
+        self._pending: List[Notification] = []
+        self._lock = threading.Lock()
+
+    def add(self, notification: Notification) -> str:
+        notification.notificationid = notification.notificationid or str(uuid.uuid4())
+        with self._lock:
+            self._pending.append(notification)
+        return notification.notificationid
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> List[str]:
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return []
+        try:
+            ids = self.service.save_notifications(pending)
+            logger.info("Flushed %d notification(s) in one mutation", len(ids))
+            return ids
+        except Exception as e:
+            logger.error("Failed to flush %d notification(s) in one mutation, saving them one by one: %s",
+                         len(pending), str(e))
+        return self._save_one_by_one(pending)
+
+    def _save_one_by_one(self, pending: List[Notification]) -> List[str]:
+        # One bad row fails the whole batch; this way only that row is lost
+        ids = []
+        for notification in pending:
+            error = "not inserted"
+            try:
+                notification_id = self.service.save_notification(notification)
+            except Exception as e:
+                notification_id, error = None, str(e)
+            if notification_id:
+                ids.append(notification_id)
+            else:
+                logger.error("Dropped notification %s for %s %s (%s): %s", notification.notificationid,
+                             notification.type, notification.target, notification.title, error)
+        logger.info("Saved %d of %d notification(s) one by one", len(ids), len(pending))
+        return ids
+
+_current_sink: ContextVar[Optional[NotificationSink]] = ContextVar("notification_sink", default=None)
+
+@contextmanager
+def notification_sink(sink: Optional[NotificationSink] = None):
+    """
+    Buffers every NotificationService.publish() inside the block and flushes
+    them together when the block exits.
+    """
+    sink = sink or NotificationSink()
+    token = _current_sink.set(sink)
+    try:
+        yield sink
+    finally:
+        _current_sink.reset(token)
+        sink.flush()
@@ -1,9 +1,12 @@
 import os
 import uuid
-import requests
-from typing import List, Optional
+from .hasura_client import get_hasura_client
+from typing import Dict, List, Optional
 from dataclasses import dataclass
 from ...models.trade_history import TradeHistoryByDay
+from ...utils.job_logging import get_logger
+
+logger = get_logger(__name__)
 
 @dataclass
 class Trade:
@@ -18,14 +21,15 @@ class Trade:
   sales: Optional[str]
   tradetype: int
 
+# Max number of aliased trades_history_by_days fields per request
+TRADE_HISTORY_BATCH_SIZE = 50
+
+# Max number of trades per insert_trades mutation
+TRADE_INSERT_CHUNK_SIZE = int(os.getenv("TRADE_INSERT_CHUNK_SIZE", "500"))
+
 class TradeService:
     def __init__(self):
-        base_url = os.getenv("HASURA_BASE_URL","")
-        self.graphql_url = base_url.rstrip("/") + "/v1/graphql"
-        self.headers = {
-            "content-type": "application/json",
-            "x-hasura-admin-secret": os.getenv("HASURA_ADMIN_SECRET", "")
-        }
+        self.client = get_hasura_client()
 
     def get_agg_buy_trades(self, caseid: str) -> List[Trade]:
         query = '''
@@ -45,13 +49,7 @@ class TradeService:
         }
         '''
         variables = {"caseid": caseid}
-        response = requests.post(
-            self.graphql_url,
-            json={"query": query, "variables": variables},
-            headers=self.headers
-        )
-        response.raise_for_status()
-        data = response.json()
+        data = self.client.execute(query, variables)
         trades = data.get("data", {}).get("buy_trade_on_issue", [])
         return [Trade(**trade) for trade in trades]
 
@@ -69,18 +67,38 @@ class TradeService:
         }
         '''
         variables = {"p_isinid": isinid}
-        response = requests.post(
-            self.graphql_url,
-            json={"query": query, "variables": variables},
-            headers=self.headers
-        )
-        response.raise_for_status()
-        data = response.json()
+        data = self.client.execute(query, variables)
         trade_history_data = data.get("data", {}).get("trades_history_by_days", [])
         
         # Convert raw data to typed objects
         return [TradeHistoryByDay(**item) for item in trade_history_data]
 
+    def get_trade_history_by_days_for_isins(self, isinids: List[str]) -> Dict[str, List[TradeHistoryByDay]]:
+        """
+        Retrieves trade history by days for several ISIN IDs, using one aliased
+        trades_history_by_days field per ISIN and at most TRADE_HISTORY_BATCH_SIZE per request.
+        """
+        history: Dict[str, List[TradeHistoryByDay]] = {}
+        for offset in range(0, len(isinids), TRADE_HISTORY_BATCH_SIZE):
+            chunk = isinids[offset:offset + TRADE_HISTORY_BATCH_SIZE]
+            params = ", ".join(f"$p{idx}: uuid!" for idx in range(len(chunk)))
+            fields = "\n".join(
+                f'''
+          h{idx}: trades_history_by_days(args: {{p_isinid: $p{idx}}}, order_by: {{valuedate: asc}}) {{
+            valuedate
+            net_notional
+            loan_cell
+          }}'''
+                for idx in range(len(chunk))
+            )
+            query = f"query TradeHistoryByDaysBatch({params}) {{{fields}\n}}"
+            variables = {f"p{idx}": isinid for idx, isinid in enumerate(chunk)}
+            data = self.client.execute(query, variables).get("data", {})
+
+            for idx, isinid in enumerate(chunk):
+                history[isinid] = [TradeHistoryByDay(**item) for item in data.get(f"h{idx}") or []]
+        return history
+
     def save_trade(self, trade: Trade):
         mutation = '''
         mutation InsertTrade(
@@ -141,11 +159,96 @@ class TradeService:
             "tradetype": trade.tradetype
         }
        
-        response = requests.post(
-            self.graphql_url,
-            json={"query": mutation, "variables": variables},
-            headers=self.headers
-        )
-        response.raise_for_status()
-        data = response.json()
-        return data.get("data", {}).get("insert_trades_one", None)
\ No newline at end of file
+        data = self.client.execute(mutation, variables)
+        return data.get("data", {}).get("insert_trades_one", None)
+
+    def save_trades(self, trades: List[Trade], issue_caseid: Optional[str] = None, chunk_size: Optional[int] = None) -> dict:
+        """
+        Inserts trades with insert_trades, chunk_size rows per mutation.
+
+        When issue_caseid is given, the compartment status change to issued (9)
+        is sent in the same mutation as the last chunk, so a set that fits in one
+        chunk is written in a single transaction. If a later chunk fails, the rows
+        of the chunks already committed are deleted again before the error is raised.
+
+        Returns the number of inserted trades and whether the case was issued.
+        """
+        chunk_size = chunk_size or TRADE_INSERT_CHUNK_SIZE
+        objects = [self._to_insert_object(trade) for trade in trades]
+        chunks = [objects[offset:offset + chunk_size] for offset in range(0, len(objects), chunk_size)] or [[]]
+
+        inserted_ids: List[str] = []
+        result = {"inserted": 0, "issued": False, "mutations": 0}
+        try:
+            for idx, chunk in enumerate(chunks):
+                is_last = idx == len(chunks) - 1
+                data = self._insert_trades_chunk(chunk, issue_caseid if is_last else None)
+                result["mutations"] += 1
+                inserted_ids.extend(obj["id"] for obj in chunk)
+                result["inserted"] += data.get("insert_trades", {}).get("affected_rows", 0) if chunk else 0
+                if is_last and issue_caseid:
+                    result["issued"] = data.get("update_cases_by_pk") is not None
+        except Exception:
+            if inserted_ids:
+                try:
+                    self.delete_trades(inserted_ids)
+                except Exception:
+                    # Keep the insert error; the rows left behind have to be removed by hand
+                    logger.exception("Deleting %d partially inserted trades failed, left in trades: %s",
+                                     len(inserted_ids), ", ".join(inserted_ids))
+            raise
+        return result
+
+    def _insert_trades_chunk(self, objects: List[dict], issue_caseid: Optional[str]) -> dict:
+        operations = []
+        params = []
+        variables = {}
+        if objects:
+            params.append("$objects: [trades_insert_input!]!")
+            operations.append('''
+            insert_trades(objects: $objects) {
+                affected_rows
+            }''')
+            variables["objects"] = objects
+        if issue_caseid:
+            params.append("$caseid: uuid!")
+            operations.append('''
+            update_cases_by_pk(pk_columns: { id: $caseid }, _set: { compartmentstatusid: 9 }) {
+                compartmentstatusid
+            }''')
+            variables["caseid"] = issue_caseid
+        mutation = f"mutation InsertTrades({', '.join(params)}) {{{''.join(operations)}\n}}"
+
+        response_data = self.client.execute(mutation, variables)
+        if "errors" in response_data:
+            error_messages = [error.get("message", "Unknown error") for error in response_data["errors"]]
+            raise Exception(f"GraphQL transaction failed: {'; '.join(error_messages)}")
+        return response_data.get("data", {})
+
+    def delete_trades(self, ids: List[str]) -> int:
+        mutation = '''
+        mutation DeleteTrades($ids: [uuid!]!) {
+            delete_trades(where: {id: {_in: $ids}}) {
+                affected_rows
+            }
+        }
+        '''
+        data = self.client.execute(mutation, {"ids": ids})
+        return data.get("data", {}).get("delete_trades", {}).get("affected_rows", 0)
+
+    def _to_insert_object(self, trade: Trade) -> dict:
+        # Same columns save_trade writes
+        return {
+            "id": str(uuid.uuid4()),
+            "bank_investor": trade.bank_investor,
+            "counterparty": trade.counterparty,
+            "isinid": trade.isinid,
+            "notional": trade.notional,
+            "price_dirty": 0.0,
+            "reference": trade.reference,
+            "tranfee": trade.tranfee,
+            "tradedate": trade.tradedate,
+            "valuedate": trade.valuedate,
+            "transtatus": 1,
+            "tradetype": trade.tradetype
+        }
@@ -1,9 +1,24 @@
+import contextvars
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Tuple
 from app.jobs.update_compartment_status import run as update_compartment_status_run
 from app.jobs.update_compartment_status_to_maturity import run as update_compartment_status_to_maturity_run
 from app.jobs.forward_floating_interest_rate import run as forward_floating_interest_rate_run
+from app.jobs.forward_floating_interest_rate import run_batch as forward_floating_interest_rate_run_batch
 from app.jobs.notification_job import run as notification_job_run
 from app.jobs.create_coupon_payment_entry import run as create_coupon_payment_entry_run
+from app.jobs.create_coupon_payment_entry import run_batch as create_coupon_payment_entry_run_batch
 from app.models.cron_event import CronEventExecution
+from app.services.graphQL.hasura_client import get_hasura_client
+from app.services.graphQL.notification_service import notification_sink
+from app.services.graphQL.dynamic_query_service import clear_query_cache, query_cache
+from app.utils.job_logging import get_logger, job_context
+
+logger = get_logger(__name__)
 
 NOTIFICATION_EVENTS = [
      "LoanIssuance2Client",
@@ -26,10 +41,168 @@ JOB_MAP = {
 for event in NOTIFICATION_EVENTS:
     JOB_MAP[event] = notification_job_run
 
+# Jobs that can process all cases of a day in one call
+BATCH_JOB_MAP = {}
+
+if os.getenv("COUPON_PAYMENT_BATCH_MODE", "false").lower() == "true":
+    BATCH_JOB_MAP["CreateCouponPaymentEntry"] = create_coupon_payment_entry_run_batch
+
+if os.getenv("FLOATING_RATE_BATCH_MODE", "false").lower() == "true":
+    BATCH_JOB_MAP["UpdateCouponInterestRate"] = forward_floating_interest_rate_run_batch
+
+# Number of cases whose executions may run at the same time
+JOB_EXECUTOR_MAX_WORKERS = int(os.getenv("JOB_EXECUTOR_MAX_WORKERS", "4"))
+
+@dataclass
+class JobTiming:
+    caseid: str
+    event: str
+    execution_order: float
+    seconds: float
+    error: Optional[str] = None
+    batch_size: int = 1
+
 # Execute the job based on the event type
 def execute_job(execution: CronEventExecution):
     job_func = JOB_MAP.get(execution.event)
     if job_func:
         job_func(execution)
     else:
-        print(f"Unknown event: {execution.event}")
+        logger.warning("Unknown event: %s", execution.event)
+
+def execute_jobs(executions: List[CronEventExecution], max_workers: Optional[int] = None) -> dict:
+    """
+    Runs a day's cron event executions on a bounded worker pool.
+
+    Executions of different cases run concurrently, while the executions of one
+    case run one after another in execution_order. Events in BATCH_JOB_MAP run
+    as a single call for all cases; everything ordered before them finishes
+    first and everything ordered after them waits, so per-case ordering holds.
+    A failing job is recorded and does not stop the remaining jobs. Notifications
+    published by the jobs are buffered and written in one mutation at the end
+    of the run, and identical dynamic notification queries are sent only once
+    between writes: the query cache is cleared after every job that is not a
+    notification and after every stage.
+    Returns the total and per-job timing.
+    """
+    workers = max_workers or JOB_EXECUTOR_MAX_WORKERS
+    started = time.perf_counter()
+
+    timings: List[JobTiming] = []
+    with notification_sink(), query_cache() as queries:
+        for stage, is_batch in split_stages(executions):
+            if is_batch:
+                timings.append(timed_execute_batch(stage))
+            else:
+                timings.extend(run_case_chains(stage, workers))
+            # Later stages must not see results from before this stage's writes
+            queries.clear()
+
+    total_seconds = time.perf_counter() - started
+    failed = [t for t in timings if t.error]
+    case_count = len({execution.caseid for execution in executions})
+    logger.info("Executed %d job(s) for %d case(s) in %.3fs with %d worker(s), %d failed.",
+                len(executions), case_count, total_seconds, workers, len(failed))
+    for timing in timings:
+        status = f"FAILED ({timing.error})" if timing.error else "ok"
+        target = f"batch of {timing.batch_size}" if timing.batch_size > 1 else f"case={timing.caseid}"
+        logger.info("  %s %s order=%s: %.3fs %s", timing.event, target, timing.execution_order, timing.seconds, status)
+
+    return {
+        "total_seconds": total_seconds,
+        "workers": workers,
+        "jobs": [asdict(t) for t in timings],
+        "hasura": get_hasura_client().stats(),
+        "query_cache": queries.stats(),
+    }
+
+def split_stages(executions: List[CronEventExecution]) -> List[Tuple[List[CronEventExecution], bool]]:
+    """
+    Splits executions into consecutive stages at every batched (event, execution_order).
+
+    Returns (executions, is_batch) pairs: regular stages run as parallel case
+    chains, batch stages hold all executions of one batched event.
+    """
+    barriers = sorted({
+        (execution.execution_order, execution.event)
+        for execution in executions
+        if execution.event in BATCH_JOB_MAP
+    })
+    remaining = [execution for execution in executions if execution.event not in BATCH_JOB_MAP]
+
+    stages = []
+    for order, event in barriers:
+        before = [execution for execution in remaining if execution.execution_order <= order]
+        remaining = [execution for execution in remaining if execution.execution_order > order]
+        if before:
+            stages.append((before, False))
+        stages.append(([
+            execution for execution in executions
+            if execution.event == event and execution.execution_order == order
+        ], True))
+    if remaining:
+        stages.append((remaining, False))
+    return stages
+
+def run_case_chains(executions: List[CronEventExecution], workers: int) -> List[JobTiming]:
+    timings: List[JobTiming] = []
+    case_chains = group_by_case(executions)
+    if case_chains:
+        with ThreadPoolExecutor(max_workers=min(workers, len(case_chains)), thread_name_prefix="cron-job") as pool:
+            # Each chain runs in a copy of this context so it sees the run's notification sink and query cache
+            contexts = [contextvars.copy_context() for _ in case_chains]
+            for case_timings in pool.map(lambda ctx, chain: ctx.run(run_case_chain, chain), contexts, case_chains):
+                timings.extend(case_timings)
+    return timings
+
+def group_by_case(executions: List[CronEventExecution]) -> List[List[CronEventExecution]]:
+    """
+    Splits executions into one chain per caseid, each sorted by execution_order.
+    """
+    chains: Dict[str, List[CronEventExecution]] = defaultdict(list)
+    for execution in executions:
+        chains[execution.caseid].append(execution)
+    return [sorted(chain, key=lambda e: e.execution_order) for chain in chains.values()]
+
+def run_case_chain(chain: List[CronEventExecution]) -> List[JobTiming]:
+    return [timed_execute_job(execution) for execution in chain]
+
+def timed_execute_job(execution: CronEventExecution) -> JobTiming:
+    started = time.perf_counter()
+    error = None
+    with job_context(execution):
+        try:
+            execute_job(execution)
+        except Exception as e:
+            error = str(e)
+            logger.error("Job %s failed for case %s: %s", execution.event, execution.caseid, error)
+        finally:
+            if execution.event not in NOTIFICATION_EVENTS:
+                # The job may have written (also when it failed halfway): drop cached query results
+                clear_query_cache()
+    return JobTiming(
+        caseid=execution.caseid,
+        event=execution.event,
+        execution_order=execution.execution_order,
+        seconds=time.perf_counter() - started,
+        error=error
+    )
+
+def timed_execute_batch(executions: List[CronEventExecution]) -> JobTiming:
+    event = executions[0].event
+    started = time.perf_counter()
+    error = None
+    with job_context(caseid="*", event=event, executiondate=executions[0].executiondate):
+        try:
+            BATCH_JOB_MAP[event](executions)
+        except Exception as e:
+            error = str(e)
+            logger.error("Batch job %s failed for %d execution(s): %s", event, len(executions), error)
+    return JobTiming(
+        caseid="*",
+        event=event,
+        execution_order=executions[0].execution_order,
+        seconds=time.perf_counter() - started,
+        error=error,
+        batch_size=len(executions)
+    )
@@ -1,4 +1,15 @@
+import os
 import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+PLACEHOLDER_PATTERN = re.compile(r'@([^@]+)@')
+
+# Number of distinct templates kept compiled
+TEMPLATE_CACHE_SIZE = int(os.getenv("TEMPLATE_CACHE_SIZE", "256"))
+
+# One path segment: the dict key and, for list access, the parsed index
+PathKey = Tuple[str, Optional[int]]
 
 def deep_get(data, path):
     keys = path.split('.')
@@ -14,9 +25,55 @@ def deep_get(data, path):
             data = data.get(key)
     return data
 
+def split_path(path: str) -> Tuple[PathKey, ...]:
+    keys = []
+    for key in path.split('.'):
+        try:
+            index = int(key)
+        except ValueError:
+            index = None
+        keys.append((key, index))
+    return tuple(keys)
+
+def get_by_keys(data, keys: Tuple[PathKey, ...]):
+    """
+    deep_get for a path already split by split_path.
+    """
+    for key, index in keys:
+        if isinstance(data, list):
+            data = data[index if index is not None else 0]  # default to first element
+        else:
+            data = data.get(key)
+    return data
+
+class CompiledTemplate:
+    """
+    A template parsed once into literal segments and placeholder accessors.
+    literals has one more entry than accessors; rendering interleaves them.
+    """
+    __slots__ = ("literals", "accessors")
+
+    def __init__(self, literals: List[str], accessors: List[Tuple[PathKey, ...]]):
+        self.literals = literals
+        self.accessors = accessors
+
+    def render(self, data) -> str:
+        parts = [self.literals[0]]
+        for keys, literal in zip(self.accessors, self.literals[1:]):
+            value = get_by_keys(data, keys)
+            parts.append(str(value) if value is not None else '')
+            parts.append(literal)
+        return ''.join(parts)
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(template: str) -> CompiledTemplate:
+    # re.split with one capture group alternates literal, path, literal, ...
+    pieces = PLACEHOLDER_PATTERN.split(template)
+    return CompiledTemplate(pieces[0::2], [split_path(path) for path in pieces[1::2]])
+
 def replace_template_vars(template, data):
-    def replacer(match):
-        path = match.group(1)
-        value = deep_get(data['data'], path)
-        return str(value) if value is not None else ''
-    return re.sub(r'@([^@]+)@', replacer, template)
\ No newline at end of file
+    compiled = compile_template(template)
+    if not compiled.accessors:
+        # Nothing to look up: the response may even lack its data
+        return template
+    return compiled.render(data['data'])
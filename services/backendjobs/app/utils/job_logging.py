@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Below DEBUG: per-trade / per-row detail that is off unless LOG_LEVEL=TRACE
+TRACE = 5
+logging.addLevelName(TRACE, "TRACE")
+
+CONTEXT_FIELDS = ("caseid", "event", "executiondate")
+
+LOG_LEVELS = {"TRACE": TRACE, "DEBUG": logging.DEBUG, "INFO": logging.INFO,
+              "WARNING": logging.WARNING, "ERROR": logging.ERROR, "CRITICAL": logging.CRITICAL}
+
+_job_context: ContextVar[dict] = ContextVar("job_context", default={})
+
+class JobLogger(logging.LoggerAdapter):
+    """
+    Logger with a trace() level. Pass format arguments separately
+    (logger.trace("x=%s", x)) so that nothing is formatted while TRACE is off.
+    """
+
+    def trace(self, msg, *args, **kwargs):
+        if self.logger.isEnabledFor(TRACE):
+            self.logger._log(TRACE, msg, args, **kwargs)
+
+    def is_tracing(self) -> bool:
+        return self.logger.isEnabledFor(TRACE)
+
+    def process(self, msg, kwargs):
+        return msg, kwargs
+
+def get_logger(name: str) -> JobLogger:
+    return JobLogger(logging.getLogger(name), {})
+
+@contextmanager
+def job_context(execution=None, **fields):
+    """
+    Attaches caseid, event and execution date to every record logged inside the block,
+    including records from helpers and services that do not know the execution.
+    """
+    context = dict(_job_context.get())
+    if execution is not None:
+        context.update({name: getattr(execution, name, None) for name in CONTEXT_FIELDS})
+    context.update(fields)
+    token = _job_context.set(context)
+    try:
+        yield
+    finally:
+        _job_context.reset(token)
+
+class JobContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _job_context.get()
+        for name in CONTEXT_FIELDS:
+            if not hasattr(record, name):
+                setattr(record, name, context.get(name, "-"))
+        return True
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name in CONTEXT_FIELDS:
+            entry[name] = getattr(record, name, "-")
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [case=%(caseid)s event=%(event)s date=%(executiondate)s] %(message)s"
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None):
+    """
+    Sets up the "app" logger hierarchy.
+
+    LOG_LEVEL: TRACE, DEBUG, INFO (default), WARNING, ERROR
+    LOG_FORMAT: text (default) or json
+    """
+    level_name = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "text")).lower()
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.addFilter(JobContextFilter())
+    handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    logger = logging.getLogger("app")
+    logger.handlers = [handler]
+    logger.setLevel(LOG_LEVELS.get(level_name, logging.INFO))
+    logger.propagate = False
+    if level_name not in LOG_LEVELS:
+        logger.warning("Unknown LOG_LEVEL %r, logging at INFO", level_name)
@@ -0,0 +1,55 @@
+"""
+Golden-output benchmark for the coupon accrual kernel.
+
+Generates synthetic daily trade histories, checks that accrue_periods returns
+exactly what the reference loop returns and reports the time of both.
+
+Usage (from services/backendjobs):
+    PYTHONPATH=. python benchmarks/accrual_benchmark.py [rows ...]
+"""
+import sys
+import time
+from datetime import date, timedelta
+import numpy as np
+from app.utils.accrual import accrue_periods, accrue_periods_reference
+
+DEFAULT_SIZES = [10, 100, 1_000, 10_000, 100_000, 1_000_000]
+
+def synthetic_history(rows: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    first = date(2000, 1, 1)
+    # Strictly increasing value dates with gaps of 1-3 days
+    offsets = np.cumsum(rng.integers(1, 4, size=rows))
+    valuedates = [(first + timedelta(days=int(o))).isoformat() for o in offsets]
+    # Mix of buys and sells, some with cents
+    net_notionals = (rng.integers(-50_000, 100_000, size=rows) + rng.integers(0, 100, size=rows) / 100).tolist()
+    end = (first + timedelta(days=int(offsets[-1]) + 30)).isoformat()
+    return valuedates, net_notionals, end
+
+def assert_same(expected, actual):
+    assert len(expected) == len(actual), "period count differs"
+    assert np.array_equal(expected.startdates, actual.startdates), "start dates differ"
+    assert np.array_equal(expected.enddates, actual.enddates), "end dates differ"
+    assert np.array_equal(expected.days, actual.days), "day counts differ"
+    assert np.array_equal(expected.cumulative_notional, actual.cumulative_notional), "cumulative notional differs"
+    assert np.array_equal(expected.accrued_amount, actual.accrued_amount), "accrued amounts differ"
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+def main(sizes):
+    rate = 0.0475
+    initial_notional = 250_000
+    print(f"{'rows':>10} {'reference (s)':>14} {'kernel (s)':>11} {'speedup':>8}")
+    for rows in sizes:
+        valuedates, net_notionals, end = synthetic_history(rows)
+        expected, reference_seconds = timed(accrue_periods_reference, valuedates, net_notionals, end, rate, initial_notional)
+        actual, kernel_seconds = timed(accrue_periods, valuedates, net_notionals, end, rate, initial_notional)
+        assert_same(expected, actual)
+        print(f"{rows:>10} {reference_seconds:>14.4f} {kernel_seconds:>11.4f} {reference_seconds / kernel_seconds:>7.1f}x")
+    print("All kernel outputs match the reference loop.")
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
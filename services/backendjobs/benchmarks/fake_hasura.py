@@ -0,0 +1,56 @@
+"""
+Minimal stand-in for the Hasura GraphQL endpoint used by the benchmarks.
+
+Answers every POST /v1/graphql with a canned response built by a handler
+function, after sleeping a fixed per-request latency (network + Hasura
+overhead) plus a per-row cost, so that round-trip counts show up in timings.
+"""
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+class FakeHasura:
+    def __init__(self, respond: Callable[[str, dict], dict], latency: float = 0.002, per_row: float = 0.00002):
+        self.respond = respond
+        self.latency = latency
+        self.per_row = per_row
+        self.requests = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Avoid Nagle / delayed-ACK stalls between header and body writes
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                fake.requests += 1
+                variables = body.get("variables") or {}
+                rows = max((len(v) for v in variables.values() if isinstance(v, list)), default=1)
+                time.sleep(fake.latency + fake.per_row * rows)
+                payload = json.dumps(fake.respond(body["query"], variables)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,68 @@
+"""
+Per-trade overhead of job tracing.
+
+Simulates the per-trade trace lines of the coupon accrual loop and reports the
+cost per processed trade for the former print() f-strings, for TRACE disabled
+and for TRACE enabled. Output goes to os.devnull so only formatting and
+logging overhead is measured.
+
+Usage (from services/backendjobs):
+    PYTHONPATH=. python benchmarks/logging_benchmark.py [trades]
+"""
+import contextlib
+import os
+import sys
+import time
+from app.models.trade_history import TradeHistoryByDay
+from app.utils.job_logging import configure_logging, get_logger, job_context
+
+logger = get_logger("app.benchmarks.logging")
+
+def synthetic_trades(count: int):
+    return [TradeHistoryByDay(valuedate=f"2024-01-{(i % 28) + 1:02d}", net_notional=1000.0 + i, loan_cell=1) for i in range(count)]
+
+def print_loop(trades):
+    cumulative = 0
+    for idx, trade in enumerate(trades):
+        print(f"[TRACE] Processing trade {idx + 1}/{len(trades)}: Value date: {trade.valuedate}, Net notional: {trade.net_notional}")
+        cumulative += trade.net_notional
+        print(f"[TRACE] Cumulative notional: {cumulative}, Interest rate: {0.05}")
+
+def logging_loop(trades):
+    cumulative = 0
+    for idx, trade in enumerate(trades):
+        logger.trace("Processing trade %s/%s: Value date: %s, Net notional: %s", idx + 1, len(trades), trade.valuedate, trade.net_notional)
+        cumulative += trade.net_notional
+        logger.trace("Cumulative notional: %s, Interest rate: %s", cumulative, 0.05)
+
+def baseline_loop(trades):
+    cumulative = 0
+    for trade in trades:
+        cumulative += trade.net_notional
+
+def per_trade_ns(func, trades) -> float:
+    started = time.perf_counter()
+    func(trades)
+    return (time.perf_counter() - started) / len(trades) * 1e9
+
+def main(count: int):
+    trades = synthetic_trades(count)
+    execution = type("Execution", (), {"caseid": "bench", "event": "CreateCouponPaymentEntry", "executiondate": "2024-12-31"})()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), job_context(execution):
+        # configure_logging binds the handler to the current (redirected) stdout
+        results = {"no tracing (loop only)": per_trade_ns(baseline_loop, trades)}
+        results["print f-strings (before)"] = per_trade_ns(print_loop, trades)
+        configure_logging("INFO")
+        results["logger, TRACE off"] = per_trade_ns(logging_loop, trades)
+        configure_logging("TRACE")
+        results["logger, TRACE on"] = per_trade_ns(logging_loop, trades)
+        configure_logging("TRACE", "json")
+        results["logger, TRACE on (json)"] = per_trade_ns(logging_loop, trades)
+
+    print(f"{count} trades, 2 trace lines per trade")
+    for name, ns in results.items():
+        print(f"  {name:<28} {ns:>10.0f} ns/trade")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
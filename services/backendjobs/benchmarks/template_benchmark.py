@@ -0,0 +1,71 @@
+"""
+Notification template rendering: compiled templates vs. per-call re.sub.
+
+Renders templates with many placeholders against large GraphQL-shaped
+payloads with the former regex implementation and with the compiled,
+cached templates, checks that both produce the same text and reports the
+time per render.
+
+Usage (from services/backendjobs):
+    PYTHONPATH=. python benchmarks/template_benchmark.py [renders]
+"""
+import re
+import sys
+import time
+from app.utils.deep_template_replacer import compile_template, deep_get, replace_template_vars
+
+def replace_template_vars_regex(template, data):
+    # Implementation before templates were compiled and cached
+    def replacer(match):
+        path = match.group(1)
+        value = deep_get(data['data'], path)
+        return str(value) if value is not None else ''
+    return re.sub(r'@([^@]+)@', replacer, template)
+
+def payload(isins: int, trades_per_isin: int) -> dict:
+    return {
+        "data": {
+            "cases": [{
+                "id": "6f1c1b6e-0000-0000-0000-000000000001",
+                "compartmentname": "Compartment A",
+                "issuedate": "2024-01-02",
+                "maturitydate": "2029-01-02",
+                "spv": {"name": "MTCM SPV", "address": {"city": "Zurich", "country": "CH"}},
+                "caseisins": [{
+                    "isinnumber": f"CH{idx:010d}",
+                    "couponinterests": [{"interestrate": 0.05 + idx / 1000, "eventdate": "2024-06-30"}],
+                    "trades": [{"notional": 1000 * t, "valuedate": "2024-02-01"} for t in range(trades_per_isin)],
+                } for idx in range(isins)],
+            }]
+        }
+    }
+
+def template(placeholders: int) -> str:
+    paths = [
+        "cases.0.compartmentname", "cases.0.issuedate", "cases.0.maturitydate", "cases.0.spv.name",
+        "cases.0.spv.address.city", "cases.0.caseisins.0.isinnumber", "cases.0.caseisins.1.isinnumber",
+        "cases.0.caseisins.first.couponinterests.0.interestrate", "cases.0.caseisins.2.trades.3.notional",
+        "cases.0.missing",
+    ]
+    parts = [f"<p>Line {idx}: @{paths[idx % len(paths)]}@</p>" for idx in range(placeholders)]
+    return "<div>" + "".join(parts) + "</div>"
+
+def per_render_us(func, tmpl, data, renders: int) -> float:
+    started = time.perf_counter()
+    for _ in range(renders):
+        func(tmpl, data)
+    return (time.perf_counter() - started) / renders * 1e6
+
+def main(renders: int):
+    print(f"{'placeholders':>12} {'isins':>6} {'regex (us)':>11} {'compiled (us)':>14} {'speedup':>8}")
+    for placeholders, isins in [(5, 10), (20, 100), (100, 1_000), (500, 5_000)]:
+        tmpl = template(placeholders)
+        data = payload(isins, trades_per_isin=20)
+        assert replace_template_vars(tmpl, data) == replace_template_vars_regex(tmpl, data)
+        regex_us = per_render_us(replace_template_vars_regex, tmpl, data, renders)
+        compiled_us = per_render_us(replace_template_vars, tmpl, data, renders)
+        print(f"{placeholders:>12} {isins:>6} {regex_us:>11.1f} {compiled_us:>14.1f} {regex_us / compiled_us:>7.1f}x")
+    print(f"Template cache: {compile_template.cache_info()}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000)
@@ -0,0 +1,72 @@
+"""
+Per-row vs bulk subscription-to-trade consolidation.
+
+Runs consolidate_subscriptions_to_trades + update_compartment_status (one
+insert_trades_one per trade) and consolidate_and_issue_compartment (chunked
+insert_trades with the status change in the same mutation) against a local
+fake Hasura endpoint with a simulated per-request latency.
+
+Usage (from services/backendjobs):
+    PYTHONPATH=. python benchmarks/trade_consolidation_benchmark.py [--latency-ms 2] [rows ...]
+"""
+import argparse
+import time
+from benchmarks.fake_hasura import FakeHasura
+from app.jobs import update_compartment_status as job
+from app.services.graphQL import hasura_client
+from app.utils.job_logging import configure_logging
+
+def make_responder(rows: int):
+    subscription = {
+        "isinid": "00000000-0000-0000-0000-000000000001",
+        "tradedate": "2024-01-02T00:00:00",
+        "valuedate": "2024-01-04T00:00:00",
+        "notional": 100000,
+        "tranfee": 0,
+        "counterparty": "Bank",
+        "reference": "REF",
+        "bank_investor": "Investor",
+        "sales": None,
+        "tradetype": 2,
+    }
+
+    def respond(query: str, variables: dict) -> dict:
+        if "GET_AGG_BUY_TRADES" in query:
+            return {"data": {"buy_trade_on_issue": [subscription] * rows}}
+        if "insert_trades_one" in query:
+            return {"data": {"insert_trades_one": dict(variables)}}
+        data = {}
+        if "insert_trades(" in query:
+            data["insert_trades"] = {"affected_rows": len(variables["objects"])}
+        if "update_cases_by_pk" in query:
+            data["update_cases_by_pk"] = {"compartmentstatusid": 9}
+        return {"data": data}
+    return respond
+
+def timed(fake: FakeHasura, func, *args):
+    fake.requests = 0
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started, fake.requests
+
+def per_row(caseid: str):
+    job.consolidate_subscriptions_to_trades(caseid)
+    job.update_compartment_status(caseid)
+
+def main(sizes, latency_ms: float):
+    configure_logging("ERROR")
+    print(f"{'rows':>7} {'per-row (s)':>12} {'requests':>9} {'bulk (s)':>9} {'requests':>9} {'speedup':>8}")
+    for rows in sizes:
+        with FakeHasura(make_responder(rows), latency=latency_ms / 1000) as fake:
+            hasura_client._client = hasura_client.HasuraClient(base_url=fake.base_url, admin_secret="")
+            per_row_seconds, per_row_requests = timed(fake, per_row, "case")
+            bulk_seconds, bulk_requests = timed(fake, job.consolidate_and_issue_compartment, "case")
+        print(f"{rows:>7} {per_row_seconds:>12.3f} {per_row_requests:>9} {bulk_seconds:>9.3f} {bulk_requests:>9} "
+              f"{per_row_seconds / bulk_seconds:>7.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rows", nargs="*", type=int, default=[10, 100, 1_000, 5_000])
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    args = parser.parse_args()
+    main(args.rows, args.latency_ms)
@@ -0,0 +1,21 @@
+import unittest
+from app.utils.deep_template_replacer import replace_template_vars
+
+class ReplaceTemplateVarsTest(unittest.TestCase):
+    def test_replaces_placeholders(self):
+        data = {"data": {"cases": [{"compartmentname": "Compartment A", "spv": None}]}}
+        self.assertEqual(
+            replace_template_vars("<p>@cases.0.compartmentname@ @cases.first.spv@</p>", data),
+            "<p>Compartment A </p>",
+        )
+
+    def test_template_without_placeholders_needs_no_data(self):
+        self.assertEqual(replace_template_vars("<p>No placeholders</p>", {"errors": [{"message": "denied"}]}),
+                         "<p>No placeholders</p>")
+
+    def test_placeholder_without_data_raises(self):
+        with self.assertRaises(KeyError):
+            replace_template_vars("<p>@cases.0.id@</p>", {"errors": [{"message": "denied"}]})
+
+if __name__ == "__main__":
+    unittest.main()
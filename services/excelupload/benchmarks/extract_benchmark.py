@@ -0,0 +1,182 @@
+"""
+Subscription workbook extraction: time and peak memory of the former
+process_excel (load_workbook with the full cell model, sheets one after
+another) against the streaming extractor, in-process and across workers.
+
+Workbooks of increasing size are synthesized: one sheet per ISIN with the
+"<paying agent> <compartment> - <ISIN>" header in A1 and trade rows from row 4
+(date, counterparty, notional, reference), some cancelled with strikethrough.
+Strings go to the shared string table, as Excel saves them.
+Every extraction runs in a fresh process; memory is the peak RSS above the
+process baseline after imports (worker processes not included). All
+extractions of a workbook must return identical results.
+
+Run from the service directory:
+    PYTHONPATH=. python benchmarks/extract_benchmark.py                      # 10x1k, 40x5k and 80x10k sheets x rows
+    PYTHONPATH=. python benchmarks/extract_benchmark.py 40x20000 --workers 1 4
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timedelta
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+DEFAULT_SIZES = ["10x1000", "40x5000", "80x10000"]
+COUNTERPARTIES = ["Allfunds Bank", "Clearstream Banking", "Euroclear Bank", "BNP Paribas SS", "Pictet & Cie",
+                  "UBS Switzerland", "Banque Internationale", "Inversis Banco", "Credit Suisse (Lux)", "Vontobel"]
+
+
+# ── The extractor before ─────────────────────────────────────────────────────
+
+def former_process_excel(file_bytes):
+    from excel_extractor import parse_header, parse_body
+    wb = load_workbook(io.BytesIO(file_bytes), data_only=True)
+    result = []
+    for sheetname in wb.sheetnames:
+        sheet = wb[sheetname]
+        try:
+            header = parse_header(sheet)
+            body = parse_body(sheet)
+            result.append({'sheet': sheetname, 'header': header, 'body': body})
+        except Exception as e:
+            result.append({'sheet': sheetname, 'error': str(e)})
+    return result
+
+
+# ── Test files ───────────────────────────────────────────────────────────────
+
+def write_workbook(sheets, rows, path, seed=3):
+    rng = random.Random(seed)
+    wb = Workbook(write_only=True)
+    plain, struck = Font(name="Calibri"), Font(name="Calibri", strike=True)
+    for s in range(sheets):
+        isin = f"LU{2_000_000_000 + s:010d}"
+        ws = wb.create_sheet(isin)
+        ws.append([f"{rng.choice(['ALLFUNDS', 'CACEIS', 'RBC'])} C{s % 7 + 1} - {isin}"])
+        ws.append([])
+        ws.append(["Trade date", "Counterparty", "Notional", "Reference"])
+        day = datetime(2023, 1, 2)
+        for r in range(rows):
+            day += timedelta(days=rng.random() < 0.3)
+            font = struck if rng.random() < 0.03 else plain
+            values = [day, rng.choice(COUNTERPARTIES), round(rng.uniform(1_000, 2_000_000), 2), f"SUB-{s:03d}-{r:06d}"]
+            cells = []
+            for column, value in enumerate(values):
+                cell = WriteOnlyCell(ws, value)
+                # Cancelled subscriptions: the notional (negated) or another cell struck through
+                if font is struck and (column == 2 or rng.random() < 0.5):
+                    cell.font = struck
+                if column == 0:
+                    cell.number_format = "dd/mm/yyyy"
+                cells.append(cell)
+            ws.append(cells)
+    wb.save(path)
+    use_shared_strings(path)
+
+
+def use_shared_strings(path):
+    # openpyxl writes inline strings; Excel keeps them in xl/sharedStrings.xml
+    index = {}
+
+    def shared(match):
+        return f't="s"><v>{index.setdefault(match.group(1), len(index))}</v></c>'
+
+    with zipfile.ZipFile(path) as src:
+        files = {info.filename: src.read(info.filename) for info in src.infolist()}
+    for name in files:
+        if name.startswith("xl/worksheets/sheet"):
+            files[name] = re.sub(r't="inlineStr"><is><t(?: [^>]*)?>(.*?)</t></is></c>', shared, files[name].decode()).encode()
+    files["xl/sharedStrings.xml"] = (
+        f'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" uniqueCount="{len(index)}">'
+        + "".join(f"<si><t>{text}</t></si>" for text in index) + "</sst>").encode()
+    files["[Content_Types].xml"] = files["[Content_Types].xml"].replace(
+        b"</Types>", b'<Override PartName="/xl/sharedStrings.xml" '
+                     b'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>')
+    files["xl/_rels/workbook.xml.rels"] = files["xl/_rels/workbook.xml.rels"].replace(
+        b"</Relationships>", b'<Relationship Id="rIdStrings" Target="sharedStrings.xml" '
+                             b'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings"/></Relationships>')
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as dst:
+        for name, body in files.items():
+            dst.writestr(name, body)
+
+
+# ── One measurement per process ──────────────────────────────────────────────
+
+def rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(mode, path):
+    import excel_extractor
+    with open(path, "rb") as f:
+        file_bytes = f.read()
+    extract = former_process_excel if mode == "former" else excel_extractor.process_excel
+    baseline = rss_kb()
+    started = time.perf_counter()
+    result = extract(file_bytes)
+    seconds = time.perf_counter() - started
+    peak_mb = (rss_kb() - baseline) / 1024
+    digest = hashlib.sha1(repr(result).encode()).hexdigest()
+    rows = sum(len(sheet.get("body", ())) for sheet in result)
+    print(json.dumps({"seconds": seconds, "peak_mb": peak_mb, "rows": rows, "digest": digest}))
+
+
+def write(size, path):
+    # In a subprocess too: the measurements would start from the peak RSS of this process
+    subprocess.run([sys.executable, __file__, "--write", size, path], check=True)
+
+
+def run(mode, path, workers):
+    env = dict(os.environ, EXCEL_EXTRACT_WORKERS=str(workers))
+    out = subprocess.run([sys.executable, __file__, "--measure", mode, path], check=True, capture_output=True,
+                         text=True, env=env).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sizes", nargs="*", default=DEFAULT_SIZES, help="SHEETSxROWS")
+    parser.add_argument("--workers", nargs="*", type=int, default=sorted({1, os.cpu_count() or 1}),
+                        help="EXCEL_EXTRACT_WORKERS values to measure")
+    parser.add_argument("--skip-former", action="store_true", help="only measure the streaming extractor")
+    parser.add_argument("--measure", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    parser.add_argument("--write", nargs=2, metavar=("SIZE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        return measure(*args.measure)
+    if args.write:
+        size, path = args.write
+        return write_workbook(*(int(n) for n in size.split("x")), path)
+
+    print(f"{'sheets x rows':>14}  {'extractor':<24} {'seconds':>8} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            path = os.path.join(directory, f"subscriptions_{size}.xlsx")
+            write(size, path)
+            print(f"{size:>14}  ({os.path.getsize(path) / 1e6:.1f} MB xlsx)")
+            cases = [] if args.skip_former else [("former", 1, "full cell model")]
+            cases += [("streaming", workers, f"streaming, {workers} worker(s)") for workers in args.workers]
+            digest = None
+            for mode, workers, label in cases:
+                result = run(mode, path, workers)
+                assert digest in (None, result["digest"]), f"{label}: result differs"
+                digest = result["digest"]
+                print(f"{'':>14}  {label:<24} {result['seconds']:8.2f} {result['peak_mb']:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
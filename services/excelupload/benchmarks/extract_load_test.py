@@ -0,0 +1,147 @@
+"""
+Concurrent uploads to /extract: the former main_local app, which parsed each
+workbook inline on the event loop, against the process-pool app, for several
+EXTRACT_POOL_WORKERS values.
+
+Each app runs under uvicorn in its own process with both result caches off,
+so every upload is parsed. While the uploads run, /health is polled to show
+how long other requests wait. Throughput only grows with workers up to the
+number of CPUs.
+
+Run from the service directory:
+    PYTHONPATH=. python benchmarks/extract_load_test.py                      # 10x3000 workbook, 16 uploads, 8 at a time
+    PYTHONPATH=. python benchmarks/extract_load_test.py 40x5000 --uploads 8 --concurrency 4 --workers 1 2 4
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from fastapi import FastAPI, UploadFile, File, HTTPException
+
+from benchmarks.extract_benchmark import write
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ── The app before ───────────────────────────────────────────────────────────
+
+former_app = FastAPI()
+
+
+@former_app.get("/health")
+def former_health():
+    return {"status": "ok"}
+
+
+@former_app.post("/extract")
+async def former_extract_excel(file: UploadFile = File(...)):
+    from excel_extractor import process_excel
+    file_bytes = await file.read()
+    try:
+        result = process_excel(file_bytes)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return result
+
+
+# ── Load ─────────────────────────────────────────────────────────────────────
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app, port, env):
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+                              cwd=SERVICE_DIR, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health", timeout=1)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f"{app} did not start")
+
+
+def load(port, file_bytes, uploads, concurrency):
+    url = f"http://127.0.0.1:{port}"
+    health, done = [], threading.Event()
+
+    def poll_health():
+        with httpx.Client(timeout=600) as client:
+            while not done.is_set():
+                started = time.perf_counter()
+                client.get(f"{url}/health")
+                health.append(time.perf_counter() - started)
+                time.sleep(0.05)
+
+    def upload(_):
+        with httpx.Client(timeout=600) as client:
+            started = time.perf_counter()
+            response = client.post(f"{url}/extract", files={"file": ("subscriptions.xlsx", file_bytes)})
+            return response.status_code, time.perf_counter() - started
+
+    poller = threading.Thread(target=poll_health)
+    poller.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(upload, range(uploads)))
+    seconds = time.perf_counter() - started
+    done.set()
+    poller.join()
+    return seconds, results, health
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("size", nargs="?", default="10x3000", help="SHEETSxROWS of the uploaded workbook")
+    parser.add_argument("--uploads", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=8, help="uploads in flight at once")
+    parser.add_argument("--workers", nargs="*", type=int, default=sorted({1, 2, os.cpu_count() or 1}),
+                        help="EXTRACT_POOL_WORKERS values to measure")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, f"subscriptions_{args.size}.xlsx")
+        write(args.size, path)
+        with open(path, "rb") as f:
+            file_bytes = f.read()
+    print(f"{args.size} workbook ({len(file_bytes) / 1e6:.1f} MB), {args.uploads} uploads, "
+          f"{args.concurrency} at a time, {os.cpu_count()} CPU(s)")
+    print(f"  {'app':<22} {'seconds':>8} {'uploads/s':>10} {'p50 s':>7} {'p95 s':>7} {'health p50':>11} {'health max':>11}  statuses")
+
+    env = dict(os.environ, PYTHONPATH=SERVICE_DIR, EXTRACT_CACHE_BYTES="0", EXCEL_SHEET_CACHE_CELLS="0",
+               EXCEL_EXTRACT_WORKERS="1", EXTRACT_MAX_QUEUED=str(args.uploads))
+    cases = [("former, inline", "benchmarks.extract_load_test:former_app", env)]
+    cases += [(f"pool, {workers} worker(s)", "main_local:app", dict(env, EXTRACT_POOL_WORKERS=str(workers)))
+              for workers in args.workers]
+    for label, app, app_env in cases:
+        port = free_port()
+        server = start_server(app, port, app_env)
+        try:
+            seconds, results, health = load(port, file_bytes, args.uploads, args.concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+        latencies = sorted(s for _, s in results)
+        statuses = sorted({status for status, _ in results})
+        health_ms = sorted(h * 1000 for h in health)
+        print(f"  {label:<22} {seconds:8.2f} {args.uploads / seconds:10.2f} {statistics.median(latencies):7.2f} "
+              f"{latencies[int(0.95 * (len(latencies) - 1))]:7.2f} {statistics.median(health_ms):9.0f}ms "
+              f"{health_ms[-1]:9.0f}ms  {statuses}")
+
+
+if __name__ == "__main__":
+    main()
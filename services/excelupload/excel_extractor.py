@@ -1,6 +1,59 @@
+"""
+Extraction of the subscription sheets of an uploaded workbook: header and body
+of every sheet, streamed from the sheet XML instead of loading the workbook.
+
+The streaming reader relies on openpyxl internals (_cast_number, the workbook's
+_date_formats, _timedelta_formats, _fonts and _cell_styles, ExcelReader.valid_files
+and parser.find_sheets), which may change in any release: requirements.txt pins
+openpyxl to the version this was written against. Check them before raising the pin.
+"""
 import io
-from openpyxl import load_workbook
-from typing import List, Dict, Any
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from xml.parsers import expat
+from openpyxl.chartsheet import Chartsheet
+from openpyxl.comments.comment_sheet import CommentSheet
+from openpyxl.packaging.relationship import RelationshipList, get_dependents, get_rels_path
+from openpyxl.reader.excel import ExcelReader
+from openpyxl.styles.stylesheet import apply_stylesheet
+from openpyxl.utils.cell import coordinate_to_tuple, range_boundaries
+from openpyxl.utils.datetime import from_excel, from_ISO8601
+from openpyxl.worksheet._reader import _cast_number
+from openpyxl.xml.constants import ARC_STYLE, COMMENTS_NS, REL_NS, SHARED_STRINGS, SHEET_MAIN_NS
+from openpyxl.xml.functions import fromstring
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+# Sheets of one workbook are parsed in up to this many processes
+EXTRACT_WORKERS = int(os.getenv('EXCEL_EXTRACT_WORKERS', str(os.cpu_count() or 1)))
+# Smaller workbooks (uncompressed sheet XML) are parsed in-process: the pool costs more than it saves
+PARALLEL_MIN_BYTES = int(os.getenv('EXCEL_PARALLEL_MIN_BYTES', str(4 * 1024 * 1024)))
+# Smaller tasks than one per worker: the first sheets are ready sooner and the load evens out
+GROUPS_PER_WORKER = 4
+# Parsed sheets kept for re-uploads, counted in kept cells (roughly 250 bytes each)
+SHEET_CACHE_CELLS = int(os.getenv('EXCEL_SHEET_CACHE_CELLS', '400000'))
+
+# The cells parse_header and parse_body read
+HEADER_CELL = (1, 1)
+BODY_MIN_ROW = 4
+BODY_COLUMNS = 4
+
+# Element and attribute names as expat reports them with namespace_separator=' '
+_MAIN = SHEET_MAIN_NS + ' '
+ROW_TAG = _MAIN + 'row'
+CELL_TAG = _MAIN + 'c'
+VALUE_TAG = _MAIN + 'v'
+INLINE_STRING_TAG = _MAIN + 'is'
+STRING_TAG = _MAIN + 'si'
+TEXT_TAG = _MAIN + 't'
+RUN_TAG = _MAIN + 'r'
+PHONETIC_TAG = _MAIN + 'rPh'
+MERGE_CELL_TAG = _MAIN + 'mergeCell'
+HYPERLINK_TAG = _MAIN + 'hyperlink'
+REL_ID = REL_NS + ' id'
 
 def parse_header(sheet) -> Dict[str, str]:
     header_cell = sheet['A1'].value or ''
@@ -54,22 +107,515 @@ def parse_body(sheet) -> List[Dict[str, Any]]:
         })
     return data
 
+
+
+class LRUCache:
+    """Drops the least recently used entries once their summed cost exceeds max_cost. Thread-safe."""
+
+    def __init__(self, max_cost: int):
+        self.max_cost = max_cost
+        self._entries = OrderedDict()  # key -> (value, cost)
+        self._cost = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, cost: int = 1):
+        if cost > self.max_cost:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._cost -= previous[1]
+            self._entries[key] = (value, cost)
+            self._cost += cost
+            while self._cost > self.max_cost:
+                _, (_, dropped) = self._entries.popitem(last=False)
+                self._cost -= dropped
+
+
+def read_shared_strings(src) -> List[str]:
+    """
+    The shared string table as openpyxl's read_string_table returns it (plain text of
+    every <si>: its <t> and the <t> of its runs, without phonetic runs; 'x005F_' removed),
+    with expat callbacks instead of building an element per string.
+    """
+    strings = []
+    parts = None   # text snippets of the current <si>
+    parent = None  # the element a <t> belongs to: si, r or rPh
+    text = None
+
+    def start(name, attrs):
+        nonlocal parts, parent, text
+        if name == STRING_TAG:
+            parts, parent = [], name
+        elif name == TEXT_TAG:
+            if parts is not None and parent != PHONETIC_TAG:
+                text = []
+        elif name == RUN_TAG or name == PHONETIC_TAG:
+            parent = name
+
+    def end(name):
+        nonlocal parts, parent, text
+        if name == TEXT_TAG:
+            if text is not None:
+                if parent == STRING_TAG:
+                    parts.insert(0, ''.join(text))  # Text.content puts the plain text first
+                else:
+                    parts.append(''.join(text))
+                text = None
+        elif name == RUN_TAG or name == PHONETIC_TAG:
+            parent = STRING_TAG
+        elif name == STRING_TAG:
+            strings.append(''.join(parts).replace('x005F_', ''))
+            parts = None
+
+    def data(chunk):
+        if text is not None:
+            text.append(chunk)
+
+    parser = expat.ParserCreate(namespace_separator=' ')
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = data
+    parser.ParseFile(src)
+    return strings
+
+
+class WorkbookParts:
+    """
+    Everything load_workbook(data_only=True) reads before the worksheets: shared strings,
+    styles, the date system and the sheet list. Worksheets are left to StreamedSheet.
+    """
+
+    def __init__(self, file_bytes: bytes, read_strings: bool = True):
+        reader = ExcelReader(io.BytesIO(file_bytes), read_only=True, data_only=True)
+        reader.read_manifest()
+        self.shared_strings = []
+        strings = reader.package.find(SHARED_STRINGS)
+        if strings is not None and read_strings:
+            with reader.archive.open(strings.PartName[1:]) as src:
+                self.shared_strings = read_shared_strings(src)
+        reader.read_workbook()
+        apply_stylesheet(reader.archive, reader.wb)
+        self.archive = reader.archive
+        self.wb = reader.wb
+
+        # (title, worksheet path or the Chartsheet), like ExcelReader.read_worksheets
+        self.sheets: List[Tuple[str, Any]] = []
+        for sheet, rel in reader.parser.find_sheets():
+            if rel.target not in reader.valid_files:
+                continue
+            if "chartsheet" in rel.Type:
+                self.sheets.append((sheet.name, Chartsheet(title=sheet.name)))
+            else:
+                self.sheets.append((sheet.name, rel.target))
+
+    @property
+    def sheetnames(self) -> List[str]:
+        return [title for title, _ in self.sheets]
+
+    def sheet_size(self, index: int) -> int:
+        source = self.sheets[index][1]
+        return self.archive.getinfo(source).file_size if isinstance(source, str) else 0
+
+    def sheet_key(self, index: int) -> str:
+        """
+        Hash of everything a StreamedSheet of this worksheet depends on: its XML, its
+        relationships (hyperlink targets) and comments, the styles and the date system.
+        Not the shared strings, which StreamedSheet leaves as indexes: editing one sheet
+        renumbers them in the others.
+        """
+        digest = hashlib.sha256(f'{self.wb.epoch}'.encode())
+        path = self.sheets[index][1]
+        names = [path, ARC_STYLE]
+        rels_path = get_rels_path(path)
+        if rels_path in self.archive.namelist():
+            names.append(rels_path)
+            names.extend(rel.target for rel in get_dependents(self.archive, rels_path).find(COMMENTS_NS))
+        for name in names:
+            digest.update(name.encode() + b'\0')
+            if name in self.archive.namelist():
+                with self.archive.open(name) as src:
+                    for chunk in iter(lambda: src.read(1024 * 1024), b''):
+                        digest.update(chunk)
+        return digest.hexdigest()
+
+    def close(self):
+        self.archive.close()
+
+
+class SharedString(int):
+    """The index of a cell's string in the shared string table; SheetView looks it up."""
+    __slots__ = ()
+
+
+class SheetCell:
+    __slots__ = ('value', 'font')
+
+    def __init__(self, value, font):
+        self.value = value
+        self.font = font
+
+
+class StreamedSheet:
+    """
+    The cells parse_header and parse_body read (A1, and columns A-D from row 4) of one
+    worksheet, from a single streaming pass over the sheet XML.
+
+    Values, style ids and sheet bounds are those load_workbook(data_only=True) gives the
+    same cells: merged ranges blank all but their top-left cell, hyperlinks fill empty
+    cells with their target, and cells only referenced by a merge, hyperlink or comment
+    still count for the bounds. Other cells are not kept. Shared strings stay indexes
+    (SharedString) and fonts style ids, so a parsed sheet can be cached by
+    WorkbookParts.sheet_key and read through a SheetView of a later upload.
+    """
+
+    def __init__(self, parts: WorkbookParts, path: str):
+        wb = parts.wb
+        self.max_row = self.max_column = 1  # parse_header reads A1, which creates it
+        self.cells = {}  # (row, column) -> [value, style id, or None for merged cells]
+        self._merged = []
+
+        merges, links = [], []
+        with parts.archive.open(path) as src:
+            self._parse(src, wb.epoch, wb._date_formats, wb._timedelta_formats, merges, links)
+
+        # The same order as WorksheetReader.bind_all and ExcelReader.read_worksheets
+        rels = RelationshipList()
+        rels_path = get_rels_path(path)
+        if rels_path in parts.archive.namelist():
+            rels = get_dependents(parts.archive, rels_path)
+        for ref in merges:
+            self._merge(ref)
+        for ref, rel_id, location in links:
+            target = rels.get(rel_id).Target if rel_id else None
+            self._link(ref, target or location)
+        for rel in rels.find(COMMENTS_NS):
+            comments = CommentSheet.from_tree(fromstring(parts.archive.read(rel.target)))
+            for comment in comments.commentList:
+                self._touch(*coordinate_to_tuple(comment.ref))
+
+    def _parse(self, src, epoch, date_formats, timedelta_formats, merges, links):
+        # WorkSheetParser.parse_row / parse_cell with data_only=True, for the kept cells only
+        row = column = 0
+        entry = None   # the kept cell being read
+        cell = None    # its t and s attributes, then <v> and inline string text
+        text = None
+        parent = None  # the element a <t> of an inline string belongs to
+
+        def start(name, attrs):
+            nonlocal row, column, entry, cell, text, parent
+            if name == CELL_TAG:
+                coordinate = attrs.get('r')
+                if coordinate:
+                    cell_row, column = coordinate_to_tuple(coordinate)
+                else:
+                    column += 1
+                    cell_row = row
+                entry = self._touch(cell_row, column)
+                if entry is not None:
+                    style = attrs.get('s')
+                    cell = {'t': attrs.get('t', 'n'), 's': int(style) if style else 0, 'v': None, 'is': None}
+            elif entry is not None:
+                if name == VALUE_TAG:
+                    if cell['v'] is None:
+                        text = []
+                elif name == INLINE_STRING_TAG:
+                    if cell['is'] is None:
+                        cell['is'], parent = [], name
+                elif name == TEXT_TAG:
+                    if parent is not None and parent != PHONETIC_TAG:
+                        text = []
+                elif name == RUN_TAG or name == PHONETIC_TAG:
+                    parent = name
+            elif name == ROW_TAG:
+                r = attrs.get('r')
+                if r is None:
+                    row += 1
+                else:
+                    try:
+                        row = int(r)
+                    except ValueError:
+                        value = float(r)
+                        if not value.is_integer():
+                            raise ValueError(f"{r} is not a valid row number")
+                        row = int(value)
+                column = 0
+            elif name == MERGE_CELL_TAG:
+                merges.append(attrs.get('ref'))
+            elif name == HYPERLINK_TAG:
+                links.append((attrs.get('ref'), attrs.get(REL_ID), attrs.get('location')))
+
+        def end(name):
+            nonlocal entry, cell, text, parent
+            if entry is None:
+                return
+            if name == VALUE_TAG:
+                if text is not None:
+                    cell['v'] = ''.join(text)
+                    text = None
+            elif name == TEXT_TAG:
+                if text is not None:
+                    if parent == INLINE_STRING_TAG:
+                        cell['is'].insert(0, ''.join(text))  # Text.content puts the plain text first
+                    else:
+                        cell['is'].append(''.join(text))
+                    text = None
+            elif name == RUN_TAG or name == PHONETIC_TAG:
+                parent = INLINE_STRING_TAG
+            elif name == INLINE_STRING_TAG:
+                parent = None
+            elif name == CELL_TAG:
+                entry[0] = self._value(cell, epoch, date_formats, timedelta_formats)
+                entry[1] = cell['s']
+                entry = cell = None
+
+        def data(chunk):
+            if text is not None:
+                text.append(chunk)
+
+        parser = expat.ParserCreate(namespace_separator=' ')
+        parser.buffer_text = True
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        parser.CharacterDataHandler = data
+        parser.ParseFile(src)
+
+    @staticmethod
+    def _value(cell, epoch, date_formats, timedelta_formats):
+        data_type, style_id = cell['t'], cell['s']
+        if data_type == 'inlineStr':
+            return ''.join(cell['is']) if cell['is'] is not None else None
+        value = cell['v'] or None
+        if value is None:
+            return None
+        if data_type == 'n':
+            value = _cast_number(value)
+            if style_id in date_formats:
+                try:
+                    value = from_excel(value, epoch, timedelta=style_id in timedelta_formats)
+                except (OverflowError, ValueError):
+                    value = '#VALUE!'
+        elif data_type == 's':
+            value = SharedString(value)
+        elif data_type == 'b':
+            value = bool(int(value))
+        elif data_type == 'd':
+            value = from_ISO8601(value)
+        return value
+
+    def _touch(self, row: int, column: int) -> Optional[list]:
+        """Create the cell like Worksheet.cell; returns its entry if it is one of the kept cells."""
+        if row > self.max_row:
+            self.max_row = row
+        if column > self.max_column:
+            self.max_column = column
+        if (row >= BODY_MIN_ROW and column <= BODY_COLUMNS) or (row, column) == HEADER_CELL:
+            entry = self.cells.get((row, column))
+            if entry is None:
+                entry = self.cells[(row, column)] = [None, 0]
+            return entry
+        return None
+
+    def _kept_range(self, min_col, min_row, max_col, max_row):
+        self._touch(max_row, max_col)
+        if (min_row, min_col) == HEADER_CELL:
+            yield HEADER_CELL
+        for row in range(max(min_row, BODY_MIN_ROW), max_row + 1):
+            for column in range(min_col, min(max_col, BODY_COLUMNS) + 1):
+                yield row, column
+
+    def _merge(self, ref: str):
+        bounds = range_boundaries(ref)
+        self._merged.append(bounds)
+        min_col, min_row = bounds[:2]
+        for row, column in self._kept_range(*bounds):
+            if (row, column) != (min_row, min_col):
+                entry = self._touch(row, column)
+                entry[0] = entry[1] = None
+
+    def _merged_anchor(self, row: int, column: int):
+        for min_col, min_row, max_col, max_row in self._merged:
+            if min_row <= row <= max_row and min_col <= column <= max_col:
+                return min_row, min_col
+        return None
+
+    def _link(self, ref: str, target):
+        if ':' in ref:
+            coordinates = self._kept_range(*range_boundaries(ref))
+        else:
+            row, column = coordinate_to_tuple(ref)
+            self._touch(row, column)
+            coordinates = [self._merged_anchor(row, column) or (row, column)]
+        for row, column in coordinates:
+            entry = self._touch(row, column)
+            # Merged cells take no hyperlink; others show the target when empty
+            if entry is not None and entry[1] is not None and entry[0] is None:
+                entry[0] = target
+
+    @property
+    def size(self) -> int:
+        return len(self.cells)
+
+
+class SheetView:
+    """A StreamedSheet with the fonts and shared strings of one workbook, as parse_header and parse_body read it."""
+
+    def __init__(self, sheet: StreamedSheet, parts: WorkbookParts):
+        self.sheet = sheet
+        self._fonts = parts.wb._fonts
+        self._cell_styles = parts.wb._cell_styles
+        self._shared_strings = parts.shared_strings
+
+    def _cell(self, row: int, column: int) -> SheetCell:
+        value, style_id = self.sheet.cells.get((row, column), (None, None))
+        if type(value) is SharedString:
+            value = self._shared_strings[value]
+        font_id = self._cell_styles[style_id].fontId if style_id is not None else 0
+        return SheetCell(value, self._fonts[font_id])
+
+    def __getitem__(self, coordinate: str) -> SheetCell:
+        row, column = coordinate_to_tuple(coordinate)
+        if (row, column) != HEADER_CELL:
+            raise KeyError(f'{coordinate} is not kept by StreamedSheet')
+        return self._cell(row, column)
+
+    def iter_rows(self, min_row: int = BODY_MIN_ROW):
+        """
+        Worksheet.iter_rows limited to columns A-D. Rows without any cell are left out:
+        parse_body skips rows whose four values are None anyway.
+        """
+        if min_row < BODY_MIN_ROW:
+            raise ValueError(f'StreamedSheet keeps rows from {BODY_MIN_ROW}')
+        width = min(self.sheet.max_column, BODY_COLUMNS)
+        for row in sorted({row for row, column in self.sheet.cells if row >= min_row}):
+            yield tuple(self._cell(row, column) for column in range(1, width + 1))
+
+
+def process_sheet(sheetname: str, sheet) -> Dict[str, Any]:
+    try:
+        header = parse_header(sheet)
+        body = parse_body(sheet)
+        return {
+            'sheet': sheetname,
+            'header': header,
+            'body': body
+        }
+    except Exception as e:
+        return {
+            'sheet': sheetname,
+            'error': str(e)
+        }
+
+def _parse_sheets(file_bytes: bytes, indexes: List[int]) -> List[StreamedSheet]:
+    parts = WorkbookParts(file_bytes, read_strings=False)
+    try:
+        return [StreamedSheet(parts, parts.sheets[i][1]) for i in indexes]
+    finally:
+        parts.close()
+
+_executor = None
+_sheet_cache = LRUCache(SHEET_CACHE_CELLS)
+
+def _sheet_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS)
+    return _executor
+
+def _reset_executor():
+    # A worker died (e.g. out of memory); start a new pool next time
+    global _executor
+    _executor = None
+
+def _split_sheets(indexes: List[int], sizes: List[int], count: int) -> List[List[int]]:
+    # Runs of consecutive sheets with about the same XML each, so results come back
+    # roughly in workbook order for iter_excel to yield
+    target = sum(sizes[i] for i in indexes) / count
+    groups, total = [[]], 0
+    for index in indexes:
+        if groups[-1] and total + sizes[index] / 2 > target:
+            groups.append([])
+            total = 0
+        groups[-1].append(index)
+        total += sizes[index]
+    return groups
+
+def _submit_sheets(file_bytes: bytes, indexes: List[int], sizes: List[int]) -> Dict[int, Tuple[Future, int]]:
+    # Each sheet index -> the future of its group and its position in the group's result
+    groups = _split_sheets(indexes, sizes, min(EXTRACT_WORKERS * GROUPS_PER_WORKER, len(indexes)))
+    pending = {}
+    for group in groups:
+        future = _sheet_executor().submit(_parse_sheets, file_bytes, group)
+        pending.update((index, (future, position)) for position, index in enumerate(group))
+    return pending
+
+def _parsed_sheet(pending: Dict[int, Tuple[Future, int]], index: int) -> Optional[StreamedSheet]:
+    future, position = pending[index]
+    try:
+        return future.result()[position]
+    except BrokenProcessPool:
+        # The remaining sheets are parsed in-process
+        _reset_executor()
+        pending.clear()
+        return None
+
+def iter_excel(file_bytes: bytes) -> Iterator[Dict[str, Any]]:
+    """
+    One {sheet, header, body} (or {sheet, error}) per sheet, in workbook order, each
+    yielded as soon as its sheet is parsed.
+
+    Sheets are streamed from their XML (StreamedSheet) instead of loading the full cell
+    model, and cached by content: re-uploading a workbook only parses the sheets that
+    changed. Several sheets with at least PARALLEL_MIN_BYTES of XML to parse are split
+    across EXTRACT_WORKERS processes.
+
+    Opening the workbook happens on the first next() and raises for a file that is not
+    a workbook; a sheet whose XML is malformed raises when its turn comes.
+    """
+    parts = WorkbookParts(file_bytes)
+    pending = {}
+    try:
+        cached, keys = {}, {}
+        for i, (_, source) in enumerate(parts.sheets):
+            if isinstance(source, str):
+                keys[i] = parts.sheet_key(i)
+                cached[i] = _sheet_cache.get(keys[i])
+
+        missing = [i for i in keys if cached[i] is None]
+        sizes = [parts.sheet_size(i) for i in range(len(parts.sheets))]
+        if EXTRACT_WORKERS > 1 and len(missing) > 1 and sum(sizes[i] for i in missing) >= PARALLEL_MIN_BYTES:
+            try:
+                pending = _submit_sheets(file_bytes, missing, sizes)
+            except BrokenProcessPool:
+                _reset_executor()
+
+        for i, (sheetname, source) in enumerate(parts.sheets):
+            if i not in keys:
+                # A chartsheet fails parse_header, as it did with the full workbook
+                yield process_sheet(sheetname, source)
+                continue
+            sheet = cached[i]
+            if sheet is None:
+                sheet = _parsed_sheet(pending, i) if i in pending else None
+                if sheet is None:
+                    sheet = StreamedSheet(parts, source)
+                _sheet_cache.put(keys[i], sheet, sheet.size)
+            yield process_sheet(sheetname, SheetView(sheet, parts))
+    finally:
+        # Closed early (client gone): drop the groups no worker has started
+        for future, _ in pending.values():
+            future.cancel()
+        parts.close()
+
 def process_excel(file_bytes: bytes) -> Dict[str, Any]:
-    wb = load_workbook(io.BytesIO(file_bytes), data_only=True)
-    result = []
-    for sheetname in wb.sheetnames:
-        sheet = wb[sheetname]
-        try:
-            header = parse_header(sheet)
-            body = parse_body(sheet)
-            result.append({
-                'sheet': sheetname,
-                'header': header,
-                'body': body
-            })
-        except Exception as e:
-            result.append({
-                'sheet': sheetname,
-                'error': str(e)
-            })
-    return result
+    """All sheet results of iter_excel, as a list."""
+    return list(iter_excel(file_bytes))
@@ -0,0 +1,39 @@
+import os
+import requests
+from typing import Dict, List, Optional
+
+HASURA_URL = os.getenv("HASURA_URL", "")
+HASURA_ADMIN_SECRET = os.getenv("HASURA_ADMIN_SECRET", "")
+HASURA_TIMEOUT = (float(os.getenv("HASURA_CONNECT_TIMEOUT", "5")), float(os.getenv("HASURA_READ_TIMEOUT", "60")))
+
+# One keep-alive connection pool for all imports
+_session = requests.Session()
+
+
+class HasuraError(Exception):
+    """GraphQL errors in a 200 response, e.g. a constraint or permission violation."""
+
+    def __init__(self, errors: List[dict]):
+        self.errors = errors
+        super().__init__("; ".join(error.get("message", str(error)) for error in errors))
+
+
+class HasuraClient:
+    """
+    Hasura GraphQL calls on behalf of one request: headers carries the caller's
+    Authorization (or the admin secret in local development).
+    """
+
+    def __init__(self, headers: Dict[str, str], url: Optional[str] = None):
+        self.url = url or HASURA_URL
+        self.headers = headers
+
+    def execute(self, query: str, variables: Optional[dict] = None) -> dict:
+        """Sends a GraphQL document and returns its data; raises on HTTP and GraphQL errors."""
+        response = _session.post(self.url, json={"query": query, "variables": variables or {}},
+                                 headers=self.headers, timeout=HASURA_TIMEOUT)
+        response.raise_for_status()
+        body = response.json()
+        if body.get("errors"):
+            raise HasuraError(body["errors"])
+        return body["data"]
@@ -3,11 +3,146 @@ Local FastAPI wrapper for Excel extractor.
 Replaces functions-framework (GCP) for local Docker development.
 """
 import os
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import json
+import time
+import asyncio
+import queue
+import hashlib
+import signal
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from functools import partial
+from multiprocessing.managers import SyncManager
+from typing import Callable, List, Optional
+from fastapi import FastAPI, Form, Request, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from excel_extractor import process_excel
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import excel_extractor
+from excel_extractor import LRUCache, iter_excel
+from hasura_client import HASURA_ADMIN_SECRET, HASURA_URL, HasuraClient
+from trades_import import import_trades
+
+# Processes that parse uploads, so the event loop keeps serving other requests
+POOL_WORKERS = int(os.getenv("EXTRACT_POOL_WORKERS", str(os.cpu_count() or 1)))
+# Uploads waiting for a worker; beyond that new ones get a 429
+MAX_QUEUED = int(os.getenv("EXTRACT_MAX_QUEUED", str(2 * POOL_WORKERS)))
+MAX_UPLOAD_BYTES = int(os.getenv("EXTRACT_MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+TIMEOUT_SECONDS = float(os.getenv("EXTRACT_TIMEOUT_SECONDS", "120"))
+RETRY_AFTER_SECONDS = 5
+
+# Encoded sheet results by SHA-256 of the upload, for re-uploads of the same workbook
+result_cache = LRUCache(int(os.getenv("EXTRACT_CACHE_BYTES", str(64 * 1024 * 1024))))
+
+NDJSON = "application/x-ndjson"
+
+# Messages of a streamed extraction: from the worker (SHEET, DONE, ERROR) or about it (TIMEOUT, CRASHED)
+SHEET, DONE, ERROR, TIMEOUT, CRASHED = "sheet", "done", "error", "timeout", "crashed"
+FAILURE_STATUS = {ERROR: 400, TIMEOUT: 504, CRASHED: 500}
+
+_pool = None
+_manager = None
+_manager_lock = threading.Lock()
+_in_flight = 0  # extractions running or queued
+_in_flight_lock = threading.Lock()
+
+
+class ExtractionManager(SyncManager):
+    """SyncManager that also holds the sheet cache of all extraction workers."""
+
+
+_shared_sheet_cache = None  # in the manager process
+
+
+def shared_sheet_cache() -> LRUCache:
+    global _shared_sheet_cache
+    if _shared_sheet_cache is None:
+        _shared_sheet_cache = LRUCache(excel_extractor.SHEET_CACHE_CELLS)
+    return _shared_sheet_cache
+
+
+ExtractionManager.register("SheetCache", shared_sheet_cache)
+
+
+def reset_signals():
+    # Forked from uvicorn, whose SIGTERM handler would only flag a server this process
+    # does not run; Ctrl+C is for the parent, which shuts the pool and the manager down
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def init_worker(sheet_cache):
+    reset_signals()
+    # The pool parses uploads side by side: excel_extractor starts no pool of its own
+    excel_extractor.EXTRACT_WORKERS = 1
+    excel_extractor._executor = None
+    # Whichever worker takes a re-upload finds the sheets any worker parsed before
+    excel_extractor._sheet_cache = sheet_cache or LRUCache(0)
+
+
+def extraction_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        manager = extraction_manager()
+        sheet_cache = manager.SheetCache() if excel_extractor.SHEET_CACHE_CELLS > 0 else None
+        _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS, initializer=init_worker, initargs=(sheet_cache,))
+    return _pool
+
+
+def extraction_manager() -> ExtractionManager:
+    """
+    The process holding the sheet cache of the workers and the queues that carry streamed
+    sheets from them to this one.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            manager = ExtractionManager()
+            manager.start(initializer=reset_signals)
+            _manager = manager
+    return _manager
+
+
+def acquire_slot():
+    global _in_flight
+    with _in_flight_lock:
+        if _in_flight >= POOL_WORKERS + MAX_QUEUED:
+            raise HTTPException(status_code=429, detail="Too many uploads being extracted, retry later",
+                                headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+        _in_flight += 1
+
+
+def release_slot(*_):
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight -= 1
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Started before the first upload, which would otherwise wait for it
+    extraction_manager()
+    yield
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    if _manager is not None:
+        _manager.shutdown()
+
+
+app = FastAPI(title="MTCM Excel Extractor", version="1.0.0", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    # Before the multipart body is read and spooled; chunked uploads are checked once read
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > MAX_UPLOAD_BYTES:
+        return JSONResponse({"detail": f"Upload larger than {MAX_UPLOAD_BYTES} bytes"}, status_code=413)
+    return await call_next(request)
 
-app = FastAPI(title="MTCM Excel Extractor", version="1.0.0")
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,24 +157,232 @@ def health():
     return {"status": "ok"}
 
 
-@app.post("/extract")
-async def extract_excel(file: UploadFile = File(...)):
-    """Extract trade data from Excel file."""
+def encode(result) -> bytes:
+    # As JSONResponse renders it: the encoded sheets joined with commas are the batch response
+    return json.dumps(jsonable_encoder(result), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def extract_lines(file_bytes: bytes) -> List[bytes]:
+    """The encoded sheet results of an upload; runs in a worker process."""
+    return [encode(result) for result in iter_excel(file_bytes)]
+
+
+def stream_lines(file_bytes: bytes, channel, stop) -> None:
+    """
+    Puts (SHEET, encoded result) on channel for every sheet as soon as it is parsed, then
+    (DONE, None), or (ERROR, message) once the workbook fails; stops early once stop is
+    set. Runs in a worker process.
+    """
+    results = iter_excel(file_bytes)
+    try:
+        for result in results:
+            channel.put((SHEET, encode(result)))
+            if stop.is_set():
+                return
+        channel.put((DONE, None))
+    except Exception as e:
+        channel.put((ERROR, str(e)))
+    finally:
+        results.close()
+
+
+def open_channel():
+    """A queue for a streaming worker's messages and an event that stops it, both held by the manager."""
+    manager = extraction_manager()
+    return manager.Queue(), manager.Event()
+
+
+def next_message(channel, future: Future, deadline: float):
+    """The streaming worker's next message, or TIMEOUT / CRASHED when none is coming. Blocks."""
+    global _pool
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return TIMEOUT, f"Extraction took longer than {TIMEOUT_SECONDS:g}s"
+        try:
+            return channel.get(timeout=min(remaining, 1))
+        except queue.Empty:
+            # A put returns once the message is queued: a worker that is done has sent everything
+            if future.done():
+                if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+                    _pool = None
+                return CRASHED, "Extraction worker crashed"
+
+
+def stop_stream(future: Future, stop):
+    # An upload no worker has taken yet is dropped, the worker that has one stops after the
+    # current sheet; either way the slot is released once the worker is done with it
+    future.cancel()
+    stop.set()
+
+
+def stream_sheets(key: str, message, channel, future: Future, deadline: float):
+    """
+    NDJSON lines of the streaming worker's sheets, from its first message on, cached once
+    all of them are sent. Runs in Starlette's thread pool.
+    """
+    sent, size = [], 0
+    while message[0] == SHEET:
+        line = message[1]
+        yield line + b"\n"
+        if sent is not None:
+            sent.append(line)
+            size += len(line)
+            if size > result_cache.max_cost:
+                sent = None  # too large to cache
+        message = next_message(channel, future, deadline)
+    if message[0] != DONE:
+        # Too late for an error status: it went out with the first sheet
+        yield encode({"error": message[1]}) + b"\n"
+        return
+    if sent is not None:
+        result_cache.put(key, sent, size)
+
+
+class SheetStream(StreamingResponse):
+    """
+    The streamed sheets of an upload: however the response ends, also when the client is
+    gone before the first line, the worker is told to stop (dropping the sheets not parsed yet).
+    """
+
+    def __init__(self, content, stop: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self.stop = stop
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # One round trip to the manager; not awaited, as the response may be cancelled
+            self.stop()
+
+
+async def read_upload(file: UploadFile) -> bytes:
     if not file.filename or not file.filename.endswith(('.xlsx', '.xlsm')):
         raise HTTPException(status_code=400, detail="Invalid file type. Only .xlsx and .xlsm accepted.")
     file_bytes = await file.read()
+    if len(file_bytes) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload larger than {MAX_UPLOAD_BYTES} bytes")
+    return file_bytes
+
+
+@app.post("/extract")
+async def extract_excel(file: UploadFile = File(...), stream: bool = False):
+    """
+    Extract trade data from Excel file.
+
+    With stream=true the sheets are sent as NDJSON, one {sheet, header, body} or
+    {sheet, error} per line, each as soon as it is parsed.
+    """
+    file_bytes = await read_upload(file)
+    key = hashlib.sha256(file_bytes).hexdigest()
+    lines = result_cache.get(key)
+    if lines is None:
+        if stream:
+            acquire_slot()
+            return await start_stream(key, file_bytes)
+        lines = await extract_and_cache(key, file_bytes)
+    if stream:
+        return Response(b"".join(line + b"\n" for line in lines), media_type=NDJSON)
+    return Response(b"[" + b",".join(lines) + b"]", media_type="application/json")
+
+
+async def extract_and_cache(key: str, file_bytes: bytes) -> List[bytes]:
+    acquire_slot()
+    lines = await extract_in_pool(file_bytes)
+    result_cache.put(key, lines, sum(len(line) for line in lines))
+    return lines
+
+
+def submit(fn, *args) -> Future:
+    """fn in a worker process; the slot taken for it is released when the worker is done."""
+    global _pool
     try:
-        result = process_excel(file_bytes)
+        future = extraction_pool().submit(fn, *args)
+    except BrokenProcessPool:
+        release_slot()
+        _pool = None
+        raise HTTPException(status_code=503, detail="Extraction workers restarting, retry later",
+                            headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+    future.add_done_callback(release_slot)
+    return future
+
+
+async def extract_in_pool(file_bytes: bytes) -> List[bytes]:
+    """extract_lines in a worker process."""
+    global _pool
+    future = submit(extract_lines, file_bytes)
+    try:
+        # On timeout an upload no worker has taken yet is dropped; one a worker has taken
+        # keeps it (and its slot) until it finishes, as a process cannot be interrupted
+        return await asyncio.wait_for(asyncio.wrap_future(future), TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Extraction took longer than {TIMEOUT_SECONDS:g}s")
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory on this upload); start a new pool next time
+        _pool = None
+        raise HTTPException(status_code=500, detail="Extraction worker crashed")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    return result
+
+
+async def start_stream(key: str, file_bytes: bytes) -> StreamingResponse:
+    """
+    Streams the sheets of a worker process as it parses them, over a queue of the extraction
+    manager. The first sheet is awaited before answering, so a file that is not a workbook
+    is still a 400; every sheet, the first included, is awaited until the timeout at most.
+    """
+    try:
+        channel, stop = await run_in_threadpool(open_channel)
+    except BaseException:
+        release_slot()
+        raise
+    deadline = time.monotonic() + TIMEOUT_SECONDS
+    future = submit(stream_lines, file_bytes, channel, stop)
+    try:
+        message = await run_in_threadpool(next_message, channel, future, deadline)
+    except BaseException:
+        stop_stream(future, stop)
+        raise
+    if message[0] not in (SHEET, DONE):
+        stop_stream(future, stop)
+        raise HTTPException(status_code=FAILURE_STATUS[message[0]], detail=message[1])
+    return SheetStream(stream_sheets(key, message, channel, future, deadline), partial(stop_stream, future, stop),
+                       media_type=NDJSON)
 
 
 # Also support the GCF-style endpoint path for compatibility
 @app.post("/extract-excel-gcf")
-async def extract_excel_gcf(file: UploadFile = File(...)):
+async def extract_excel_gcf(file: UploadFile = File(...), stream: bool = False):
     """GCF-compatible endpoint (same as /extract)."""
-    return await extract_excel(file)
+    return await extract_excel(file, stream)
+
+
+@app.post("/import-trades")
+async def import_trades_endpoint(request: Request, file: UploadFile = File(...), case_id: str = Form(...),
+                                 issue_date: Optional[str] = Form(None)):
+    """
+    Extract the workbook and import its trades into the case's subscription trades
+    (see trades_import), answering with NDJSON progress events. Hasura is called with
+    the caller's Authorization header, or the admin secret when there is none.
+    """
+    if not HASURA_URL:
+        raise HTTPException(status_code=503, detail="Trade import is not configured (HASURA_URL)")
+    authorization = request.headers.get("authorization")
+    if authorization:
+        headers = {"Authorization": authorization}
+    elif HASURA_ADMIN_SECRET:
+        headers = {"x-hasura-admin-secret": HASURA_ADMIN_SECRET}
+    else:
+        raise HTTPException(status_code=401, detail="Authorization header required")
+
+    file_bytes = await read_upload(file)
+    key = hashlib.sha256(file_bytes).hexdigest()
+    lines = result_cache.get(key) or await extract_and_cache(key, file_bytes)
+    # As the frontend receives them: dates are ISO strings
+    sheets = [json.loads(line) for line in lines]
+    events = import_trades(sheets, case_id, issue_date, HasuraClient(headers))
+    return StreamingResponse((encode(event) + b"\n" for event in events), media_type=NDJSON)
 
 
 if __name__ == "__main__":
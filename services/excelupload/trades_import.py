@@ -0,0 +1,209 @@
+"""
+Server-side import of subscription trades from an extracted workbook: the checks,
+matching and writes of the frontend's upload workflow (useSubscriptionTrades), in
+one pass next to the extractor rather than one Hasura mutation per trade from the
+browser.
+
+import_trades yields progress events, whose stages are the workflow's
+isinUploadStage values:
+
+    {"stage": "validating"}
+    {"stage": "warning", "errors": [...]}                 sheets not importable, nothing saved
+    {"stage": "preparing"}
+    {"stage": "norecords"}                                nothing new to insert or cancel
+    {"stage": "saving", "inserted": 500, "cancelled": 0, "toInsert": 1200, "toCancel": 3}
+    {"stage": "done", "inserted": 1200, "cancelled": 3}
+    {"stage": "error", "error": "...", "inserted": 500, "cancelled": 0}
+
+Trades are inserted TRADES_CHUNK_SIZE at a time, one insert_trades mutation (and so
+one transaction) per chunk. After an error the chunks already saved stay; importing
+the workbook again only inserts what is missing, as saved trades are matched.
+"""
+import os
+import uuid
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from hasura_client import HasuraClient
+
+TRADES_CHUNK_SIZE = int(os.getenv("TRADES_IMPORT_CHUNK_SIZE", "500"))
+
+TRADETYPE_SUBSCRIPTION = 1
+TRANSTATUS_SUBSCRIPTION = 1
+TRANSTATUS_CANCELLED = 3
+
+# The case's ISINs and its current subscription trades, in one round trip
+CASE_LOOKUP = '''
+    query TradeImportLookup($caseid: uuid!) {
+      caseisins(where: {caseid: {_eq: $caseid}}) {
+        id
+        isinnumber
+      }
+      subscription_trades_view(where: {case_id: {_eq: $caseid}, transtatus: {_lte: 1}}) {
+        id
+        isin_id
+        tradedate
+        counterparty
+        notional
+      }
+    }
+'''
+
+INSERT_TRADES = '''
+    mutation ImportTrades($objects: [trades_insert_input!]!) {
+      insert_trades(objects: $objects) {
+        affected_rows
+      }
+    }
+'''
+
+CANCEL_TRADES = '''
+    mutation CancelImportedTrades($ids: [uuid!]!, $transtatus: Int!) {
+      update_trades(where: {id: {_in: $ids}}, _set: {transtatus: $transtatus}) {
+        affected_rows
+      }
+    }
+'''
+
+
+def validate(sheets: List[Dict[str, Any]], isin_numbers: set) -> Optional[List[str]]:
+    """Why the sheets cannot be imported, as the frontend words it, or None."""
+    errors: Dict[str, List[str]] = {}
+    for sheet in sheets:
+        if sheet.get('error'):
+            errors.setdefault(sheet['error'], []).append(sheet['sheet'])
+    if errors:
+        return [f"Sheets [{', '.join(names)}]: {error}" for error, names in errors.items()]
+
+    empty = [sheet['sheet'] for sheet in sheets if not sheet.get('body')]
+    if empty:
+        return [f'Sheet "{", ".join(empty)}": no entries found!']
+
+    missing = [sheet['sheet'] for sheet in sheets if not (sheet.get('header') or {}).get('ISINNumber')]
+    if missing:
+        return [f'Sheet "{", ".join(missing)}": Missing ISINNumber in header.']
+
+    unknown = [sheet['sheet'] for sheet in sheets if sheet['header']['ISINNumber'] not in isin_numbers]
+    if unknown:
+        return [f"Sheet [{', '.join(unknown)}]: ISINNumber does not match with the compartment."]
+    return None
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _stored_notional(value) -> Optional[Decimal]:
+    # trades.notional is DECIMAL(18,0): compare what was saved with what would be
+    try:
+        return Decimal(str(value)).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def _day(value) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    try:
+        return datetime.fromisoformat(str(value)).date()
+    except ValueError:
+        return None
+
+
+def _trade_key(notional, tradedate, counterparty) -> Tuple:
+    # A missing counterparty is saved as ''
+    return _stored_notional(notional), _day(tradedate), counterparty or ''
+
+
+def prepare(sheets: List[Dict[str, Any]], isin_ids: Dict[str, str], trades: List[Dict[str, Any]],
+            issue_date: Optional[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    The trades to insert and the ids of the trades to cancel. A row is new unless its
+    ISIN already has a trade with the same notional, trade day and counterparty; a
+    struck-through row cancels the matching trade.
+    """
+    existing: Dict[str, Dict[Tuple, str]] = defaultdict(dict)
+    for trade in trades:
+        key = _trade_key(trade['notional'], trade['tradedate'], trade['counterparty'])
+        existing[trade['isin_id']].setdefault(key, trade['id'])
+
+    inserts, cancels = [], {}
+    for sheet in sheets:
+        isin_id = isin_ids[sheet['header']['ISINNumber']]
+        for entry in sheet['body']:
+            notional = _number(entry['notional'])
+            if notional is None:
+                continue
+            if notional > 0 and not entry['subscriptionCancelled']:
+                key = _trade_key(entry['notional'], entry['tradeDate'], entry['counterParty'])
+                if key not in existing[isin_id]:
+                    inserts.append({
+                        'id': str(uuid.uuid4()),
+                        'isinid': isin_id,
+                        'bank_investor': '',
+                        'counterparty': entry['counterParty'] or '',
+                        'notional': entry['notional'],
+                        'price_dirty': 0,
+                        'reference': '',
+                        'tranfee': 0,
+                        'tradedate': entry['tradeDate'],
+                        'valuedate': issue_date or entry['tradeDate'],
+                        'tradetype': TRADETYPE_SUBSCRIPTION,
+                        'transtatus': TRANSTATUS_SUBSCRIPTION,
+                    })
+            elif notional < 0 and entry['subscriptionCancelled']:
+                trade_id = existing[isin_id].get(_trade_key(abs(notional), entry['tradeDate'], entry['counterParty']))
+                if trade_id:
+                    cancels[trade_id] = None
+    return inserts, list(cancels)
+
+
+def _chunks(items: List, size: int) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def import_trades(sheets: List[Dict[str, Any]], case_id: str, issue_date: Optional[str],
+                  client: HasuraClient) -> Iterator[Dict[str, Any]]:
+    """
+    Imports the extracted sheets (as /extract returns them) into the case's subscription
+    trades, yielding progress events; errors end the events instead of raising.
+    """
+    inserted = cancelled = 0
+    try:
+        yield {'stage': 'validating'}
+        lookup = client.execute(CASE_LOOKUP, {'caseid': case_id})
+        isin_ids = {isin['isinnumber']: isin['id'] for isin in lookup['caseisins']}
+        errors = validate(sheets, set(isin_ids))
+        if errors:
+            yield {'stage': 'warning', 'errors': errors}
+            return
+
+        yield {'stage': 'preparing'}
+        inserts, cancels = prepare(sheets, isin_ids, lookup['subscription_trades_view'], issue_date)
+        if not inserts and not cancels:
+            yield {'stage': 'norecords'}
+            return
+
+        def saving():
+            return {'stage': 'saving', 'inserted': inserted, 'cancelled': cancelled,
+                    'toInsert': len(inserts), 'toCancel': len(cancels)}
+
+        yield saving()
+        for chunk in _chunks(inserts, TRADES_CHUNK_SIZE):
+            inserted += client.execute(INSERT_TRADES, {'objects': chunk})['insert_trades']['affected_rows']
+            yield saving()
+        for chunk in _chunks(cancels, TRADES_CHUNK_SIZE):
+            variables = {'ids': chunk, 'transtatus': TRANSTATUS_CANCELLED}
+            cancelled += client.execute(CANCEL_TRADES, variables)['update_trades']['affected_rows']
+            yield saving()
+        yield {'stage': 'done', 'inserted': inserted, 'cancelled': cancelled}
+    except Exception as e:
+        yield {'stage': 'error', 'error': str(e), 'inserted': inserted, 'cancelled': cancelled}
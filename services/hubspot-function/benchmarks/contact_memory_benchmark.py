@@ -0,0 +1,103 @@
+"""
+Memory of the Excel contact store: the former HubSpot JSON dicts against
+ContactRecord objects, for the contacts alone and for the whole provider
+(contacts, search index, id / email lookups).
+
+The export is synthesized from the rows of data/contacts.csv (see
+excel_loader_benchmark.py). Memory is measured with tracemalloc as the
+allocations still alive after loading. Since records are converted to the
+HubSpot shape per response, the script also times that conversion.
+
+Run from the service directory:
+    PYTHONPATH=. python benchmarks/contact_memory_benchmark.py               # 100k contacts
+    PYTHONPATH=. python benchmarks/contact_memory_benchmark.py 200000
+"""
+
+import argparse
+import gc
+import logging
+import tempfile
+import time
+import tracemalloc
+
+from contact_search import ContactSearchIndex
+from excel_provider import ExcelContactProvider, EMAIL_SEPARATORS, SEARCH_FIELDS, _normalise_email
+from benchmarks.excel_loader_benchmark import former_load_csv, write_exports
+
+
+def former_lookups(contacts):
+    # The former _build_lookups over HubSpot JSON dicts
+    by_id, by_email = {}, {}
+    for c in contacts:
+        by_id.setdefault(c["id"], c)
+        email = _normalise_email(c["properties"].get("email"))
+        if email:
+            by_email.setdefault(email, c)
+    for c in contacts:
+        for email in EMAIL_SEPARATORS.split(c["properties"].get("hs_additional_emails") or ""):
+            email = _normalise_email(email)
+            if email:
+                by_email.setdefault(email, c)
+    return by_id, by_email
+
+
+def former_index(contacts):
+    index = ContactSearchIndex(SEARCH_FIELDS)
+    index.build(contacts)
+    return index, former_lookups(contacts)
+
+
+def load_provider(path):
+    provider = ExcelContactProvider(path)
+    provider.load()
+    return provider
+
+
+def retained(build):
+    """Bytes still allocated after build() returns, and its result."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("count", nargs="?", type=int, default=100_000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path, _ = write_exports(args.count, directory)
+
+        dict_bytes, contacts = retained(lambda: former_load_csv(csv_path))
+        index_bytes, index = retained(lambda: former_index(contacts))
+        former_total = dict_bytes + index_bytes
+        del contacts, index
+
+        record_bytes, records = retained(lambda: ExcelContactProvider(csv_path)._load_csv(csv_path))
+        del records
+        provider_bytes, provider = retained(lambda: load_provider(csv_path))
+
+    count = len(provider.contacts)
+    print(f"{count} contacts")
+    print(f"  {'':<26} {'MB':>8} {'bytes/contact':>14}")
+    for label, size in (("dicts", dict_bytes), ("records", record_bytes),
+                        ("provider, dicts", former_total), ("provider, records", provider_bytes)):
+        print(f"  {label:<26} {size / 1e6:8.1f} {size / count:14.0f}")
+
+    results = provider.search("ana", 20)
+    started = time.perf_counter()
+    for _ in range(1000):
+        [c.to_hubspot() for c in results]
+    page_us = (time.perf_counter() - started) / 1000 * 1e6
+    started = time.perf_counter()
+    [c.to_hubspot() for c in provider.contacts]
+    print(f"  to_hubspot: {page_us:.0f} µs per page of {len(results)}, {time.perf_counter() - started:.2f}s for all {count}")
+
+
+if __name__ == "__main__":
+    main()
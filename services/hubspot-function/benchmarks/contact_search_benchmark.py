@@ -0,0 +1,116 @@
+"""
+Contact search: trigram index vs. the former linear scan.
+
+Contacts are synthesized by recombining the first names, last names and
+companies of data/contacts.csv, so that trigram frequencies look like real
+data. For every query the index must return exactly the contacts the linear
+scan returns; the script reports build time and per-query latency.
+
+Run from the service directory:
+    PYTHONPATH=. python benchmarks/contact_search_benchmark.py               # 100k and 500k contacts
+    PYTHONPATH=. python benchmarks/contact_search_benchmark.py 200000
+"""
+
+import argparse
+import logging
+import os
+import random
+import statistics
+import time
+
+from contact_search import ContactSearchIndex
+from excel_provider import ExcelContactProvider, SEARCH_FIELDS
+
+DEFAULT_SIZES = [100_000, 500_000]
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "contacts.csv")
+
+
+def linear_search(contacts, query):
+    # The scan ExcelContactProvider.search used before the index
+    q = query.lower()
+    return [
+        c for c in contacts
+        if q in (c["properties"].get("firstname") or "").lower()
+        or q in (c["properties"].get("lastname") or "").lower()
+        or q in (c["properties"].get("email") or "").lower()
+        or q in (c["properties"].get("company") or "").lower()
+    ]
+
+
+def make_contacts(count, seed=11):
+    source = ExcelContactProvider(DATA_PATH).contacts
+    pools = {field: [c.get(field) for c in source if c.get(field)] for field in ("firstname", "lastname", "company")}
+    rng = random.Random(seed)
+    contacts = []
+    for i in range(count):
+        first, last, company = (rng.choice(pools[field]) for field in ("firstname", "lastname", "company"))
+        domain = "".join(ch for ch in company.lower() if ch.isalnum()) or "example"
+        contact_id = str(800000000000 + i)
+        contacts.append({
+            "id": contact_id,
+            "properties": {
+                "firstname": first,
+                "lastname": last,
+                "email": f"{first[:1].lower()}{last.split(' ')[0].lower()}@{domain}.com",
+                "company": company,
+                "hs_object_id": contact_id,
+            },
+        })
+    return contacts
+
+
+def sample_queries(contacts, count, rng):
+    queries = ["gar", "mar", "ana", "gmail", ".com", "lopez", "panattoni", "zzq"]
+    while len(queries) < count:
+        value = contacts[rng.randrange(len(contacts))]["properties"][rng.choice(SEARCH_FIELDS)]
+        if len(value) >= 3:
+            start = rng.randrange(len(value) - 2)
+            queries.append(value[start:start + rng.randint(3, 8)])
+    return queries
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sizes", nargs="*", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    for size in args.sizes:
+        contacts = make_contacts(size)
+        index = ContactSearchIndex(SEARCH_FIELDS)
+        _, build_s = timed(lambda: index.build(contacts))
+
+        rng = random.Random(size)
+        queries = sample_queries(contacts, args.queries, rng)
+        scan_times, index_times, limited_times, matches = [], [], [], []
+        for query in queries:
+            expected, scan_s = timed(lambda: linear_search(contacts, query))
+            found, index_s = timed(lambda: index.search(query))
+            _, limited_s = timed(lambda: index.search(query, args.limit))
+            assert found.total == len(expected) and {id(c) for c in found.results} == {id(c) for c in expected}, query
+            scan_times.append(scan_s)
+            index_times.append(index_s)
+            limited_times.append(limited_s)
+            matches.append(found.total)
+
+        def ms(values, q):
+            return statistics.quantiles(values, n=100)[q - 1] * 1000
+
+        print(f"{size} contacts: build {build_s:.2f}s")
+        print(f"  {len(queries)} queries, median {statistics.median(matches):.0f} matches (max {max(matches)})")
+        print(f"  linear scan       p50 {ms(scan_times, 50):8.3f} ms  p95 {ms(scan_times, 95):8.3f} ms")
+        print(f"  index (all)       p50 {ms(index_times, 50):8.3f} ms  p95 {ms(index_times, 95):8.3f} ms")
+        print(f"  index (limit {args.limit:<3}) p50 {ms(limited_times, 50):8.3f} ms  p95 {ms(limited_times, 95):8.3f} ms")
+        print()
+
+
+if __name__ == "__main__":
+    main()
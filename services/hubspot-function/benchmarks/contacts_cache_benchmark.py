@@ -0,0 +1,93 @@
+"""
+Encode/decode cost of the Redis contacts cache.
+
+Compares the former str(list) / eval() round trip with the contacts_cache
+codec (JSON, with and without zlib) on synthetic HubSpot contacts. It also
+shows what a search pays per request once a generation has been decoded.
+
+Run from the service directory:
+    PYTHONPATH=. python benchmarks/contacts_cache_benchmark.py               # 10k, 100k, 1M contacts
+    PYTHONPATH=. python benchmarks/contacts_cache_benchmark.py 50000 --eval-limit 0
+"""
+
+import argparse
+import random
+import string
+import time
+import uuid
+
+from contacts_cache import decode_contacts, encode_contacts
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def make_contacts(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+
+    def word(n):
+        return "".join(rng.choices(string.ascii_lowercase, k=n)).capitalize()
+
+    contacts = []
+    for i in range(count):
+        contact_id = str(700000000000 + i)
+        created = f"2026-0{rng.randint(1, 9)}-{rng.randint(10, 28)} 1{rng.randint(0, 9)}:{rng.randint(10, 59)}"
+        first, last, company = word(rng.randint(4, 9)), word(rng.randint(5, 11)), word(rng.randint(4, 12))
+        contacts.append({
+            "id": contact_id,
+            "properties": {
+                "createdate": created,
+                "email": f"{first[0].lower()}{last.lower()}@{company.lower()}.com",
+                "firstname": first,
+                "lastname": last,
+                "hs_object_id": contact_id,
+                "lastmodifieddate": created,
+                "phone": f"+34 6{rng.randint(10000000, 99999999)}",
+                "hs_lead_status": rng.choice(["", "NEW", "OPEN", "IN_PROGRESS"]),
+                "hubspot_owner_id": rng.choice(["", "Nicolas Serratosa Schulz", "Ana María Núñez"]),
+                "company": company,
+            },
+            "createdAt": created,
+            "updatedAt": created,
+            "archived": False,
+        })
+    return contacts
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sizes", nargs="*", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--eval-limit", type=int, default=100_000,
+                        help="largest size for which the legacy eval() round trip is measured (slow and memory hungry)")
+    args = parser.parse_args()
+
+    print(f"{'contacts':>10} {'format':<12} {'size MB':>9} {'encode s':>9} {'decode s':>9}  per search")
+    for size in args.sizes:
+        contacts = make_contacts(size)
+        generation = uuid.uuid4().bytes
+
+        if size <= args.eval_limit:
+            blob, encode_s = timed(lambda: str(contacts))
+            decoded, decode_s = timed(lambda: eval(blob))
+            assert decoded == contacts
+            print(f"{size:>10} {'str/eval':<12} {len(blob) / 1e6:>9.1f} {encode_s:>9.3f} {decode_s:>9.3f}  "
+                  f"{decode_s * 1000:.1f} ms (eval on every request)")
+            del blob, decoded
+
+        for label, level in (("json", 0), ("json+zlib1", 1), ("json+zlib6", 6)):
+            blob, encode_s = timed(lambda: encode_contacts(contacts, generation, level))
+            (decoded_generation, decoded), decode_s = timed(lambda: decode_contacts(blob))
+            assert decoded_generation == generation and decoded == contacts
+            print(f"{size:>10} {label:<12} {len(blob) / 1e6:>9.1f} {encode_s:>9.3f} {decode_s:>9.3f}  "
+                  f"generation GET only (decode once per generation)")
+            del blob, decoded
+        print()
+
+
+if __name__ == "__main__":
+    main()
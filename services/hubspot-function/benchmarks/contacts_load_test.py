@@ -0,0 +1,154 @@
+"""
+Load test of the HubSpot-backed endpoints: latency of /contacts/search under
+concurrent search traffic, alone and while other clients read single contacts
+from a slow HubSpot (GET /contacts/{id}).
+
+The service runs in a uvicorn subprocess against a local fake HubSpot
+(fake_hubspot.py) and an in-process Redis stand-in with per-command latency
+(memory_redis.py). With blocking HubSpot or Redis calls in the async endpoints
+every lookup stalls the event loop, and search p99 grows to the HubSpot latency.
+
+Run from the service directory:
+    PYTHONPATH=. python benchmarks/contacts_load_test.py
+    PYTHONPATH=. python benchmarks/contacts_load_test.py --searchers 32 --lookups 8 --hubspot-latency-ms 300
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.fake_hubspot import FakeHubSpot
+
+TOKEN = "load-test-token"
+QUERIES = ["ana", "luis", "marta", "jordi", "claire", "tomasz", "paul", "name10", "name12", "name2", "name3"]
+
+
+def serve(port: int, hubspot_url: str, redis_latency: float):
+    # Unpaced sync: the fake has no rate limit
+    os.environ.update(HUBSPOT_API_KEY="load-test", HUBSPOT_CONTACTS_URL=hubspot_url, API_AUTH_TOKEN=TOKEN,
+                      HUBSPOT_SYNC_RATE_LIMIT="0")
+    import uvicorn
+    import cloud_run_function
+    from benchmarks.memory_redis import MemoryRedis
+
+    logging.getLogger().setLevel(logging.WARNING)
+    store = MemoryRedis(latency=redis_latency)
+    cloud_run_function.contacts_cache.client = store
+    cloud_run_function.hubspot_sync.client = store
+    uvicorn.run(cloud_run_function.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(label, latencies, seconds):
+    if not latencies:
+        print(f"  {label:<10} no requests completed")
+        return
+    ms = [latency * 1000 for latency in latencies]
+    print(f"  {label:<10} {len(ms):6d} requests {len(ms) / seconds:8.0f}/s   p50 {statistics.median(ms):8.1f} ms"
+          f"   p99 {percentile(ms, 0.99):8.1f} ms   max {max(ms):8.1f} ms")
+
+
+async def run_load(base_url, ids, searchers, lookups, duration):
+    limits = httpx.Limits(max_connections=searchers + lookups, max_keepalive_connections=searchers + lookups)
+    headers = {"Authorization": f"Bearer {TOKEN}"}
+    timings = {"search": [], "by id": []}
+    errors = 0
+    rng = random.Random(7)
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker(kind):
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                if kind == "search":
+                    url, params = "/contacts/search", {"query": rng.choice(QUERIES), "limit": 20}
+                else:
+                    url, params = f"/contacts/{rng.choice(ids)}", None
+                started = time.perf_counter()
+                response = await client.get(url, params=params)
+                if response.status_code != 200:
+                    errors += 1
+                    continue
+                timings[kind].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*([worker("search") for _ in range(searchers)] + [worker("by id") for _ in range(lookups)]))
+        seconds = time.perf_counter() - started
+    for kind, latencies in timings.items():
+        if latencies or (kind == "search" and searchers) or (kind == "by id" and lookups):
+            report(kind, latencies, seconds)
+    if errors:
+        print(f"  {errors} request(s) failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contacts", type=int, default=20_000)
+    parser.add_argument("--searchers", type=int, default=16, help="concurrent search clients")
+    parser.add_argument("--lookups", type=int, default=4, help="concurrent GET /contacts/{id} clients")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per phase")
+    parser.add_argument("--hubspot-latency-ms", type=float, default=200)
+    parser.add_argument("--redis-latency-ms", type=float, default=1)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--hubspot-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.port, args.hubspot_url, args.redis_latency_ms / 1000)
+
+    with FakeHubSpot(contacts=args.contacts, latency=args.hubspot_latency_ms / 1000) as fake:
+        port = free_port()
+        server = subprocess.Popen([sys.executable, __file__, "--serve", "--port", str(port), "--hubspot-url", fake.contacts_url,
+                                   "--redis-latency-ms", str(args.redis_latency_ms)])
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            for _ in range(300):
+                try:
+                    httpx.get(f"{base_url}/health").raise_for_status()
+                    break
+                except httpx.HTTPError:
+                    time.sleep(0.1)
+            else:
+                raise RuntimeError("the service did not start")
+
+            # Full sync first, so searches are served from the index and not from HubSpot
+            headers = {"Authorization": f"Bearer {TOKEN}"}
+            started = time.perf_counter()
+            httpx.post(f"{base_url}/contacts/refresh", params={"full": "true"}, headers=headers, timeout=600).raise_for_status()
+            # ...and the index is built before the first phase
+            httpx.get(f"{base_url}/contacts/search", params={"query": QUERIES[0]}, headers=headers, timeout=60).raise_for_status()
+            print(f"{args.contacts} contacts synced in {time.perf_counter() - started:.1f}s; HubSpot {args.hubspot_latency_ms:.0f} ms,"
+                  f" Redis {args.redis_latency_ms:g} ms per call; {args.duration:g}s per phase")
+
+            ids = list(fake.snapshot())
+            print(f"{args.searchers} search clients")
+            asyncio.run(run_load(base_url, ids, args.searchers, 0, args.duration))
+            print(f"{args.searchers} search clients + {args.lookups} GET /contacts/{{id}} clients")
+            asyncio.run(run_load(base_url, ids, args.searchers, args.lookups, args.duration))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
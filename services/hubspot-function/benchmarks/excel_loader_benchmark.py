@@ -0,0 +1,198 @@
+"""
+Excel/CSV contact loading: time and peak memory of the former loaders
+(openpyxl full cell model, csv.DictReader) against the streaming ones.
+
+Exports of several sizes are synthesized from the rows of data/contacts.csv
+(all HubSpot columns, unique record IDs) as both .csv and .xlsx. Every load
+runs in a fresh process; memory is the peak RSS above the process baseline
+after imports. Loaders of the same format must return identical contacts.
+
+Run from the service directory:
+    PYTHONPATH=. python benchmarks/excel_loader_benchmark.py                # 10k, 50k and 200k rows
+    PYTHONPATH=. python benchmarks/excel_loader_benchmark.py 100000 --skip-former
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import openpyxl
+
+import excel_provider
+from excel_provider import ExcelContactProvider, COLUMN_MAP, _clean_id, _normalise_value
+
+DEFAULT_SIZES = [10_000, 50_000, 200_000]
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "contacts.csv")
+
+
+# ── The loaders ExcelContactProvider used before ─────────────────────────────
+
+def _row_to_hubspot_contact(row, index):
+    # Contacts were kept as HubSpot JSON dicts
+    contact_id = _clean_id(row.get("id", ""))
+    if not contact_id:
+        contact_id = str(10000 + index)
+    created = row.get("createdate", "")
+    return {
+        "id": contact_id,
+        "properties": {
+            "createdate": created,
+            "email": row.get("email", ""),
+            "firstname": row.get("firstname", ""),
+            "lastname": row.get("lastname", ""),
+            "hs_object_id": contact_id,
+            "lastmodifieddate": created,
+            "phone": row.get("phone", ""),
+            "hs_lead_status": row.get("hs_lead_status", ""),
+            "hubspot_owner_id": row.get("hubspot_owner_id", ""),
+            "company": row.get("company", ""),
+            "hs_additional_emails": row.get("additional_emails", ""),
+        },
+        "createdAt": created,
+        "updatedAt": created,
+        "archived": False,
+    }
+
+
+def former_load_csv(path):
+    contacts = []
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for idx, row in enumerate(csv.DictReader(f)):
+            mapped = {}
+            for header, value in row.items():
+                field = COLUMN_MAP.get(header)
+                if field:
+                    mapped[field] = _normalise_value(value)
+            if mapped.get("firstname") or mapped.get("email"):
+                contacts.append(_row_to_hubspot_contact(mapped, idx))
+    return contacts
+
+
+def former_load_xlsx(path):
+    wb = openpyxl.load_workbook(path, read_only=False)
+    ws = wb.active
+    headers = [cell.value for cell in ws[1]]
+    col_map = {idx: COLUMN_MAP[h] for idx, h in enumerate(headers) if h in COLUMN_MAP}
+    contacts = []
+    for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True)):
+        mapped = {col_map[i]: _normalise_value(v) for i, v in enumerate(row) if i in col_map}
+        if mapped.get("firstname") or mapped.get("email"):
+            contacts.append(_row_to_hubspot_contact(mapped, row_idx))
+    wb.close()
+    return contacts
+
+
+# ── Test files ───────────────────────────────────────────────────────────────
+
+def write_exports(count, directory, seed=5):
+    with open(DATA_PATH, encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        headers = next(reader)
+        source = list(reader)
+    id_column, date_column = headers.index("Record ID"), headers.index("Create Date")
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        row = list(rng.choice(source))
+        row[id_column] = str(900000000000 + i)
+        rows.append(row)
+
+    csv_path = os.path.join(directory, f"contacts_{count}.csv")
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(headers)
+        writer.writerows(rows)
+
+    xlsx_path = os.path.join(directory, f"contacts_{count}.xlsx")
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Contacts")
+    ws.append(headers)
+    for row in rows:
+        row = list(row)
+        row[id_column] = int(row[id_column])
+        if row[date_column]:
+            row[date_column] = datetime.strptime(row[date_column], "%Y-%m-%d %H:%M")
+        ws.append([value if value != "" else None for value in row])
+    wb.save(xlsx_path)
+    return csv_path, xlsx_path
+
+
+# ── One measurement per process ──────────────────────────────────────────────
+
+def rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(mode, path):
+    logging.basicConfig(level=logging.WARNING)
+    loaders = {
+        "former": former_load_xlsx if path.endswith(".xlsx") else former_load_csv,
+        "streaming": lambda p: ExcelContactProvider(p)._load_xlsx(p) if p.endswith(".xlsx") else ExcelContactProvider(p)._load_csv(p),
+    }
+    loader = loaders["former" if mode == "former" else "streaming"]
+    if mode == "streaming" and path.endswith(".xlsx"):
+        try:
+            os.unlink(excel_provider._csv_cache_path(path))
+        except FileNotFoundError:
+            pass
+    baseline = rss_kb()
+    started = time.perf_counter()
+    contacts = loader(path)
+    seconds = time.perf_counter() - started
+    peak_mb = (rss_kb() - baseline) / 1024
+    # Records of the current loaders compare in their HubSpot shape
+    contacts = [c if isinstance(c, dict) else c.to_hubspot() for c in contacts]
+    digest = hashlib.sha1(json.dumps(contacts, sort_keys=True).encode()).hexdigest()
+    print(json.dumps({"seconds": seconds, "peak_mb": peak_mb, "contacts": len(contacts), "digest": digest}))
+
+
+def run(mode, path):
+    out = subprocess.run([sys.executable, __file__, "--measure", mode, path], check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sizes", nargs="*", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--skip-former", action="store_true", help="only measure the streaming loaders")
+    parser.add_argument("--measure", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        return measure(*args.measure)
+
+    print(f"{'rows':>8}  {'loader':<28} {'seconds':>8} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for count in args.sizes:
+            csv_path, xlsx_path = write_exports(count, directory)
+            sizes = f"csv {os.path.getsize(csv_path) / 1e6:.1f} MB, xlsx {os.path.getsize(xlsx_path) / 1e6:.1f} MB"
+            print(f"{count:>8}  ({sizes})")
+            cases = [
+                ("former", xlsx_path, "xlsx, full cell model"),
+                ("streaming", xlsx_path, "xlsx, read-only + CSV cache"),
+                ("cached", xlsx_path, "xlsx, from the CSV cache"),
+                ("former", csv_path, "csv, DictReader"),
+                ("streaming", csv_path, "csv, streaming"),
+            ]
+            digests = {}
+            for mode, path, label in cases:
+                if args.skip_former and mode == "former":
+                    continue
+                result = run(mode, path)
+                fmt = os.path.splitext(path)[1]
+                assert digests.setdefault(fmt, result["digest"]) == result["digest"], f"{label}: contacts differ"
+                assert result["contacts"] == count, f"{label}: {result['contacts']} contacts, expected {count}"
+                print(f"{'':>8}  {label:<28} {result['seconds']:8.2f} {result['peak_mb']:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
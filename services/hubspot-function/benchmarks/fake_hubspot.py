@@ -0,0 +1,227 @@
+"""
+Local stand-in for the HubSpot contacts API, for benchmarks and manual testing.
+
+Serves the endpoints the service uses:
+  GET  /crm/v3/objects/contacts          list, paged with limit/after (id cursor)
+  GET  /crm/v3/objects/contacts/{id}     one contact, 404 when unknown
+  POST /crm/v3/objects/contacts/search   filters (EQ/GT/GTE/LT/LTE on hs_object_id and
+                                          lastmodifieddate), one sort, limit <= 200 and
+                                          offset paging capped at 10,000 results
+
+Every request sleeps a fixed latency. Optionally more than rate_limit requests
+in one second get a 429, and every request after fail_after gets a 503 (an outage).
+"""
+
+import bisect
+import json
+import random
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+CONTACTS_PATH = "/crm/v3/objects/contacts"
+SEARCH_LIMIT = 200
+SEARCH_RESULT_CAP = 10_000
+
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def iso(ms: int) -> str:
+    return (EPOCH + timedelta(milliseconds=ms)).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def to_ms(value: str) -> int:
+    if value.isdigit():
+        return int(value) - int(EPOCH.timestamp() * 1000)
+    return int((datetime.fromisoformat(value.replace("Z", "+00:00")) - EPOCH) / timedelta(milliseconds=1))
+
+
+class FakeHubSpot:
+    def __init__(self, contacts: int = 10_000, latency: float = 0.05, rate_limit: int = 0, seed: int = 3):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.fail_after: Optional[int] = None
+        self.requests = 0
+        self.rate_limited = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self._clock = 0  # ms after EPOCH of the latest modification
+        self._ids: List[int] = []
+        self._contacts: Dict[int, Dict] = {}
+        self.add(contacts)
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path.startswith(CONTACTS_PATH + "/"):
+                    return self.reply(*fake.handle(lambda: fake.get(url.path[len(CONTACTS_PATH) + 1:])))
+                if url.path != CONTACTS_PATH:
+                    return self.reply(404, {"message": "Not found"})
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                self.reply(*fake.handle(lambda: fake.list(int(params.get("limit", 10)), params.get("after"))))
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path != CONTACTS_PATH + "/search":
+                    return self.reply(404, {"message": "Not found"})
+                self.reply(*fake.handle(lambda: fake.search(body)))
+
+            def reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up (e.g. an aborted sync)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.contacts_url = f"http://127.0.0.1:{self.server.server_address[1]}{CONTACTS_PATH}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # ── Data ─────────────────────────────────────────────────────────────
+
+    def _stamp(self) -> int:
+        self._clock += self._rng.randint(1, 5_000)
+        return self._clock
+
+    def add(self, count: int) -> List[str]:
+        with self._lock:
+            next_id = (self._ids[-1] if self._ids else 100_000) + 1
+            added = []
+            for _ in range(count):
+                next_id += self._rng.randint(1, 40)  # ids are sparse like HubSpot's
+                created = iso(self._stamp())
+                first = self._rng.choice(["Ana", "Luis", "Marta", "Jordi", "Claire", "Tomasz", "Paul"])
+                last = f"Name{next_id}"
+                self._contacts[next_id] = {
+                    "id": str(next_id),
+                    "properties": {
+                        "createdate": created,
+                        "email": f"{first.lower()}.{last.lower()}@example.com",
+                        "firstname": first,
+                        "hs_object_id": str(next_id),
+                        "lastmodifieddate": created,
+                        "lastname": last,
+                    },
+                    "createdAt": created,
+                    "updatedAt": created,
+                    "archived": False,
+                }
+                self._ids.append(next_id)
+                added.append(str(next_id))
+            return added
+
+    def touch(self, count: int) -> List[str]:
+        """Modify count random contacts (new lastname, newer lastmodifieddate)."""
+        with self._lock:
+            touched = []
+            for contact_id in self._rng.sample(self._ids, count):
+                contact = self._contacts[contact_id]
+                modified = iso(self._stamp())
+                contact["properties"] = dict(contact["properties"], lastname=f"Changed{contact_id}", lastmodifieddate=modified)
+                contact["updatedAt"] = modified
+                touched.append(str(contact_id))
+            return touched
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {str(i): self._contacts[i] for i in self._ids}
+
+    # ── API ──────────────────────────────────────────────────────────────
+
+    def handle(self, respond):
+        time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            if self.fail_after is not None and self.requests > self.fail_after:
+                return 503, {"status": "error", "message": "Service unavailable"}
+            if self.rate_limit:
+                now = time.monotonic()
+                while self._recent and now - self._recent[0] >= 1.0:
+                    self._recent.popleft()
+                if len(self._recent) >= self.rate_limit:
+                    self.rate_limited += 1
+                    return 429, {"status": "error", "category": "RATE_LIMITS", "message": "Too many requests"}
+                self._recent.append(now)
+            return respond()
+
+    def get(self, contact_id: str):
+        contact = self._contacts.get(int(contact_id)) if contact_id.isdigit() else None
+        if contact is None:
+            return 404, {"status": "error", "category": "OBJECT_NOT_FOUND", "message": "Object not found"}
+        return 200, contact
+
+    def list(self, limit: int, after: Optional[str]):
+        start = bisect.bisect_left(self._ids, int(after)) if after else 0
+        page = self._ids[start:start + min(limit, 100)]
+        payload = {"results": [self._contacts[i] for i in page]}
+        if start + len(page) < len(self._ids):
+            payload["paging"] = {"next": {"after": str(self._ids[start + len(page)])}}
+        return 200, payload
+
+    def search(self, body: Dict):
+        lo, hi = 0, len(self._ids)
+        checks = []
+        for group in body.get("filterGroups", [])[:1]:
+            for f in group.get("filters", []):
+                if f["propertyName"] == "hs_object_id":
+                    value = int(f["value"])
+                    if f["operator"] in ("GTE", "GT", "EQ"):
+                        lo = max(lo, bisect.bisect_left(self._ids, value + (f["operator"] == "GT")))
+                    if f["operator"] in ("LT", "LTE", "EQ"):
+                        hi = min(hi, bisect.bisect_left(self._ids, value + (f["operator"] != "LT")))
+                else:
+                    checks.append((f["propertyName"], f["operator"], f["value"]))
+
+        def matches(contact):
+            for name, op, value in checks:
+                actual, expected = contact["properties"].get(name) or "", value
+                if name == "lastmodifieddate":
+                    actual, expected = to_ms(actual), to_ms(value)
+                if not {"EQ": actual == expected, "GT": actual > expected, "GTE": actual >= expected,
+                        "LT": actual < expected, "LTE": actual <= expected}[op]:
+                    return False
+            return True
+
+        found = [self._contacts[i] for i in self._ids[lo:hi]]
+        if checks:
+            found = [c for c in found if matches(c)]
+        for sort in body.get("sorts", [])[:1]:
+            name = sort["propertyName"]
+            key = (lambda c: int(c["id"])) if name == "hs_object_id" else (lambda c: (c["properties"].get(name) or "", int(c["id"])))
+            found.sort(key=key, reverse=sort.get("direction") == "DESCENDING")
+
+        limit = min(int(body.get("limit", 10)), SEARCH_LIMIT)
+        offset = int(body.get("after") or 0)
+        if offset + limit > SEARCH_RESULT_CAP:
+            limit = SEARCH_RESULT_CAP - offset
+        payload = {"total": len(found), "results": found[offset:offset + max(limit, 0)]}
+        if offset + limit < min(len(found), SEARCH_RESULT_CAP):
+            payload["paging"] = {"next": {"after": str(offset + limit)}}
+        return 200, payload
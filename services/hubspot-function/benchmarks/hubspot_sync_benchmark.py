@@ -0,0 +1,125 @@
+"""
+HubSpot sync engine against a local fake HubSpot (fake_hubspot.py).
+
+Scenarios, each checked against the fake's own contact list:
+  1. the former sequential list paging (get_cached_contacts)
+  2. a full sync with bounded concurrency
+  3. an incremental sync after contacts were modified and added
+  4. a full sync interrupted by an outage, resumed by a new engine instance
+     (like a restarted replica) from the Redis checkpoint
+
+Without --redis-url the checkpoint and cache live in an in-process dict store.
+
+Run from the service directory:
+    PYTHONPATH=. python benchmarks/hubspot_sync_benchmark.py
+    PYTHONPATH=. python benchmarks/hubspot_sync_benchmark.py --contacts 50000 --latency-ms 150 --rate-limit 5 --client-rate 4
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+import redis.asyncio
+import requests
+
+import hubspot_sync
+from contacts_cache import ContactsCache
+from hubspot_sync import HubSpotSync, HubSpotSyncError
+from benchmarks.fake_hubspot import FakeHubSpot
+from benchmarks.memory_redis import MemoryRedis
+
+
+def sequential_list(contacts_url):
+    # The former get_cached_contacts loop
+    contacts, after = [], None
+    while True:
+        params = {"limit": 100}
+        if after:
+            params["after"] = after
+        data = requests.get(contacts_url, params=params).json()
+        contacts.extend(data.get("results", []))
+        after = data.get("paging", {}).get("next", {}).get("after")
+        if not after:
+            return contacts
+
+
+def check(label, contacts, fake):
+    expected = fake.snapshot()
+    assert len(contacts) == len(expected), f"{label}: {len(contacts)} contacts, expected {len(expected)}"
+    assert all(expected[c["id"]] == c for c in contacts), f"{label}: contacts differ"
+
+
+def report(label, seconds, requests_made, extra=""):
+    print(f"  {label:<34} {seconds:7.2f}s {requests_made:6d} requests  {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contacts", type=int, default=20_000)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per second before the fake answers 429 (0 = none)")
+    parser.add_argument("--concurrency", type=int, default=hubspot_sync.HUBSPOT_SYNC_CONCURRENCY)
+    parser.add_argument("--client-rate", type=float, default=0, help="HUBSPOT_SYNC_RATE_LIMIT of the engine (0 = unpaced)")
+    parser.add_argument("--redis-url", help="use a real Redis instead of the in-process store")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    store = redis.asyncio.Redis.from_url(args.redis_url) if args.redis_url else MemoryRedis()
+
+    with FakeHubSpot(contacts=args.contacts, latency=args.latency_ms / 1000, rate_limit=args.rate_limit) as fake:
+        print(f"{args.contacts} contacts, {args.latency_ms:.0f} ms per request, concurrency {args.concurrency}"
+              + (f", rate limit {args.rate_limit}/s" if args.rate_limit else "")
+              + (f", engine paced to {args.client_rate:g}/s" if args.client_rate else ""))
+
+        def engine(max_retries=hubspot_sync.HUBSPOT_MAX_RETRIES):
+            return HubSpotSync(store, ContactsCache(store, ttl=None), fake.contacts_url, "test-key",
+                               concurrency=args.concurrency, max_retries=max_retries, rate_limit=args.client_rate,
+                               prefix="bench_sync")
+
+        # The former loop gave up on any non-200 answer, so it runs without the rate limit
+        fake.requests, fake.rate_limit = 0, 0
+        started = time.perf_counter()
+        contacts = sequential_list(fake.contacts_url)
+        check("sequential", contacts, fake)
+        report("sequential list paging", time.perf_counter() - started, fake.requests, "(no rate limit)" if args.rate_limit else "")
+        fake.rate_limit = args.rate_limit
+
+        sync = engine()
+        asyncio.run(sync.reset())
+        contacts = asyncio.run(sync.sync(full=True))
+        check("full", contacts, fake)
+        stats = sync.last_stats
+        full_requests = stats.requests
+        report("full sync", stats.seconds, stats.requests, f"{stats.retries} retried")
+
+        touched = fake.touch(max(1, args.contacts // 100))
+        added = fake.add(max(1, args.contacts // 200))
+        contacts = asyncio.run(sync.sync())
+        check("incremental", contacts, fake)
+        stats = sync.last_stats
+        report(f"incremental ({len(touched)} changed, {len(added)} new)", stats.seconds, stats.requests,
+               f"{stats.fetched} fetched, mode {stats.mode}")
+
+        # Outage halfway through a full sync, then a new engine resumes from the checkpoint
+        asyncio.run(sync.reset())
+        fake.requests = 0
+        fake.fail_after = full_requests // 2
+        try:
+            asyncio.run(engine(max_retries=2).sync(full=True))
+            raise AssertionError("the outage should have stopped the full sync")
+        except HubSpotSyncError:
+            interrupted = fake.requests
+        fake.fail_after = None
+        resumed = engine()
+        contacts = asyncio.run(resumed.sync())
+        check("resumed", contacts, fake)
+        stats = resumed.last_stats
+        report("full sync resumed after outage", stats.seconds, stats.requests,
+               f"{stats.resumed_ranges} range(s) kept from {interrupted} requests before the outage")
+        if args.rate_limit:
+            print(f"  fake answered {fake.rate_limited} request(s) with 429")
+
+
+if __name__ == "__main__":
+    main()
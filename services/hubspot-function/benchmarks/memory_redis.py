@@ -0,0 +1,99 @@
+"""
+In-process stand-in for the few redis.asyncio commands used by ContactsCache
+and HubSpotSync, for benchmarks run without a Redis server.
+
+latency simulates the network round trip of every command (and of a pipeline).
+"""
+
+import asyncio
+
+
+class MemoryRedis:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.data = {}
+
+    @staticmethod
+    def _bytes(value):
+        return value.encode() if isinstance(value, str) else value
+
+    async def _round_trip(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    # Commands are plain methods so that the pipeline can buffer them
+
+    def _get(self, key):
+        return self.data.get(key)
+
+    def _set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = self._bytes(value)
+        return True
+
+    def _delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def _hset(self, key, field, value):
+        self.data.setdefault(key, {})[self._bytes(field)] = self._bytes(value)
+        return 1
+
+    def _hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def _hlen(self, key):
+        return len(self.data.get(key, {}))
+
+    def _eval(self, script, numkeys, key, token, *args):
+        # Only the lock scripts of HubSpotSync; expiry is not simulated
+        from hubspot_sync import RELEASE_LOCK_SCRIPT, RENEW_LOCK_SCRIPT
+        if self.data.get(key) != self._bytes(token):
+            return 0
+        if script == RELEASE_LOCK_SCRIPT:
+            return self._delete(key)
+        if script == RENEW_LOCK_SCRIPT:
+            return 1
+        raise NotImplementedError(script)
+
+    def __getattr__(self, name):
+        command = getattr(self, f"_{name}", None)
+        if command is None:
+            raise AttributeError(name)
+
+        async def call(*args, **kwargs):
+            await self._round_trip()
+            return command(*args, **kwargs)
+
+        return call
+
+    def pipeline(self, transaction=True):
+        store = self
+
+        class Pipeline:
+            def __init__(self):
+                self.calls = []
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                pass
+
+            def __getattr__(self, name):
+                command = getattr(store, f"_{name}")
+
+                def buffer(*args, **kwargs):
+                    self.calls.append((command, args, kwargs))
+                    return self
+
+                return buffer
+
+            async def execute(self):
+                await store._round_trip()
+                return [command(*args, **kwargs) for command, args, kwargs in self.calls]
+
+        return Pipeline()
+
+    async def aclose(self):
+        pass
@@ -1,14 +1,29 @@
 import os
+import time
+import base64
+import random
+import asyncio
+import hashlib
 import logging
-import redis
-import functools
-import requests
-from typing import List, Dict
-from fastapi import FastAPI, Depends, HTTPException, Query, UploadFile, File
+import tempfile
+from contextlib import asynccontextmanager
+from typing import List, Dict, Tuple
+
+import httpx
+import orjson
+import redis.asyncio
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, UploadFile, File
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel, Field
+from starlette.datastructures import Headers
 
-from excel_provider import ExcelContactProvider
+import metrics
+
+from excel_provider import ContactRecord, ExcelContactProvider
+from contacts_cache import ContactsCache
+from hubspot_sync import HubSpotSync, HubSpotSyncError, HUBSPOT_REQUESTS, HUBSPOT_REQUEST_SECONDS, hubspot_call_status
+from contact_search import ContactSearchIndex, hubspot_value
 
 # ===================== Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -42,6 +57,15 @@ REDIS_URL = get_secret(
     f"redis://default:{REDIS_PASSWORD}@{REDIS_CONTAINER_NAME}:6379"
 )
 
+# Connection pools and timeouts of the HubSpot and Redis clients
+HUBSPOT_TIMEOUT = float(get_secret("HUBSPOT_TIMEOUT", "10"))
+HUBSPOT_MAX_CONNECTIONS = int(get_secret("HUBSPOT_MAX_CONNECTIONS", "20"))
+REDIS_TIMEOUT = float(get_secret("REDIS_TIMEOUT", "2"))
+REDIS_MAX_CONNECTIONS = int(get_secret("REDIS_MAX_CONNECTIONS", "50"))
+
+# Share of requests whose origin is logged at INFO; the others only at DEBUG
+REQUEST_LOG_SAMPLE_RATE = float(get_secret("REQUEST_LOG_SAMPLE_RATE", "0"))
+
 API_AUTH_TOKEN = get_secret("API_AUTH_TOKEN")
 DISABLE_TOKEN_VALIDATION = get_secret("DISABLE_TOKEN_VALIDATION", "false").lower() == "true"
 
@@ -52,6 +76,9 @@ EXCEL_CONTACTS_PATH = get_secret(
     os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "contacts.xlsx")
 )
 
+# Seconds between checks of the Excel file for changes (0 disables the watcher)
+EXCEL_WATCH_INTERVAL = float(get_secret("EXCEL_WATCH_INTERVAL", "10"))
+
 USE_HUBSPOT_API = bool(HUBSPOT_API_KEY)
 excel_provider: ExcelContactProvider | None = None
 
@@ -69,10 +96,128 @@ else:
 logger.info(f"Configuration loaded — Redis: {REDIS_CONTAINER_NAME}, Data source: {'HubSpot API' if USE_HUBSPOT_API else 'Excel file'}")
 
 # ===================== Redis
-redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+# Async client; requests wait up to REDIS_TIMEOUT for one of REDIS_MAX_CONNECTIONS pooled connections.
+# Binary responses: the contacts cache stores an encoded blob, see contacts_cache.py
+redis_client = redis.asyncio.Redis(connection_pool=redis.asyncio.BlockingConnectionPool.from_url(
+    REDIS_URL,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=REDIS_TIMEOUT,
+    socket_timeout=REDIS_TIMEOUT,
+    socket_connect_timeout=REDIS_TIMEOUT,
+    decode_responses=False,
+))
+# No TTL: HubSpotSync decides when the cached list is refreshed
+contacts_cache = ContactsCache(redis_client, ttl=None)
+hubspot_sync = HubSpotSync(redis_client, contacts_cache, HUBSPOT_CONTACTS_URL, HUBSPOT_API_KEY)
+
+# Search index over the HubSpot contacts; when the cached list changes a new index is
+# built off the event loop and replaces it, one build at a time
+HUBSPOT_SEARCH_FIELDS = ("firstname", "lastname", "email")
+hubspot_search_index = ContactSearchIndex(HUBSPOT_SEARCH_FIELDS, name="hubspot")
+hubspot_indexed_contacts: List[Dict] | None = None
+hubspot_index_lock = asyncio.Lock()
+
+# ===================== HubSpot HTTP client
+# Shared keep-alive pool; at most HUBSPOT_MAX_CONNECTIONS requests are in flight, the rest wait for a connection
+hubspot_http = httpx.AsyncClient(
+    headers={
+        "Authorization": f"Bearer {HUBSPOT_API_KEY}",
+        "Content-Type": "application/json"
+    },
+    limits=httpx.Limits(max_connections=HUBSPOT_MAX_CONNECTIONS, max_keepalive_connections=HUBSPOT_MAX_CONNECTIONS),
+    timeout=httpx.Timeout(HUBSPOT_TIMEOUT, connect=5.0),
+)
+
+
+async def hubspot_request(method: str, url: str, operation: str, **kwargs) -> httpx.Response:
+    """One HubSpot call; operation labels the hubspot_requests_total / hubspot_request_duration_seconds metrics."""
+    started = time.perf_counter()
+    try:
+        response = await hubspot_http.request(method, url, **kwargs)
+    except httpx.TimeoutException as e:
+        HUBSPOT_REQUESTS.inc(operation=operation, status=hubspot_call_status(None, e))
+        logger.error(f"HubSpot request timed out: {method} {url}")
+        raise HTTPException(status_code=504, detail="HubSpot request timed out")
+    except httpx.HTTPError as e:
+        HUBSPOT_REQUESTS.inc(operation=operation, status=hubspot_call_status(None, e))
+        logger.exception("Request to HubSpot API failed")
+        raise HTTPException(status_code=502, detail="HubSpot request failed")
+    HUBSPOT_REQUEST_SECONDS.observe(time.perf_counter() - started, operation=operation)
+    HUBSPOT_REQUESTS.inc(operation=operation, status=hubspot_call_status(response))
+    return response
+
+
+# ===================== Metrics
+HTTP_REQUEST_SECONDS = metrics.Histogram("http_request_duration_seconds", "Request latency by route template and status",
+                                         ["method", "route", "status"])
+CONTACTS_SNAPSHOT_SIZE = metrics.Gauge("contacts_snapshot_contacts", "Contacts in the snapshot being served", ["source"])
+if USE_HUBSPOT_API:
+    CONTACTS_SNAPSHOT_SIZE.set_function(lambda: len(hubspot_indexed_contacts or ()), source="hubspot")
+else:
+    CONTACTS_SNAPSHOT_SIZE.set_function(lambda: len(excel_provider.contacts), source="excel")
+
+
+class RequestMetricsMiddleware:
+    """
+    Times every HTTP request into http_request_duration_seconds, labelled with the matched
+    route template (/contacts/{contact_id}, not the raw path). Logs origins at DEBUG, or at
+    INFO for a REQUEST_LOG_SAMPLE_RATE share of requests. Plain ASGI, unlike @app.middleware("http").
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        level = logging.INFO if REQUEST_LOG_SAMPLE_RATE and random.random() < REQUEST_LOG_SAMPLE_RATE else logging.DEBUG
+        if logger.isEnabledFor(level):
+            logger.log(level, f"Request from origin: {Headers(scope=scope).get('origin')}")
+
+        status = 500
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the (shared) scope
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=scope["method"], route=route, status=status)
+
 
 # ===================== App Setup
-app = FastAPI(root_path="/api")
+async def watch_excel_file():
+    """Reload the Excel provider in a worker thread whenever its file changes."""
+    while True:
+        await asyncio.sleep(EXCEL_WATCH_INTERVAL)
+        try:
+            count = await asyncio.to_thread(excel_provider.reload_if_changed)
+        except Exception:
+            logger.exception("Reloading the Excel contacts file failed")
+            continue
+        if count is not None:
+            logger.info(f"Excel contacts file changed — {count} contacts loaded")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    watcher = None
+    if excel_provider and EXCEL_WATCH_INTERVAL > 0:
+        watcher = asyncio.create_task(watch_excel_file())
+    yield
+    if watcher:
+        watcher.cancel()
+    await hubspot_http.aclose()
+    await redis_client.aclose()
+
+
+app = FastAPI(root_path="/api", lifespan=lifespan)
 security = HTTPBearer()
 
 origins = ["*"]
@@ -83,14 +228,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
-
-@app.middleware("http")
-async def log_requests(request, call_next):
-    origin = request.headers.get("origin")
-    logger.info(f"Request from origin: {origin}")
-    response = await call_next(request)
-    return response
+app.add_middleware(RequestMetricsMiddleware)
 
 
 # ===================== Auth
@@ -106,7 +246,7 @@ async def verify_api_token(token: HTTPAuthorizationCredentials = Depends(securit
         logger.warning("Invalid API token provided")
         raise HTTPException(status_code=401, detail="Invalid API token")
 
-    logger.info("API token validated successfully")
+    logger.debug("API token validated successfully")
     return {"authenticated": True}
 
 
@@ -120,93 +260,254 @@ def health():
     }
 
 
+@app.get("/metrics")
+def prometheus_metrics(user=Depends(verify_api_token)):
+    """Prometheus text format; scrape with the API token as bearer credentials."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# ===================== Paging, projection and ETags
+# Page size of /contacts and /contacts/search when only after is given, and the largest allowed limit;
+# without limit and after both answer unpaged, as before paging existed
+CONTACTS_PAGE_SIZE = int(get_secret("CONTACTS_PAGE_SIZE", "100"))
+CONTACTS_MAX_PAGE_SIZE = int(get_secret("CONTACTS_MAX_PAGE_SIZE", "1000"))
+
+
+def encode_cursor(offset: int, version: str | None) -> str:
+    """Opaque paging cursor: the offset of the next page in the list of one contacts version."""
+    return base64.urlsafe_b64encode(f"{offset}:{(version or '')[:16]}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(after: str | None, version: str | None) -> int:
+    if not after:
+        return 0
+    try:
+        offset, cursor_version = base64.urlsafe_b64decode(after + "=" * (-len(after) % 4)).decode().split(":", 1)
+        offset = int(offset)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid paging cursor")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid paging cursor")
+    if cursor_version != (version or "")[:16]:
+        # The contacts were reloaded or synced since the first page; offsets no longer line up
+        raise HTTPException(status_code=410, detail="Contacts changed since the first page; restart without after")
+    return offset
+
+
+def parse_properties(properties: str | None) -> List[str] | None:
+    """properties=firstname,email → ["firstname", "email"]; None returns every property."""
+    if properties is None:
+        return None
+    return [name.strip() for name in properties.split(",") if name.strip()]
+
+
+def contact_json(contact, properties: List[str] | None) -> Dict:
+    """A contact in the HubSpot JSON shape, limited to properties when given."""
+    if isinstance(contact, ContactRecord):
+        return contact.to_hubspot(properties)
+    if properties is None:
+        return contact
+    values = contact.get("properties") or {}
+    return dict(contact, properties={name: values[name] for name in properties if name in values})
+
+
+def contacts_etag(request: Request, version: str | None) -> str | None:
+    """ETag of a response: the contacts version and the query parameters. None when the version is unknown."""
+    if not version:
+        return None
+    params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return '"' + hashlib.sha1(f"{version}|{request.url.path}|{params}".encode()).hexdigest() + '"'
+
+
+def not_modified(request: Request, etag: str | None) -> bool:
+    if etag is None:
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def page_size(limit: int | None, after: str | None) -> int | None:
+    """The page size of a request, or None for all results in one unpaged response."""
+    if limit is None and after is None:
+        return None
+    return limit or CONTACTS_PAGE_SIZE
+
+
+def contacts_page(matches: List, total: int, offset: int, limit: int | None, properties: List[str] | None,
+                  version: str | None, etag: str | None) -> Response:
+    """
+    One page of a contact list: {"total", "results", "paging": {"next": {"after"}}}, paging only
+    when more results follow. matches holds at least the contacts up to offset + limit, or all
+    of them when limit is None.
+    """
+    content = {
+        "total": total,
+        "results": [contact_json(c, properties) for c in (matches if limit is None else matches[offset:offset + limit])],
+    }
+    if limit is not None and offset + limit < total:
+        content["paging"] = {"next": {"after": encode_cursor(offset + limit, version)}}
+    return contacts_response(content, etag)
+
+
+def contacts_response(content, etag: str | None) -> Response:
+    headers = {"Cache-Control": "private, no-cache"}
+    if etag:
+        headers["ETag"] = etag
+    # Serialised with orjson, bypassing jsonable_encoder: the contacts are plain JSON already
+    return Response(orjson.dumps(content), media_type="application/json", headers=headers)
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+
 # ===================== Contacts Endpoints
 
 @app.get("/contacts")
 async def contacts(
+    request: Request,
     user=Depends(verify_api_token),
     first_name: str = Query(None),
     last_name: str = Query(None),
-    email: str = Query(None)
+    email: str = Query(None),
+    limit: int = Query(None, ge=1, le=CONTACTS_MAX_PAGE_SIZE),
+    after: str = Query(None, description="paging.next.after of the previous page"),
+    properties: str = Query(None, description="Comma-separated properties to return, e.g. firstname,email"),
 ):
+    """
+    Contacts in list order, optionally filtered by case-insensitive substrings of
+    first name, last name and email. Both data sources page the same in-memory list
+    (the synced HubSpot contacts or the Excel snapshot).
+
+    Without limit and after all matches are returned unpaged, as before: a bare list
+    from HubSpot, {"total", "results"} from Excel.
+    """
     if USE_HUBSPOT_API:
-        query_params = {}
-        if first_name:
-            query_params["properties.firstname"] = first_name
-        if last_name:
-            query_params["properties.lastname"] = last_name
-        if email:
-            query_params["properties.email"] = email
-        return get_hubspot_contacts(query_params)
+        all_contacts, version = await get_hubspot_contacts_snapshot()
+        value = hubspot_value
+    else:
+        snapshot = excel_provider.snapshot
+        all_contacts, version = snapshot.contacts, snapshot.digest
+        value = ContactRecord.get
 
-    # Excel fallback
-    results = excel_provider.get_all()
+    etag = contacts_etag(request, version)
+    if not_modified(request, etag):
+        return not_modified_response(etag)
+    offset = decode_cursor(after, version)
+
+    results = all_contacts
     # Apply optional filters
-    if first_name:
-        results = [c for c in results if first_name.lower() in (c["properties"].get("firstname") or "").lower()]
-    if last_name:
-        results = [c for c in results if last_name.lower() in (c["properties"].get("lastname") or "").lower()]
-    if email:
-        results = [c for c in results if email.lower() in (c["properties"].get("email") or "").lower()]
-    return {"total": len(results), "results": results}
+    for name, needle in (("firstname", first_name), ("lastname", last_name), ("email", email)):
+        if needle:
+            needle = needle.lower()
+            results = [c for c in results if needle in (value(c, name) or "").lower()]
+    size = page_size(limit, after)
+    if size is None and USE_HUBSPOT_API:
+        return contacts_response([contact_json(c, parse_properties(properties)) for c in results], etag)
+    return contacts_page(results, len(results), offset, size, parse_properties(properties), version, etag)
 
 
 @app.get("/contacts/search")
-async def search_contacts(query: str = Query(..., min_length=3), user=Depends(verify_api_token)):
+async def search_contacts(
+    request: Request,
+    query: str = Query(..., min_length=3),
+    limit: int = Query(None, ge=1, le=CONTACTS_MAX_PAGE_SIZE),
+    after: str = Query(None, description="paging.next.after of the previous page"),
+    properties: str = Query(None, description="Comma-separated properties to return, e.g. firstname,email"),
+    user=Depends(verify_api_token)
+):
     if USE_HUBSPOT_API:
-        # Try Redis cache first
-        cached_contacts = redis_client.get("hubspot_contacts")
-        if cached_contacts:
-            all_contacts = eval(cached_contacts)
-        else:
-            all_contacts = get_cached_contacts()
-            redis_client.setex("hubspot_contacts", 3600, str(all_contacts))
-
-        filtered = [
-            c for c in all_contacts if query.lower() in (c["properties"].get("firstname") or "").lower()
-            or query.lower() in (c["properties"].get("lastname") or "").lower()
-            or query.lower() in (c["properties"].get("email") or "").lower()
-        ]
-        return {"total": len(filtered), "results": filtered}
+        # Decoded once per cache generation, shared with other replicas via Redis
+        index, version = await get_hubspot_search_index()
+    else:
+        snapshot = excel_provider.snapshot
+        index, version = snapshot.search_index, snapshot.digest
 
-    # Excel fallback
-    filtered = excel_provider.search(query)
-    return {"total": len(filtered), "results": filtered}
+    etag = contacts_etag(request, version)
+    if not_modified(request, etag):
+        return not_modified_response(etag)
+    offset = decode_cursor(after, version)
+
+    # Ranking is stable for one version, so page n is ranks [offset, offset + limit)
+    size = page_size(limit, after)
+    found = index.search(query, None if size is None else offset + size)
+    return contacts_page(found.results, found.total, offset, size, parse_properties(properties), version, etag)
 
 
 @app.post("/contacts/refresh")
-async def refresh_contacts_cache(user=Depends(verify_api_token)):
+async def refresh_contacts_cache(full: bool = Query(False), user=Depends(verify_api_token)):
     if USE_HUBSPOT_API:
-        get_cached_contacts.cache_clear()
-        redis_client.delete("hubspot_contacts")
-        contacts = get_cached_contacts()
-        redis_client.setex("hubspot_contacts", 3600, str(contacts))
-        return {"message": "HubSpot cache refreshed", "total": len(contacts)}
-
-    # Excel fallback — reload from disk
-    count = excel_provider.reload()
+        # Incremental unless full=true (or no complete sync exists yet)
+        try:
+            contacts = await hubspot_sync.sync(full=full)
+        except HubSpotSyncError as e:
+            logger.error(f"HubSpot sync failed: {e}")
+            raise HTTPException(status_code=502, detail="HubSpot sync failed")
+        stats = hubspot_sync.last_stats
+        return {
+            "message": f"HubSpot cache refreshed ({stats.mode} sync)" if stats else "HubSpot cache refreshed",
+            "total": len(contacts),
+            "fetched": stats.fetched if stats else 0,
+        }
+
+    # Excel fallback — reload from disk; requests keep using the current contacts meanwhile
+    count = await asyncio.to_thread(excel_provider.reload)
     return {"message": "Excel contacts reloaded from disk", "total": count}
 
 
+class BatchLookupRequest(BaseModel):
+    ids: List[str] = Field(default_factory=list, max_length=1000)
+    emails: List[str] = Field(default_factory=list, max_length=1000)
+
+
+@app.post("/contacts/batch")
+async def get_contacts_batch(body: BatchLookupRequest, user=Depends(verify_api_token)):
+    """
+    Resolve many contacts by id and/or email in one request.
+    Results follow the request order (ids first, then emails), without duplicates;
+    keys that matched nothing are listed in "missing".
+    """
+    if USE_HUBSPOT_API:
+        found, found_by_email = await asyncio.gather(
+            get_hubspot_contacts_batch(body.ids),
+            get_hubspot_contacts_batch(body.emails, id_property="email"),
+        )
+    else:
+        found = {contact_id: c.to_hubspot() for contact_id in body.ids if (c := excel_provider.get_by_id(contact_id))}
+        found_by_email = {email: c.to_hubspot() for email in body.emails if (c := excel_provider.get_by_email(email))}
+
+    results, seen = [], set()
+    missing = {"ids": [], "emails": []}
+    for keys, lookup, missing_keys in ((body.ids, found, missing["ids"]), (body.emails, found_by_email, missing["emails"])):
+        for key in keys:
+            contact = lookup.get(key)
+            if contact is None:
+                missing_keys.append(key)
+            elif contact["id"] not in seen:
+                seen.add(contact["id"])
+                results.append(contact)
+    return {"total": len(results), "results": results, "missing": missing}
+
+
 @app.get("/contacts/{contact_id}")
 async def get_contact_by_id(contact_id: str, user=Depends(verify_api_token)):
     if USE_HUBSPOT_API:
-        url = f"{HUBSPOT_CONTACTS_URL}/{contact_id}"
-        headers = {
-            "Authorization": f"Bearer {HUBSPOT_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        response = requests.get(url, headers=headers)
+        response = await hubspot_request("GET", f"{HUBSPOT_CONTACTS_URL}/{contact_id}", "get_contact")
         return response.json()
 
     # Excel fallback
     contact = excel_provider.get_by_id(contact_id)
     if not contact:
         raise HTTPException(status_code=404, detail=f"Contact {contact_id} not found")
-    return contact
+    return contact.to_hubspot()
 
 
 # ===================== Excel Management Endpoints
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # uploads are written to disk 1 MiB at a time
+
 
 @app.post("/contacts/upload-excel")
 async def upload_contacts_excel(
@@ -220,16 +521,26 @@ async def upload_contacts_excel(
     if not file.filename.endswith((".xlsx", ".xls")):
         raise HTTPException(status_code=400, detail="File must be .xlsx or .xls")
 
-    # Save uploaded file
-    os.makedirs(os.path.dirname(EXCEL_CONTACTS_PATH), exist_ok=True)
-    contents = await file.read()
-    with open(EXCEL_CONTACTS_PATH, "wb") as f:
-        f.write(contents)
-    logger.info(f"Uploaded new Excel file: {file.filename} ({len(contents)} bytes)")
+    # Stream the upload to a hidden file next to the target, then swap it in
+    target_dir = os.path.dirname(EXCEL_CONTACTS_PATH)
+    os.makedirs(target_dir, exist_ok=True)
+    fd, partial_path = tempfile.mkstemp(dir=target_dir, prefix=".upload-")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                size += len(chunk)
+        os.chmod(partial_path, 0o644)  # mkstemp creates the file owner-only
+        os.replace(partial_path, EXCEL_CONTACTS_PATH)
+    except BaseException:
+        os.unlink(partial_path)
+        raise
+    logger.info(f"Uploaded new Excel file: {file.filename} ({size} bytes)")
 
     # Reload if we're using Excel provider
     if excel_provider:
-        count = excel_provider.reload()
+        count = await asyncio.to_thread(excel_provider.reload)
         return {"message": f"Uploaded and loaded {count} contacts", "filename": file.filename}
 
     return {"message": f"Uploaded {file.filename} — restart with no HUBSPOT_API_KEY to use it"}
@@ -249,50 +560,69 @@ async def excel_info(user=Depends(verify_api_token)):
 
 # ===================== HubSpot API Helpers (only used when API key present)
 
-@functools.lru_cache(maxsize=1)
-def get_cached_contacts() -> List[Dict]:
-    logging.info("Fetching contacts from HubSpot...")
-    url = HUBSPOT_CONTACTS_URL
-    headers = {
-        "Authorization": f"Bearer {HUBSPOT_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    contacts = []
-    after = None
-    while True:
-        params = {"limit": 100}
-        if after:
-            params["after"] = after
-        response = requests.get(url, headers=headers, params=params)
-        if response.status_code != 200:
-            logging.error(f"HubSpot error: {response.status_code} - {response.text}")
-            return []
-        data = response.json()
-        contacts.extend(data.get("results", []))
-        after = data.get("paging", {}).get("next", {}).get("after")
-        if not after:
-            break
-    logging.info(f"Cached {len(contacts)} contacts")
-    return contacts
-
-
-def get_hubspot_contacts(query_params: Dict[str, str]) -> List[Dict]:
-    logging.info("Querying HubSpot contacts...")
-    url = HUBSPOT_CONTACTS_URL
-    headers = {
-        "Authorization": f"Bearer {HUBSPOT_API_KEY}",
-        "Content-Type": "application/json"
-    }
+async def get_hubspot_contacts_snapshot() -> Tuple[List[Dict], str | None]:
+    """The synced contacts and their cache generation (hex), which versions paging cursors and ETags."""
     try:
-        response = requests.get(url, headers=headers, params=query_params)
-        logging.info(f"HubSpot response status: {response.status_code}")
-        if response.status_code != 200:
-            logging.error(f"HubSpot API error: {response.text}")
+        all_contacts = await hubspot_sync.contacts()
+    except HubSpotSyncError as e:
+        logger.error(f"HubSpot sync failed: {e}")
+        raise HTTPException(status_code=502, detail="HubSpot sync failed")
+    # Read right after the await: no other task can publish a generation in between
+    generation = contacts_cache.generation
+    return all_contacts, generation.hex() if generation else None
+
+
+async def get_hubspot_search_index() -> Tuple[ContactSearchIndex, str | None]:
+    global hubspot_search_index, hubspot_indexed_contacts
+    all_contacts, version = await get_hubspot_contacts_snapshot()
+    if all_contacts is not hubspot_indexed_contacts:
+        async with hubspot_index_lock:
+            # Another request may have indexed this list while we waited for the lock
+            if all_contacts is not hubspot_indexed_contacts:
+                index = ContactSearchIndex(HUBSPOT_SEARCH_FIELDS, name="hubspot")
+                await asyncio.to_thread(index.build, all_contacts)
+                hubspot_search_index, hubspot_indexed_contacts = index, all_contacts
+    return hubspot_search_index, version
+
+
+HUBSPOT_BATCH_READ_SIZE = 100  # HubSpot limit per batch/read call
+HUBSPOT_DEFAULT_PROPERTIES = ["createdate", "email", "firstname", "hs_object_id", "lastmodifieddate", "lastname"]
+
+
+async def get_hubspot_contacts_batch(keys: List[str], id_property: str | None = None) -> Dict[str, Dict]:
+    """
+    Read contacts through the HubSpot batch API, 100 per call, calls in parallel.
+    Returns the found contacts keyed by the requested id (or id_property value, compared case-insensitively).
+    """
+    if not keys:
+        return {}
+    url = f"{HUBSPOT_CONTACTS_URL}/batch/read"
+
+    async def read_chunk(chunk: List[str]) -> List[Dict]:
+        payload = {"inputs": [{"id": key} for key in chunk]}
+        if id_property:
+            payload["idProperty"] = id_property
+            # Keep the default properties returned for id lookups; the id property must be among them
+            payload["properties"] = list(dict.fromkeys(HUBSPOT_DEFAULT_PROPERTIES + [id_property]))
+        response = await hubspot_request("POST", url, "batch_read", json=payload)
+        # 207: some inputs were not found, the rest are in results
+        if response.status_code not in (200, 207):
+            logging.error(f"HubSpot batch API error: {response.status_code} - {response.text}")
             raise HTTPException(status_code=502, detail="Error fetching contacts from HubSpot")
         return response.json().get("results", [])
-    except requests.exceptions.RequestException as e:
-        logging.exception("Request to HubSpot API failed")
-        raise HTTPException(status_code=502, detail="HubSpot request failed")
+
+    unique_keys = list(dict.fromkeys(keys))
+    chunks = [unique_keys[start:start + HUBSPOT_BATCH_READ_SIZE] for start in range(0, len(unique_keys), HUBSPOT_BATCH_READ_SIZE)]
+    found: Dict[str, Dict] = {}
+    for results in await asyncio.gather(*(read_chunk(chunk) for chunk in chunks)):
+        for contact in results:
+            key = contact["properties"].get(id_property) if id_property else contact["id"]
+            if key is not None:
+                found[key.lower() if id_property else key] = contact
+
+    if id_property:
+        return {key: found[key.strip().lower()] for key in keys if key.strip().lower() in found}
+    return found
 
 
 # ===================== Entrypoint
@@ -0,0 +1,179 @@
+"""
+In-memory trigram index for contact search.
+
+Answers the same case-insensitive substring queries as the former linear scans
+over firstname / lastname / email (/ company), without lowercasing and scanning
+every contact per request:
+
+  - the indexed fields of a contact are lowercased once, when it is added, and
+    kept as one haystack string;
+  - each trigram maps to the slots of the contacts containing it, so a query
+    only verifies the contacts listed under its rarest trigram (a three-letter
+    query needs no verification at all);
+  - matches are ranked exact field > field prefix > word prefix > substring,
+    then by position in the contact list, and can be limited.
+
+A changed contact list gets a new index, built from scratch while the current
+one keeps answering.
+
+Contacts are HubSpot JSON dicts by default; any other contact type works with
+a get_value(contact, name) accessor for the indexed fields.
+"""
+
+import heapq
+import logging
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+INDEX_BUILD_SECONDS = Histogram("contacts_index_build_duration_seconds", "Search index build() time", ["index"])
+
+NGRAM = 3
+
+# Haystack markers; neither can occur in a query
+FIELD_MARK = "\x00"  # around every field value
+WORD_MARK = "\x01"   # before every word start in the word haystack
+
+# Characters after which a new word starts ("ana" in "maria ana", "acme" in "j.doe@acme.com")
+WORD_BOUNDARIES = " .-_@+'"
+WORD_START_TABLE = str.maketrans({ch: ch + WORD_MARK for ch in WORD_BOUNDARIES})
+
+
+class SearchResult(NamedTuple):
+    total: int
+    results: List[Any]
+
+
+def hubspot_value(contact: Dict, name: str) -> Optional[str]:
+    """The id or a property of a contact in the HubSpot JSON shape."""
+    if name == "id":
+        return contact.get("id")
+    return (contact.get("properties") or {}).get(name)
+
+
+def ngrams(value: str) -> set:
+    return {value[i:i + NGRAM] for i in range(len(value) - NGRAM + 1)}
+
+
+def mark_word_starts(value: str) -> str:
+    return WORD_MARK + value.translate(WORD_START_TABLE)
+
+
+class ContactSearchIndex:
+    """
+    Trigram index over the given contact property fields.
+    Not thread-safe for writers: build() replaces the index contents in place.
+    """
+
+    def __init__(self, fields: Sequence[str], get_value: Callable[[Any, str], Optional[str]] = hubspot_value,
+                 name: str = "contacts"):
+        self.fields = tuple(fields)
+        self.get_value = get_value
+        self.name = name  # index label of contacts_index_build_duration_seconds
+        self._reset()
+
+    def _reset(self):
+        self._contacts: List[Any] = []        # slot (position in the contact list) -> contact
+        self._haystacks: List[str] = []       # slot -> \0value\0value\0
+        self._word_haystacks: List[str] = []  # slot -> values with WORD_MARK before each word
+        self._postings: Dict[str, List[int]] = {}
+
+    def __len__(self):
+        return len(self._contacts)
+
+    def _haystack(self, contact: Any) -> str:
+        get_value = self.get_value
+        values = [(get_value(contact, field) or "").lower() for field in self.fields]
+        return FIELD_MARK + FIELD_MARK.join(values) + FIELD_MARK
+
+    def _add(self, contact: Any, haystack: str):
+        slot = len(self._contacts)
+        self._contacts.append(contact)
+        self._haystacks.append(haystack)
+        self._word_haystacks.append(FIELD_MARK.join(mark_word_starts(value) for value in haystack.split(FIELD_MARK)))
+        # Trigrams never span a field boundary, because FIELD_MARK never occurs in a query
+        grams = ngrams(haystack)
+        postings = self._postings
+        for gram in grams:
+            if FIELD_MARK in gram:
+                continue
+            posting = postings.get(gram)
+            if posting is None:
+                postings[gram] = [slot]
+            else:
+                posting.append(slot)
+
+    # ── Building ─────────────────────────────────────────────────────────
+
+    def build(self, contacts: List[Any]) -> int:
+        """Index contacts from scratch and return how many were indexed."""
+        started = time.perf_counter()
+        self._reset()
+        for contact in contacts:
+            self._add(contact, self._haystack(contact))
+        INDEX_BUILD_SECONDS.observe(time.perf_counter() - started, index=self.name)
+        logger.info(f"Built search index for {len(contacts)} contacts ({len(self._postings)} trigrams)")
+        return len(contacts)
+
+    # ── Querying ─────────────────────────────────────────────────────────
+
+    def _matches(self, q: str) -> List[int]:
+        haystacks = self._haystacks
+        if len(q) < NGRAM:
+            return [slot for slot, haystack in enumerate(haystacks) if q in haystack]
+
+        shortest = None
+        for gram in ngrams(q):
+            posting = self._postings.get(gram)
+            if posting is None:
+                return []
+            if shortest is None or len(posting) < len(shortest):
+                shortest = posting
+
+        if len(q) == NGRAM:
+            # The posting of the query's only trigram is exactly its match set
+            return shortest
+        return [slot for slot in shortest if q in haystacks[slot]]
+
+    def search(self, query: str, limit: Optional[int] = None) -> SearchResult:
+        """
+        Contacts with query as a case-insensitive substring of any indexed field,
+        best matches first. total counts every match, results holds at most limit.
+        """
+        q = query.lower()
+        if not q or FIELD_MARK in q or WORD_MARK in q:
+            return SearchResult(0, [])
+
+        matches = self._matches(q)
+        if limit is None:
+            limit = len(matches)
+
+        # Rank tiers, best first: each is a (needle, haystacks) test; the last one matches everything left
+        tiers = (
+            (FIELD_MARK + q + FIELD_MARK, self._haystacks),
+            (FIELD_MARK + q, self._haystacks),
+            (mark_word_starts(q), self._word_haystacks),
+            (None, None),
+        )
+        ranked: List[int] = []
+        remaining = matches
+        for needle, haystacks in tiers:
+            if len(ranked) >= limit or not remaining:
+                break
+            if needle is None:
+                tier, rest = remaining, []
+            else:
+                tier = [slot for slot in remaining if needle in haystacks[slot]]
+                if not tier:
+                    continue
+                rest = [slot for slot in remaining if needle not in haystacks[slot]] if len(ranked) + len(tier) < limit else []
+            needed = limit - len(ranked)
+            # Slots are positions in the contact list
+            ranked.extend(heapq.nsmallest(needed, tier) if needed < len(tier) else sorted(tier))
+            remaining = rest
+
+        contacts = self._contacts
+        return SearchResult(len(matches), [contacts[slot] for slot in ranked])
@@ -0,0 +1,170 @@
+"""
+Redis cache for the HubSpot contact list.
+
+The list is stored as one versioned binary blob, so that every replica can
+reuse a list fetched by another one without calling HubSpot again. Each
+replica decodes a blob only once per cache generation and keeps the result
+in memory. After that, a search only needs one small GET for the generation key.
+
+Blob layout (see encode_contacts):
+    magic "HSCC" | format version (1 byte) | flags (1 byte) | generation (16 bytes) | payload
+The payload is compact UTF-8 JSON, zlib-compressed when FLAG_ZLIB is set.
+"""
+
+import os
+import json
+import asyncio
+import zlib
+import uuid
+import struct
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import redis
+import redis.asyncio
+
+from metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"HSCC"
+FORMAT_VERSION = 1
+FLAG_ZLIB = 0x01
+
+HEADER = struct.Struct("!4sBB16s")
+
+# zlib level 1 already shrinks contact JSON ~5x and costs a fraction of the JSON encoding itself
+CONTACTS_CACHE_COMPRESSION_LEVEL = int(os.getenv("CONTACTS_CACHE_COMPRESSION_LEVEL", "1"))
+CONTACTS_CACHE_TTL = int(os.getenv("CONTACTS_CACHE_TTL", "3600"))
+
+CACHE_LOOKUPS = Counter("contacts_cache_lookups_total",
+                        "cached() outcomes: hit (generation already decoded), decoded (new generation read from Redis), "
+                        "miss (nothing in Redis), invalid (unreadable blob), error (Redis unavailable)", ["result"])
+CACHE_CODEC_SECONDS = Histogram("contacts_cache_codec_duration_seconds", "Contacts blob encode/decode time", ["operation"])
+CACHE_BLOB_BYTES = Gauge("contacts_cache_blob_bytes", "Size of the contacts blob last read from or written to Redis")
+
+
+class CacheFormatError(ValueError):
+    """Raised for blobs that were not written by encode_contacts (or by another format version)."""
+
+
+def encode_contacts(contacts: List[Dict], generation: bytes, compression_level: int = CONTACTS_CACHE_COMPRESSION_LEVEL) -> bytes:
+    """Serialize contacts into a cache blob. compression_level 0 stores the JSON uncompressed."""
+    payload = json.dumps(contacts, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    flags = 0
+    if compression_level > 0:
+        payload = zlib.compress(payload, compression_level)
+        flags |= FLAG_ZLIB
+    return HEADER.pack(MAGIC, FORMAT_VERSION, flags, generation) + payload
+
+
+def decode_contacts(blob: bytes) -> Tuple[bytes, List[Dict]]:
+    """Parse a cache blob into (generation, contacts)."""
+    if len(blob) < HEADER.size:
+        raise CacheFormatError("Blob is shorter than the cache header")
+    magic, version, flags, generation = HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise CacheFormatError("Not a contacts cache blob")
+    if version != FORMAT_VERSION:
+        raise CacheFormatError(f"Unsupported contacts cache format version {version}")
+
+    payload = memoryview(blob)[HEADER.size:]
+    try:
+        if flags & FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+        contacts = json.loads(bytes(payload).decode("utf-8"))
+    except (zlib.error, UnicodeDecodeError, ValueError) as e:
+        raise CacheFormatError(f"Corrupt contacts cache payload: {e}") from e
+    return generation, contacts
+
+
+class ContactsCache:
+    """
+    Contact list shared via Redis and held in process memory.
+
+    Redis keys:
+      <key>             the blob written by encode_contacts
+      <key>:generation  the generation id of that blob, checked on every cached() / get()
+
+    The client is a redis.asyncio client created with decode_responses=False.
+    Blobs are encoded and decoded in a worker thread, off the event loop.
+    ttl=None keeps the keys until they are replaced or invalidated.
+    """
+
+    def __init__(self, client: "redis.asyncio.Redis", key: str = "hubspot_contacts", ttl: Optional[int] = CONTACTS_CACHE_TTL):
+        self.client = client
+        self.key = key
+        self.generation_key = f"{key}:generation"
+        self.ttl = ttl
+        self._generation: Optional[bytes] = None
+        self._contacts: List[Dict] = []
+
+    @property
+    def generation(self) -> Optional[bytes]:
+        """Generation of the contacts last returned by cached()/get() or published by put()."""
+        return self._generation
+
+    async def cached(self) -> Optional[List[Dict]]:
+        """Return the contacts of the current generation, or None if Redis holds no valid one."""
+        try:
+            generation = await self.client.get(self.generation_key)
+            if generation is None:
+                CACHE_LOOKUPS.inc(result="miss")
+                return None
+            if generation == self._generation:
+                CACHE_LOOKUPS.inc(result="hit")
+                return self._contacts
+            blob = await self.client.get(self.key)
+            if blob is None:
+                CACHE_LOOKUPS.inc(result="miss")
+                return None
+            with CACHE_CODEC_SECONDS.time(operation="decode"):
+                self._generation, self._contacts = await asyncio.to_thread(decode_contacts, blob)
+            CACHE_LOOKUPS.inc(result="decoded")
+            CACHE_BLOB_BYTES.set(len(blob))
+            logger.info(f"Decoded {len(self._contacts)} contacts from Redis ({len(blob)} bytes)")
+            return self._contacts
+        except CacheFormatError as e:
+            CACHE_LOOKUPS.inc(result="invalid")
+            logger.warning(f"Ignoring unreadable contacts cache: {e}")
+            return None
+        except redis.RedisError as e:
+            CACHE_LOOKUPS.inc(result="error")
+            logger.warning(f"Redis unavailable, serving contacts from memory: {e}")
+            return self._contacts if self._generation is not None else None
+
+    async def get(self, loader: Callable[[], Awaitable[List[Dict]]]) -> List[Dict]:
+        """
+        Return the cached contacts. If no valid generation exists in Redis,
+        fetch them with await loader() and publish them.
+        """
+        contacts = await self.cached()
+        if contacts is None:
+            contacts = await loader()
+            await self.put(contacts)
+        return contacts
+
+    async def put(self, contacts: List[Dict]) -> None:
+        """Publish contacts as a new generation and keep them in memory."""
+        generation = uuid.uuid4().bytes
+        with CACHE_CODEC_SECONDS.time(operation="encode"):
+            blob = await asyncio.to_thread(encode_contacts, contacts, generation)
+        CACHE_BLOB_BYTES.set(len(blob))
+        self._generation, self._contacts = generation, contacts
+        try:
+            # Blob first, generation second, in one MULTI so readers never see a generation without its blob
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.set(self.key, blob, ex=self.ttl)
+                pipe.set(self.generation_key, generation, ex=self.ttl)
+                await pipe.execute()
+            logger.info(f"Cached {len(contacts)} contacts in Redis ({len(blob)} bytes)")
+        except redis.RedisError as e:
+            logger.warning(f"Could not write contacts cache to Redis: {e}")
+
+    async def invalidate(self) -> None:
+        """Drop the cache in Redis and in memory."""
+        self._generation, self._contacts = None, []
+        try:
+            await self.client.delete(self.key, self.generation_key)
+        except redis.RedisError as e:
+            logger.warning(f"Could not delete contacts cache from Redis: {e}")
@@ -5,15 +5,30 @@ Reads contacts from a CSV or Excel file (HubSpot export format) and serves
 them through the same interface as the live HubSpot API.
 
 Supports both Spanish and English HubSpot export column headers.
-Prefers CSV (more reliable) but also handles .xlsx files.
+Prefers CSV (more reliable) but also handles .xlsx files. Workbooks are
+streamed in read-only mode once and cached as a CSV next to them.
+
+Contacts are kept as compact ContactRecord objects; the HubSpot JSON shape
+is only built (to_hubspot) when a contact is returned by an endpoint.
+
+A load parses into a new ContactSnapshot (contacts, search index, lookups)
+that replaces the current one in a single assignment: readers never wait
+for a reload and never see a partly loaded file.
 """
 
 import os
+import re
 import csv
+import sys
+import hashlib
 import logging
-from typing import List, Dict, Optional
+import threading
+from dataclasses import dataclass, field, replace
+from typing import Iterable, List, Dict, Optional, Sequence, Tuple
 from datetime import datetime
 
+from contact_search import ContactSearchIndex, SearchResult
+
 logger = logging.getLogger(__name__)
 
 # ── Column mapping: HubSpot export header → internal field name ──────────────
@@ -44,6 +59,26 @@ COLUMN_MAP = {
     "Additional email addresses": "additional_emails",
 }
 
+# Fields kept in the CSV cache of an .xlsx export → the ContactRecord attribute they are read back from
+CSV_CACHE_FIELDS = {
+    "id": "id",
+    "firstname": "firstname",
+    "lastname": "lastname",
+    "createdate": "createdate",
+    "email": "email",
+    "phone": "phone",
+    "hs_lead_status": "hs_lead_status",
+    "hubspot_owner_id": "hubspot_owner_id",
+    "company": "company",
+    "additional_emails": "hs_additional_emails",
+}
+
+# Contact properties matched by search()
+SEARCH_FIELDS = ("firstname", "lastname", "email", "company")
+
+# HubSpot exports separate additional emails with ";" (older exports use ",")
+EMAIL_SEPARATORS = re.compile(r"[;,\s]+")
+
 
 def _normalise_value(value) -> str:
     """Convert cell value to a JSON-safe string."""
@@ -54,6 +89,10 @@ def _normalise_value(value) -> str:
     return str(value).strip()
 
 
+def _normalise_email(email: str) -> str:
+    return (email or "").strip().lower()
+
+
 def _clean_id(raw_id: str) -> str:
     """Normalise a HubSpot record ID (may be scientific notation or float)."""
     if not raw_id:
@@ -64,35 +103,121 @@ def _clean_id(raw_id: str) -> str:
         return raw_id.strip()
 
 
-def _row_to_hubspot_contact(row: Dict[str, str], index: int) -> Dict:
+class ContactRecord:
     """
-    Convert a mapped row dict into the HubSpot contact JSON shape
-    expected by the frontend (HubSpotContact interface).
+    One exported contact, one slot per value. Values shared by many contacts
+    (owner, lead status, company, first name, create date) are interned.
     """
+
+    __slots__ = ("id", "createdate", "email", "firstname", "lastname", "phone",
+                 "hs_lead_status", "hubspot_owner_id", "company", "hs_additional_emails")
+
+    # Properties of the HubSpot shape that repeat another value
+    ALIASES = {"hs_object_id": "id", "lastmodifieddate": "createdate"}
+
+    def __init__(self, contact_id: str, row: Dict[str, str]):
+        intern = sys.intern
+        self.id = contact_id
+        self.createdate = intern(row.get("createdate", ""))
+        self.email = row.get("email", "")
+        self.firstname = intern(row.get("firstname", ""))
+        self.lastname = row.get("lastname", "")
+        self.phone = row.get("phone", "")
+        self.hs_lead_status = intern(row.get("hs_lead_status", ""))
+        self.hubspot_owner_id = intern(row.get("hubspot_owner_id", ""))
+        self.company = intern(row.get("company", ""))
+        self.hs_additional_emails = row.get("additional_emails", "")
+
+    def get(self, name: str) -> Optional[str]:
+        """The id or a HubSpot property value; None for properties an export does not have."""
+        name = self.ALIASES.get(name, name)
+        return getattr(self, name) if name in self.__slots__ else None
+
+    def to_hubspot(self, properties: Optional[Sequence[str]] = None) -> Dict:
+        """
+        The HubSpot contact JSON shape expected by the frontend (HubSpotContact interface).
+        With properties, only those (known) properties are included, as with HubSpot's properties= parameter.
+        """
+        created = self.createdate
+        if properties is not None:
+            values = {name: value for name in properties if (value := self.get(name)) is not None}
+            return {"id": self.id, "properties": values, "createdAt": created, "updatedAt": created, "archived": False}
+        return {
+            "id": self.id,
+            "properties": {
+                "createdate": created,
+                "email": self.email,
+                "firstname": self.firstname,
+                "lastname": self.lastname,
+                "hs_object_id": self.id,
+                "lastmodifieddate": created,
+                "phone": self.phone,
+                "hs_lead_status": self.hs_lead_status,
+                "hubspot_owner_id": self.hubspot_owner_id,
+                "company": self.company,
+                "hs_additional_emails": self.hs_additional_emails,
+            },
+            "createdAt": created,
+            "updatedAt": created,
+            "archived": False,
+        }
+
+    def __repr__(self):
+        return f"ContactRecord(id={self.id!r}, email={self.email!r})"
+
+
+def _row_to_record(row: Dict[str, str], index: int) -> ContactRecord:
+    """Convert a mapped row dict into a record; rows without an id get one from their position."""
     contact_id = _clean_id(row.get("id", ""))
     if not contact_id:
         contact_id = str(10000 + index)
+    return ContactRecord(contact_id, row)
+
+
+def _csv_cache_path(path: str) -> str:
+    """Hidden CSV next to an .xlsx file, e.g. data/.contacts.xlsx.csv"""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.csv")
+
+
+def _column_fields(headers: Sequence, column_map: Dict[str, str]) -> List[Tuple[int, str]]:
+    """(column index, field name) of every known header."""
+    return [(idx, column_map[header]) for idx, header in enumerate(headers) if header in column_map]
+
+
+def _rows_to_contacts(rows: Iterable[Sequence], columns: List[Tuple[int, str]]) -> List[ContactRecord]:
+    """Map data rows (header excluded) to contacts; rows without first name and email are skipped."""
+    contacts = []
+    for idx, row in enumerate(rows):
+        width = len(row)
+        mapped = {field: _normalise_value(row[i]) for i, field in columns if i < width}
+        if mapped.get("firstname") or mapped.get("email"):
+            contacts.append(_row_to_record(mapped, idx))
+    return contacts
+
+
+def _file_signature(path: str) -> Tuple[str, int, int]:
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
 
-    created = row.get("createdate", "")
-
-    return {
-        "id": contact_id,
-        "properties": {
-            "createdate": created,
-            "email": row.get("email", ""),
-            "firstname": row.get("firstname", ""),
-            "lastname": row.get("lastname", ""),
-            "hs_object_id": contact_id,
-            "lastmodifieddate": created,
-            "phone": row.get("phone", ""),
-            "hs_lead_status": row.get("hs_lead_status", ""),
-            "hubspot_owner_id": row.get("hubspot_owner_id", ""),
-            "company": row.get("company", ""),
-        },
-        "createdAt": created,
-        "updatedAt": created,
-        "archived": False,
-    }
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class ContactSnapshot:
+    """Everything parsed from one version of the contacts file; never modified once published."""
+    contacts: List[ContactRecord] = field(default_factory=list)
+    search_index: ContactSearchIndex = field(default_factory=lambda: ContactSearchIndex(SEARCH_FIELDS, ContactRecord.get, name="excel"))
+    by_id: Dict[str, ContactRecord] = field(default_factory=dict)
+    by_email: Dict[str, ContactRecord] = field(default_factory=dict)
+    signature: Optional[Tuple[str, int, int]] = None  # (path, mtime_ns, size) of the parsed file
+    digest: Optional[str] = None                        # sha256 of its content
 
 
 class ExcelContactProvider:
@@ -104,12 +229,15 @@ class ExcelContactProvider:
       1. Exact path given (CSV or XLSX)
       2. If .xlsx path given, also checks for .csv with same base name
       3. Scans the data directory for any .csv or .xlsx file
+
+    Reads use the current snapshot without locking; loads are serialised.
     """
 
     def __init__(self, file_path: str):
         self.file_path = file_path
-        self._contacts: List[Dict] = []
-        self._loaded = False
+        self._snapshot: Optional[ContactSnapshot] = None
+        self._load_lock = threading.Lock()
+        self._rejected_signature = None  # file version that yielded no contacts, not retried until it changes
 
     def _resolve_file(self) -> Optional[str]:
         """Find the best available data file."""
@@ -128,8 +256,8 @@ class ExcelContactProvider:
         data_dir = os.path.dirname(self.file_path)
         if os.path.isdir(data_dir):
             for f in sorted(os.listdir(data_dir)):
-                if f.startswith("~$"):
-                    continue  # skip Excel lock files
+                if f.startswith(("~$", ".")):
+                    continue  # skip Excel lock files, CSV caches and partial uploads
                 if f.endswith((".csv", ".xlsx", ".xls")):
                     return os.path.join(data_dir, f)
 
@@ -138,106 +266,194 @@ class ExcelContactProvider:
     # ── Loading ──────────────────────────────────────────────────────────
 
     def load(self) -> int:
-        """Parse the data file and return the number of contacts loaded."""
+        """Parse the data file, publish it as the current snapshot and return the number of contacts loaded."""
+        with self._load_lock:
+            self._snapshot = self._parse(self._resolve_file())
+            return len(self._snapshot.contacts)
+
+    def reload_if_changed(self) -> Optional[int]:
+        """
+        Reload when the data file was replaced or modified (path, mtime or size differ and
+        so does the content hash). Returns the new number of contacts, or None if nothing changed.
+        A missing file or one that yields no contacts leaves the current snapshot in place.
+        """
         resolved = self._resolve_file()
+        if not resolved:
+            return None
+        with self._load_lock:
+            current = self._snapshot or ContactSnapshot()
+            try:
+                signature = _file_signature(resolved)
+                if signature in (current.signature, self._rejected_signature):
+                    return None
+                if current.signature and current.signature[0] == resolved and _file_digest(resolved) == current.digest:
+                    # Touched or rewritten with the same content
+                    self._snapshot = replace(current, signature=signature)
+                    return None
+            except OSError as e:
+                logger.warning(f"Could not check contact file {resolved}: {e}")
+                return None
+
+            logger.info(f"Contact file changed: {resolved}")
+            snapshot = self._parse(resolved)
+            if not snapshot.contacts and current.contacts:
+                logger.error(f"No contacts in {resolved}; keeping the {len(current.contacts)} loaded contacts")
+                self._rejected_signature = signature
+                return None
+            self._snapshot = snapshot
+            return len(snapshot.contacts)
+
+    def _parse(self, resolved: Optional[str]) -> ContactSnapshot:
+        """Read a data file into a new snapshot (empty when there is no file)."""
         if not resolved:
             logger.error(f"No contact file found (searched near {self.file_path})")
-            return 0
+            return ContactSnapshot()
 
         logger.info(f"Loading contacts from: {resolved}")
+        try:
+            # Taken before reading: a change during the read is seen by the next reload_if_changed()
+            signature, digest = _file_signature(resolved), _file_digest(resolved)
+        except OSError as e:
+            logger.error(f"Could not read contact file {resolved}: {e}")
+            return ContactSnapshot()
 
         if resolved.endswith(".csv"):
             contacts = self._load_csv(resolved)
         else:
             contacts = self._load_xlsx(resolved)
 
-        self._contacts = contacts
-        self._loaded = True
+        search_index = ContactSearchIndex(SEARCH_FIELDS, ContactRecord.get, name="excel")
+        search_index.build(contacts)
+        by_id, by_email = self._build_lookups(contacts)
         logger.info(f"Loaded {len(contacts)} contacts from {os.path.basename(resolved)}")
-        return len(contacts)
-
-    def _load_csv(self, path: str) -> List[Dict]:
+        return ContactSnapshot(contacts, search_index, by_id, by_email, signature, digest)
+
+    @staticmethod
+    def _build_lookups(contacts: List[ContactRecord]) -> Tuple[Dict[str, ContactRecord], Dict[str, ContactRecord]]:
+        """Index contacts by id and by normalised primary / additional email (first contact wins)."""
+        by_id: Dict[str, ContactRecord] = {}
+        by_email: Dict[str, ContactRecord] = {}
+        for c in contacts:
+            by_id.setdefault(c.id, c)
+            email = _normalise_email(c.email)
+            if email:
+                by_email.setdefault(email, c)
+        # Primary emails take precedence over another contact's additional emails
+        for c in contacts:
+            for email in EMAIL_SEPARATORS.split(c.hs_additional_emails):
+                email = _normalise_email(email)
+                if email:
+                    by_email.setdefault(email, c)
+        return by_id, by_email
+
+    def _load_csv(self, path: str, column_map: Dict[str, str] = COLUMN_MAP) -> List[ContactRecord]:
         """Load contacts from a CSV file."""
-        contacts = []
         # Try UTF-8 first, fall back to latin-1
         for encoding in ("utf-8-sig", "utf-8", "latin-1"):
             try:
-                with open(path, "r", encoding=encoding) as f:
-                    reader = csv.DictReader(f)
-                    for idx, row in enumerate(reader):
-                        mapped = {}
-                        for header, value in row.items():
-                            field = COLUMN_MAP.get(header)
-                            if field:
-                                mapped[field] = _normalise_value(value)
-                        if mapped.get("firstname") or mapped.get("email"):
-                            contacts.append(_row_to_hubspot_contact(mapped, idx))
-                return contacts
+                with open(path, "r", encoding=encoding, newline="") as f:
+                    reader = csv.reader(f)
+                    columns = _column_fields(next(reader, []), column_map)
+                    # Blank lines are not rows (as with csv.DictReader)
+                    return _rows_to_contacts((row for row in reader if row), columns)
             except UnicodeDecodeError:
                 continue
         logger.error(f"Could not decode CSV file: {path}")
         return []
 
-    def _load_xlsx(self, path: str) -> List[Dict]:
-        """Load contacts from an Excel file."""
+    def _load_xlsx(self, path: str) -> List[ContactRecord]:
+        """
+        Load contacts from an Excel file. The sheet is streamed in read-only mode
+        and the result cached as CSV; later loads of the same file read the cache.
+        """
+        cache = _csv_cache_path(path)
+        try:
+            if os.stat(cache).st_mtime_ns == os.stat(path).st_mtime_ns:
+                logger.info(f"Reading {os.path.basename(path)} from its CSV cache")
+                return self._load_csv(cache, {field: field for field in CSV_CACHE_FIELDS})
+        except OSError:
+            pass
+
         try:
             import openpyxl
-            wb = openpyxl.load_workbook(path, read_only=False)
-            ws = wb.active
-            if ws is None and wb.sheetnames:
-                ws = wb[wb.sheetnames[0]]
-            if ws is None:
+            wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+            try:
+                ws = wb.active
+                if ws is None and wb.sheetnames:
+                    ws = wb[wb.sheetnames[0]]
+                if ws is None:
+                    logger.error(f"No readable sheet in {path}")
+                    return []
+                # Exporters do not always write the sheet dimensions; read every row
+                ws.reset_dimensions()
+                rows = ws.iter_rows(values_only=True)
+                columns = _column_fields(next(rows, ()), COLUMN_MAP)
+                contacts = _rows_to_contacts(rows, columns)
+            finally:
                 wb.close()
-                logger.error(f"No readable sheet in {path}")
-                return []
-
-            headers = [cell.value for cell in ws[1]]
-            col_map: Dict[int, str] = {}
-            for idx, header in enumerate(headers):
-                if header in COLUMN_MAP:
-                    col_map[idx] = COLUMN_MAP[header]
-
-            contacts = []
-            for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True)):
-                mapped = {col_map[i]: _normalise_value(v) for i, v in enumerate(row) if i in col_map}
-                if mapped.get("firstname") or mapped.get("email"):
-                    contacts.append(_row_to_hubspot_contact(mapped, row_idx))
-            wb.close()
-            return contacts
 
         except Exception as e:
             logger.error(f"Failed to read xlsx {path}: {e}")
             return []
 
+        self._write_csv_cache(path, cache, contacts)
+        return contacts
+
+    @staticmethod
+    def _write_csv_cache(path: str, cache: str, contacts: List[ContactRecord]):
+        """Write contacts as CSV; the cache is valid while its mtime equals the workbook's."""
+        partial = cache + ".tmp"
+        try:
+            with open(partial, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(CSV_CACHE_FIELDS)
+                attributes = list(CSV_CACHE_FIELDS.values())
+                for c in contacts:
+                    writer.writerow([getattr(c, a) for a in attributes])
+            stat = os.stat(path)
+            os.utime(partial, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            os.replace(partial, cache)
+        except OSError as e:
+            logger.warning(f"Could not write CSV cache {cache}: {e}")
+
+    def _current(self) -> ContactSnapshot:
+        """The published snapshot; the first call loads the file."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._load_lock:
+                if self._snapshot is None:
+                    self._snapshot = self._parse(self._resolve_file())
+                snapshot = self._snapshot
+        return snapshot
+
     @property
-    def contacts(self) -> List[Dict]:
-        if not self._loaded:
-            self.load()
-        return self._contacts
+    def snapshot(self) -> ContactSnapshot:
+        """The current snapshot; hold on to it to serve one request from a single file version."""
+        return self._current()
+
+    @property
+    def contacts(self) -> List[ContactRecord]:
+        return self._current().contacts
 
     # ── Query interface (mirrors HubSpot endpoints) ──────────────────────
 
-    def get_all(self) -> List[Dict]:
+    def get_all(self) -> List[ContactRecord]:
         return self.contacts
 
-    def get_by_id(self, contact_id: str) -> Optional[Dict]:
-        for c in self.contacts:
-            if c["id"] == contact_id:
-                return c
-        return None
+    def get_by_id(self, contact_id: str) -> Optional[ContactRecord]:
+        return self._current().by_id.get(contact_id)
+
+    def get_by_email(self, email: str) -> Optional[ContactRecord]:
+        """Find a contact by primary or additional email, case-insensitively."""
+        return self._current().by_email.get(_normalise_email(email))
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[ContactRecord]:
+        return self.search_with_total(query, limit).results
 
-    def search(self, query: str) -> List[Dict]:
-        q = query.lower()
-        return [
-            c for c in self.contacts
-            if q in (c["properties"].get("firstname") or "").lower()
-            or q in (c["properties"].get("lastname") or "").lower()
-            or q in (c["properties"].get("email") or "").lower()
-            or q in (c["properties"].get("company") or "").lower()
-        ]
+    def search_with_total(self, query: str, limit: Optional[int] = None) -> SearchResult:
+        """Ranked substring search over SEARCH_FIELDS; total counts all matches."""
+        return self._current().search_index.search(query, limit)
 
     def reload(self) -> int:
-        """Force re-read from disk (e.g. after file update)."""
-        self._loaded = False
-        self._contacts = []
+        """Force re-read from disk (e.g. after file update). Reads keep using the previous snapshot until it is swapped."""
         return self.load()
@@ -0,0 +1,476 @@
+"""
+HubSpot contact sync engine.
+
+Keeps the contacts cache (contacts_cache.ContactsCache) in line with HubSpot
+without re-reading every contact on each refresh:
+
+  - Full sync: the hs_object_id space is split into ranges that are read in
+    parallel through the CRM search API (bounded by HUBSPOT_SYNC_CONCURRENCY and
+    paced to HUBSPOT_SYNC_RATE_LIMIT requests per second).
+    A range with more results than the search API can page through is split in
+    two. Every finished range is stored in Redis together with the checkpoint,
+    so a restarted replica only fetches the ranges that were still pending.
+  - Incremental sync: only the contacts whose lastmodifieddate is at or after
+    the checkpoint watermark are fetched and merged into the cached list.
+    The search API does not return deleted contacts, so a full sync runs
+    again every HUBSPOT_FULL_SYNC_INTERVAL seconds.
+
+429 and 5xx responses are retried with exponential backoff, honouring Retry-After;
+a 429 pauses all requests of the sync, not only the refused one.
+
+Redis keys (prefix "hubspot_sync"):
+  <prefix>:checkpoint   JSON SyncCheckpoint
+  <prefix>:ranges       hash "lo:hi" -> encoded contacts of a finished full-sync range
+  <prefix>:lock         held by the replica that is syncing, renewed while it syncs
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import redis
+import redis.asyncio
+
+from contacts_cache import ContactsCache, decode_contacts, encode_contacts
+from metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+HUBSPOT_SYNC_CONCURRENCY = int(os.getenv("HUBSPOT_SYNC_CONCURRENCY", "4"))
+# Serve cached contacts for this long before an incremental sync
+HUBSPOT_SYNC_INTERVAL = int(os.getenv("HUBSPOT_SYNC_INTERVAL", "3600"))
+HUBSPOT_FULL_SYNC_INTERVAL = int(os.getenv("HUBSPOT_FULL_SYNC_INTERVAL", "86400"))
+HUBSPOT_MAX_RETRIES = int(os.getenv("HUBSPOT_MAX_RETRIES", "6"))
+# Requests per second sent to the search API (0 = unpaced); HubSpot allows about 5 per account
+HUBSPOT_SYNC_RATE_LIMIT = float(os.getenv("HUBSPOT_SYNC_RATE_LIMIT", "4"))
+
+SEARCH_PAGE_SIZE = 200       # search API maximum
+SEARCH_RESULT_CAP = 10_000   # the search API cannot page past this many results of one query
+RANGES_PER_WORKER = 4
+# Incremental syncs re-read this window before the watermark, for changes indexed late
+MODIFIED_OVERLAP_MS = 60_000
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+LOCK_TTL = 900
+# The lock is renewed this often while a sync runs, so it only expires when its replica is gone
+LOCK_RENEW_INTERVAL = LOCK_TTL / 3
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Shared with the endpoints that call HubSpot directly (cloud_run_function.hubspot_request)
+HUBSPOT_REQUESTS = Counter("hubspot_requests_total", "HubSpot API calls by operation and outcome (HTTP status, timeout or error)",
+                           ["operation", "status"])
+HUBSPOT_REQUEST_SECONDS = Histogram("hubspot_request_duration_seconds", "HubSpot API call latency", ["operation"])
+HUBSPOT_SYNCS = Counter("hubspot_syncs_total", "Sync runs by mode and result", ["mode", "result"])
+HUBSPOT_SYNC_SECONDS = Histogram("hubspot_sync_duration_seconds", "Duration of successful sync runs", ["mode"],
+                                 buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800))
+
+
+# Compare-and-delete / compare-and-expire of the lock: only the token that set it may release or renew it
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+RENEW_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("expire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def hubspot_call_status(response: Optional[httpx.Response], error: Optional[Exception] = None) -> str:
+    """Status label of hubspot_requests_total."""
+    if response is not None:
+        return str(response.status_code)
+    return "timeout" if isinstance(error, httpx.TimeoutException) else "error"
+
+
+IdRange = Tuple[int, int]  # [lo, hi)
+
+
+class HubSpotSyncError(Exception):
+    pass
+
+
+@dataclass
+class SyncCheckpoint:
+    last_modified: Optional[int] = None  # highest lastmodifieddate (ms) seen by a finished sync
+    synced_at: float = 0                 # end of the last finished sync (epoch seconds)
+    full_synced_at: float = 0            # end of the last finished full sync
+    pending: Optional[List[IdRange]] = None  # ranges left in an unfinished full sync
+    pending_last_modified: Optional[int] = None  # watermark from before the unfinished full sync
+
+    @classmethod
+    def from_json(cls, raw: Optional[bytes]) -> "SyncCheckpoint":
+        if not raw:
+            return cls()
+        data = json.loads(raw)
+        if data.get("pending") is not None:
+            data["pending"] = [tuple(r) for r in data["pending"]]
+        return cls(**data)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+
+@dataclass
+class SyncStats:
+    mode: str = ""
+    fetched: int = 0
+    requests: int = 0
+    retries: int = 0
+    seconds: float = 0
+    resumed_ranges: int = 0
+    contacts: int = 0
+
+
+def modified_ms(contact: Dict) -> int:
+    value = (contact.get("properties") or {}).get("lastmodifieddate") or contact.get("updatedAt")
+    if not value:
+        return 0
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000)
+
+
+def id_filter(lo: int, hi: int) -> Dict:
+    return {"filters": [
+        {"propertyName": "hs_object_id", "operator": "GTE", "value": str(lo)},
+        {"propertyName": "hs_object_id", "operator": "LT", "value": str(hi)},
+    ]}
+
+
+class HubSpotSync:
+    def __init__(
+        self,
+        client: "redis.asyncio.Redis",
+        cache: ContactsCache,
+        contacts_url: str,
+        api_key: str,
+        concurrency: int = HUBSPOT_SYNC_CONCURRENCY,
+        max_retries: int = HUBSPOT_MAX_RETRIES,
+        rate_limit: float = HUBSPOT_SYNC_RATE_LIMIT,
+        prefix: str = "hubspot_sync",
+    ):
+        self.client = client
+        self.cache = cache
+        self.contacts_url = contacts_url.rstrip("/")
+        self.api_key = api_key
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.rate_limit = rate_limit
+        self.checkpoint_key = f"{prefix}:checkpoint"
+        self.ranges_key = f"{prefix}:ranges"
+        self.lock_key = f"{prefix}:lock"
+        self.last_stats: Optional[SyncStats] = None
+        self._synced_at = 0.0
+        self._lock = asyncio.Lock()
+
+    # ── Public interface ─────────────────────────────────────────────────
+
+    async def contacts(self) -> List[Dict]:
+        """Cached contacts, synced first when the last sync is older than HUBSPOT_SYNC_INTERVAL."""
+        cached = await self._fresh_contacts()
+        if cached is not None:
+            return cached
+        async with self._lock:
+            # Another request may have synced while this one waited
+            cached = await self._fresh_contacts()
+            if cached is not None:
+                return cached
+            try:
+                return await self._sync(full=False)
+            except HubSpotSyncError as e:
+                cached = await self.cache.cached()
+                if cached is None:
+                    raise
+                logger.error(f"HubSpot sync failed, serving {len(cached)} cached contacts: {e}")
+                return cached
+
+    async def sync(self, full: bool = False) -> List[Dict]:
+        """Sync now: incrementally when possible, or a full sync when full=True."""
+        async with self._lock:
+            return await self._sync(full)
+
+    async def load_checkpoint(self) -> SyncCheckpoint:
+        return SyncCheckpoint.from_json(await self.client.get(self.checkpoint_key))
+
+    async def reset(self) -> None:
+        """Forget the checkpoint and any partial full sync."""
+        await self.client.delete(self.checkpoint_key, self.ranges_key)
+        self._synced_at = 0.0
+
+    # ── Orchestration ────────────────────────────────────────────────────
+
+    async def _fresh_contacts(self) -> Optional[List[Dict]]:
+        now = time.time()
+        if now - self._synced_at >= HUBSPOT_SYNC_INTERVAL:
+            try:
+                self._synced_at = (await self.load_checkpoint()).synced_at
+            except redis.RedisError as e:
+                logger.warning(f"Could not read sync checkpoint: {e}")
+        if now - self._synced_at < HUBSPOT_SYNC_INTERVAL:
+            return await self.cache.cached()
+        return None
+
+    async def _sync(self, full: bool) -> List[Dict]:
+        token = uuid.uuid4().hex
+        locked = await self.client.set(self.lock_key, token, nx=True, ex=LOCK_TTL)
+        if not locked:
+            cached = await self.cache.cached()
+            if cached is not None:
+                logger.info("Another replica is syncing HubSpot contacts, serving the cached list")
+                return cached
+            logger.warning("Another replica is syncing HubSpot contacts and nothing is cached, syncing here too")
+
+        renewal = asyncio.ensure_future(self._renew_lock(token)) if locked else None
+        stats = SyncStats()
+        started = time.perf_counter()
+        try:
+            checkpoint = await self.load_checkpoint()
+            base = None if full else await self.cache.cached()
+            needs_full = (
+                full or base is None
+                or checkpoint.last_modified is None
+                or checkpoint.pending is not None
+                or time.time() - checkpoint.full_synced_at >= HUBSPOT_FULL_SYNC_INTERVAL
+            )
+            headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+            limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+            async with httpx.AsyncClient(headers=headers, limits=limits, timeout=httpx.Timeout(30.0, connect=5.0)) as http:
+                self._http, self._stats = http, stats
+                self._semaphore = asyncio.Semaphore(self.concurrency)
+                self._resume_at = 0.0
+                self._next_slot = 0.0
+                if needs_full:
+                    contacts = await self._full_sync(checkpoint, fresh=full)
+                else:
+                    contacts = await self._incremental_sync(checkpoint, base)
+        except Exception:
+            HUBSPOT_SYNCS.inc(mode=stats.mode or "unknown", result="failed")
+            raise
+        finally:
+            if renewal is not None:
+                renewal.cancel()
+            await self.client.eval(RELEASE_LOCK_SCRIPT, 1, self.lock_key, token)
+
+        stats.seconds = time.perf_counter() - started
+        stats.contacts = len(contacts)
+        self.last_stats = stats
+        self._synced_at = time.time()
+        HUBSPOT_SYNCS.inc(mode=stats.mode, result="ok")
+        HUBSPOT_SYNC_SECONDS.observe(stats.seconds, mode=stats.mode)
+        logger.info(f"HubSpot {stats.mode} sync: {stats.fetched} fetched, {stats.contacts} contacts, "
+                    f"{stats.requests} requests ({stats.retries} retried) in {stats.seconds:.2f}s")
+        return contacts
+
+    async def _renew_lock(self, token: str) -> None:
+        while True:
+            await asyncio.sleep(LOCK_RENEW_INTERVAL)
+            try:
+                if not await self.client.eval(RENEW_LOCK_SCRIPT, 1, self.lock_key, token, LOCK_TTL):
+                    logger.warning("HubSpot sync lock expired; another replica may be syncing too")
+                    return
+            except redis.RedisError as e:
+                logger.warning(f"Could not renew the HubSpot sync lock: {e}")
+
+    # ── Full sync ────────────────────────────────────────────────────────
+
+    async def _full_sync(self, checkpoint: SyncCheckpoint, fresh: bool) -> List[Dict]:
+        self._stats.mode = "full"
+        if checkpoint.pending is None or fresh:
+            await self.client.delete(self.ranges_key)
+            checkpoint.pending = await self._plan_ranges()
+            checkpoint.pending_last_modified = checkpoint.last_modified
+            await self._save_checkpoint(checkpoint)
+        else:
+            self._stats.resumed_ranges = await self.client.hlen(self.ranges_key)
+            logger.info(f"Resuming full sync: {self._stats.resumed_ranges} range(s) done, {len(checkpoint.pending)} pending")
+
+        # Each worker finishes a range before taking the next, so an interruption keeps whole ranges.
+        # Workers wait for ranges rather than stop on an empty queue: the halves of a split range
+        # are spread over all of them. The sync is done once every queued range is.
+        queue: asyncio.Queue = asyncio.Queue()
+        for id_range in checkpoint.pending:
+            queue.put_nowait(id_range)
+
+        async def worker():
+            while True:
+                id_range = await queue.get()
+                try:
+                    for half in await self._sync_range(checkpoint, id_range):
+                        queue.put_nowait(half)
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+        finished = asyncio.ensure_future(queue.join())
+        try:
+            done, _ = await asyncio.wait([finished, *workers], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                # Workers only end by failing
+                if task is not finished:
+                    task.result()
+        finally:
+            for task in [finished, *workers]:
+                task.cancel()
+            await asyncio.gather(finished, *workers, return_exceptions=True)
+
+        merged: Dict[str, Dict] = {}
+        for blob in (await self.client.hgetall(self.ranges_key)).values():
+            for contact in (await asyncio.to_thread(decode_contacts, blob))[1]:
+                merged[contact["id"]] = contact
+        contacts = sorted(merged.values(), key=lambda c: int(c["id"]))
+
+        now = time.time()
+        last_modified = max([checkpoint.pending_last_modified or 0] + [modified_ms(c) for c in contacts])
+        await self.cache.put(contacts)
+        await self._save_checkpoint(SyncCheckpoint(last_modified=last_modified, synced_at=now, full_synced_at=now))
+        await self.client.delete(self.ranges_key)
+        return contacts
+
+    async def _plan_ranges(self) -> List[IdRange]:
+        bounds = []
+        for direction in ("ASCENDING", "DESCENDING"):
+            page = await self._search({"sorts": [{"propertyName": "hs_object_id", "direction": direction}], "limit": 1})
+            if not page.get("results"):
+                return []
+            bounds.append(int(page["results"][0]["id"]))
+        lo, hi = bounds[0], bounds[1] + 1
+        count = self.concurrency * RANGES_PER_WORKER
+        step = max(1, -(-(hi - lo) // count))
+        return [(start, min(start + step, hi)) for start in range(lo, hi, step)]
+
+    async def _sync_range(self, checkpoint: SyncCheckpoint, id_range: IdRange) -> List[IdRange]:
+        """Fetch and store one range; returns its halves instead when it is too large for one query."""
+        lo, hi = id_range
+        body = {
+            "filterGroups": [id_filter(lo, hi)],
+            "sorts": [{"propertyName": "hs_object_id", "direction": "ASCENDING"}],
+            "limit": SEARCH_PAGE_SIZE,
+        }
+        page = await self._search(body)
+        if page.get("total", 0) > SEARCH_RESULT_CAP and hi - lo > 1:
+            mid = (lo + hi) // 2
+            checkpoint.pending.remove(id_range)
+            checkpoint.pending.extend([(lo, mid), (mid, hi)])
+            await self._save_checkpoint(checkpoint)
+            return [(lo, mid), (mid, hi)]
+
+        contacts = await self._collect_pages(body, page)
+        checkpoint.pending.remove(id_range)
+        blob = await asyncio.to_thread(encode_contacts, contacts, bytes(16))
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(self.ranges_key, f"{lo}:{hi}", blob)
+            pipe.set(self.checkpoint_key, checkpoint.to_json())
+            await pipe.execute()
+        return []
+
+    # ── Incremental sync ─────────────────────────────────────────────────
+
+    async def _incremental_sync(self, checkpoint: SyncCheckpoint, base: List[Dict]) -> List[Dict]:
+        self._stats.mode = "incremental"
+        since = checkpoint.last_modified - MODIFIED_OVERLAP_MS
+        changed: Dict[str, Dict] = {}
+        while True:
+            body = {
+                "filterGroups": [{"filters": [{"propertyName": "lastmodifieddate", "operator": "GTE", "value": str(since)}]}],
+                "sorts": [{"propertyName": "lastmodifieddate", "direction": "ASCENDING"}],
+                "limit": SEARCH_PAGE_SIZE,
+            }
+            page = await self._search(body)
+            results = await self._collect_pages(body, page)
+            for contact in results:
+                changed[contact["id"]] = contact
+            if page.get("total", 0) <= SEARCH_RESULT_CAP:
+                break
+            # More changes than one query can page through: continue from the last one seen
+            next_since = modified_ms(results[-1])
+            if next_since <= since:
+                logger.warning("Too many contacts share one lastmodifieddate, falling back to a full sync")
+                return await self._full_sync(checkpoint, fresh=True)
+            since = next_since
+
+        contacts = base
+        if changed:
+            merged = {c["id"]: c for c in base}
+            merged.update(changed)
+            contacts = list(merged.values())
+            await self.cache.put(contacts)
+
+        checkpoint.last_modified = max([checkpoint.last_modified] + [modified_ms(c) for c in changed.values()])
+        checkpoint.synced_at = time.time()
+        await self._save_checkpoint(checkpoint)
+        return contacts
+
+    # ── HTTP ─────────────────────────────────────────────────────────────
+
+    async def _collect_pages(self, body: Dict, page: Dict) -> List[Dict]:
+        results = list(page.get("results", []))
+        fetched = len(results)
+        while True:
+            after = (page.get("paging") or {}).get("next", {}).get("after")
+            if after is None or fetched >= SEARCH_RESULT_CAP:
+                break
+            page = await self._search({**body, "after": after})
+            results.extend(page.get("results", []))
+            fetched += len(page.get("results", []))
+        self._stats.fetched += len(results)
+        return results
+
+    async def _search(self, body: Dict) -> Dict:
+        url = f"{self.contacts_url}/search"
+        for attempt in range(self.max_retries + 1):
+            async with self._semaphore:
+                # After a 429 every worker waits, not only the one that was refused
+                now = time.monotonic()
+                start = max(now, self._resume_at)
+                if self.rate_limit:
+                    start = max(start, self._next_slot)
+                    self._next_slot = start + 1 / self.rate_limit
+                if start > now:
+                    await asyncio.sleep(start - now)
+                self._stats.requests += 1
+                called = time.perf_counter()
+                try:
+                    response = await self._http.post(url, json=body)
+                except httpx.TransportError as e:
+                    response, error = None, str(e)
+                    HUBSPOT_REQUESTS.inc(operation="search", status=hubspot_call_status(None, e))
+                else:
+                    HUBSPOT_REQUEST_SECONDS.observe(time.perf_counter() - called, operation="search")
+                    HUBSPOT_REQUESTS.inc(operation="search", status=hubspot_call_status(response))
+                    if response.status_code == 200:
+                        return response.json()
+                    error = f"{response.status_code} - {response.text[:200]}"
+                    if response.status_code not in RETRY_STATUS:
+                        raise HubSpotSyncError(f"HubSpot search failed: {error}")
+            if attempt == self.max_retries:
+                break
+            self._stats.retries += 1
+            delay = self._backoff(attempt, response)
+            if response is not None and response.status_code == 429:
+                self._resume_at = max(self._resume_at, time.monotonic() + delay)
+            await asyncio.sleep(delay)
+        raise HubSpotSyncError(f"HubSpot search failed after {self.max_retries} retries: {error}")
+
+    @staticmethod
+    def _backoff(attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * (0.5 + random.random())
+
+    async def _save_checkpoint(self, checkpoint: SyncCheckpoint):
+        await self.client.set(self.checkpoint_key, checkpoint.to_json())